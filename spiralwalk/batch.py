@@ -0,0 +1,241 @@
+"""
+Vectorized lane evaluation.
+
+Optional NumPy-backed replacement for stepping each Lane in Python. A
+LaneBatch owns the state of a fixed group of lanes as struct-of-arrays
+buffers and advances every due lane in one pass, reproducing Lane.next_value.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Sequence
+
+from .lanes import Lane, LaneState
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+CURVE_SINE, CURVE_RAMP, CURVE_RANDOM_WALK, CURVE_STEP_HOLD, CURVE_FALLBACK = range(5)
+CURVE_CODES = {"sine": CURVE_SINE, "ramp": CURVE_RAMP, "random_walk": CURVE_RANDOM_WALK, "step_hold": CURVE_STEP_HOLD}
+
+SHAPE_LINEAR, SHAPE_EXP, SHAPE_LOG, SHAPE_S_CURVE = range(4)
+SHAPE_CODES = {"linear": SHAPE_LINEAR, "exp": SHAPE_EXP, "log": SHAPE_LOG, "s_curve": SHAPE_S_CURVE}
+
+# Rounded values closer than this to a .5 boundary are recomputed with the
+# scalar path so vector math (sqrt vs pow) can never flip an output.
+_TIE_EPSILON = 1e-9
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("Batch lane evaluation requires numpy (pip install numpy)")
+
+
+@dataclass
+class SceneArrays:
+    """Per-lane scene parameters for one batch, compiled once per scene."""
+
+    active: "np.ndarray"
+    scene_min: "np.ndarray"
+    scene_max: "np.ndarray"
+    phase_step: "np.ndarray"
+    cycle_steps: "np.ndarray"
+    ramp_span: "np.ndarray"
+    step_size: "np.ndarray"
+    hold_steps: "np.ndarray"
+
+
+def _scene_dict(scene_params) -> Dict:
+    return scene_params.__dict__ if hasattr(scene_params, "__dict__") else dict(scene_params)
+
+
+def adjust_ranges(scene_min, scene_max, restraint: float, contrast: float):
+    """Vector form of scenes.adjust_scene_params."""
+    midpoint = (scene_min + scene_max) / 2
+    half_range = np.maximum(1.0, (scene_max - scene_min) / 2)
+    half_range *= (1 - 0.8 * restraint)
+    half_range *= (1 + 0.8 * contrast)
+    new_min = np.maximum(0.0, np.trunc(midpoint - half_range))
+    new_max = np.minimum(127.0, np.trunc(midpoint + half_range))
+    return new_min, new_max
+
+
+class LaneBatch:
+    def __init__(self, lanes: Sequence[Lane]):
+        require_numpy()
+        self.lanes: List[Lane] = list(lanes)
+        self.names = [lane.name for lane in self.lanes]
+        n = len(self.lanes)
+        self.size = n
+
+        self.curve = np.array([CURVE_CODES.get(lane.curve, CURVE_FALLBACK) for lane in self.lanes], dtype=np.int8)
+        self.shape = np.array([SHAPE_CODES.get((lane.shape or "linear").lower(), SHAPE_LINEAR) for lane in self.lanes], dtype=np.int8)
+        self.alpha = np.array([max(0.0, min(1.0, lane.smoothing)) for lane in self.lanes], dtype=np.float64)
+        self.deadband = np.array([lane.deadband or 0 for lane in self.lanes], dtype=np.int64)
+        self.slew = np.array([-1 if lane.slew_limit is None else lane.slew_limit for lane in self.lanes], dtype=np.int64)
+        self.scale = np.array([lane.scale for lane in self.lanes], dtype=np.float64)
+
+        self._sine_idx = np.flatnonzero(self.curve == CURVE_SINE)
+        self._ramp_idx = np.flatnonzero(self.curve == CURVE_RAMP)
+        self._walk_idx = np.flatnonzero(self.curve == CURVE_RANDOM_WALK)
+        self._hold_idx = np.flatnonzero(self.curve == CURVE_STEP_HOLD)
+        self._fallback_idx = np.flatnonzero(self.curve == CURVE_FALLBACK)
+        self._shaped_idx = [(code, np.flatnonzero(self.shape == code)) for code in (SHAPE_EXP, SHAPE_LOG, SHAPE_S_CURVE)]
+        self._shaped_idx = [(code, idx) for code, idx in self._shaped_idx if idx.size]
+
+        self.phase = np.zeros(n, dtype=np.float64)
+        self.previous_value = np.zeros(n, dtype=np.float64)
+        self.has_previous = np.zeros(n, dtype=bool)
+        self.hold_value = np.zeros(n, dtype=np.float64)
+        self.hold_remaining = np.zeros(n, dtype=np.int64)
+        self.random_position = np.zeros(n, dtype=np.float64)
+        self.last_output = np.zeros(n, dtype=np.int64)
+        self.has_output = np.zeros(n, dtype=bool)
+        self._scene_cache: Dict[int, SceneArrays] = {}
+        self.load_state()
+
+    def load_state(self) -> None:
+        """Copy each Lane's LaneState into the batch buffers."""
+        for i, lane in enumerate(self.lanes):
+            state = lane.state
+            self.phase[i] = state.phase
+            self.has_previous[i] = state.previous_value is not None
+            self.previous_value[i] = state.previous_value or 0.0
+            self.hold_value[i] = state.hold_value
+            self.hold_remaining[i] = state.hold_remaining
+            self.random_position[i] = state.random_position
+            self.has_output[i] = state.last_output is not None
+            self.last_output[i] = state.last_output or 0
+
+    def store_state(self) -> None:
+        """Write the batch buffers back into each Lane's LaneState."""
+        for i, lane in enumerate(self.lanes):
+            lane.state = LaneState(
+                previous_value=float(self.previous_value[i]) if self.has_previous[i] else None,
+                phase=float(self.phase[i]),
+                hold_value=float(self.hold_value[i]),
+                hold_remaining=int(self.hold_remaining[i]),
+                random_position=float(self.random_position[i]),
+                last_output=int(self.last_output[i]) if self.has_output[i] else None,
+            )
+
+    def reset(self) -> None:
+        for lane in self.lanes:
+            lane.reset()
+        self.load_state()
+
+    def compile_scene(self, scene: Dict) -> SceneArrays:
+        """Flatten a scene's per-lane params into arrays aligned with this batch (cached per scene)."""
+        cached = self._scene_cache.get(id(scene))
+        if cached is not None:
+            return cached
+        n = self.size
+        arrays = SceneArrays(
+            active=np.zeros(n, dtype=bool),
+            scene_min=np.zeros(n, dtype=np.float64),
+            scene_max=np.full(n, 127.0),
+            phase_step=np.zeros(n, dtype=np.float64),
+            cycle_steps=np.ones(n, dtype=np.float64),
+            ramp_span=np.ones(n, dtype=np.float64),
+            step_size=np.zeros(n, dtype=np.float64),
+            hold_steps=np.ones(n, dtype=np.int64),
+        )
+        for i, name in enumerate(self.names):
+            scene_params = scene.get(name)
+            if not scene_params:
+                continue
+            params = _scene_dict(scene_params)
+            curve_params = params.get("curve_params") or {}
+            cycle_steps = max(1, int(curve_params.get("cycle_steps", 16)))
+            arrays.active[i] = True
+            arrays.scene_min[i] = int(params.get("min", 0))
+            arrays.scene_max[i] = int(params.get("max", 127))
+            arrays.phase_step[i] = 2 * math.pi / cycle_steps
+            arrays.cycle_steps[i] = cycle_steps
+            arrays.ramp_span[i] = cycle_steps - 1 if cycle_steps > 1 else 1
+            arrays.step_size[i] = float(curve_params.get("step_size", 0.08))
+            arrays.hold_steps[i] = max(1, int(curve_params.get("hold_steps", 4)))
+        self._scene_cache[id(scene)] = arrays
+        return arrays
+
+    def _curve_values(self, params: SceneArrays, due: "np.ndarray") -> "np.ndarray":
+        raw = np.zeros(self.size, dtype=np.float64)
+
+        idx = self._sine_idx[due[self._sine_idx]]
+        if idx.size:
+            self.phase[idx] += params.phase_step[idx]
+            raw[idx] = 0.5 * (1 + np.sin(self.phase[idx]))
+
+        idx = self._ramp_idx[due[self._ramp_idx]]
+        if idx.size:
+            step = np.remainder(self.phase[idx] + 1, params.cycle_steps[idx])
+            self.phase[idx] = step
+            raw[idx] = step / params.ramp_span[idx]
+
+        idx = self._walk_idx[due[self._walk_idx]]
+        if idx.size:
+            draws = np.array([self.lanes[i].rng.random() for i in idx])
+            step_size = params.step_size[idx]
+            delta = -step_size + (step_size - -step_size) * draws
+            self.random_position[idx] = np.maximum(0.0, np.minimum(1.0, self.random_position[idx] + delta))
+            raw[idx] = self.random_position[idx]
+
+        idx = self._hold_idx[due[self._hold_idx]]
+        if idx.size:
+            expired = idx[self.hold_remaining[idx] <= 0]
+            for i in expired:
+                self.hold_value[i] = self.lanes[i].rng.random()
+            self.hold_remaining[expired] = params.hold_steps[expired]
+            self.hold_remaining[idx] -= 1
+            raw[idx] = self.hold_value[idx]
+
+        idx = self._fallback_idx[due[self._fallback_idx]]
+        for i in idx:
+            raw[i] = self.lanes[i].rng.random()
+        return raw
+
+    def _apply_shape(self, value: "np.ndarray") -> "np.ndarray":
+        value = np.maximum(0.0, np.minimum(1.0, value))
+        for code, idx in self._shaped_idx:
+            if code == SHAPE_EXP:
+                value[idx] = value[idx] ** 2
+            elif code == SHAPE_LOG:
+                value[idx] = value[idx] ** 0.5
+            else:
+                value[idx] = 0.5 * (1 - np.cos(math.pi * value[idx]))
+        return value
+
+    def step(self, params: SceneArrays, due: "np.ndarray", scene_min: "np.ndarray", scene_max: "np.ndarray"):
+        """
+        Advance every lane flagged in `due` by one update.
+        Returns (values, emit): emit marks lanes that produced a CC this step.
+        """
+        raw = self._curve_values(params, due)
+
+        alpha = self.alpha
+        smoothed = np.where(self.has_previous, alpha * raw + (1 - alpha) * self.previous_value, raw)
+        self.previous_value[due] = smoothed[due]
+        self.has_previous |= due
+
+        shaped = self._apply_shape(smoothed)
+        scaled = scene_min + (scene_max - scene_min) * shaped
+        clamped = np.maximum(0.0, np.minimum(127.0, scaled)) * self.scale
+        values = np.rint(clamped).astype(np.int64)
+        ties = np.flatnonzero(due & (np.abs(clamped - np.floor(clamped) - 0.5) < _TIE_EPSILON))
+        for i in ties:
+            lane = self.lanes[i]
+            values[i] = lane._normalize(lane._apply_shape(float(smoothed[i])), int(scene_min[i]), int(scene_max[i]))
+
+        emit = due.copy()
+        prior = due & self.has_output
+        delta = values - self.last_output
+        magnitude = np.abs(delta)
+        emit &= ~(prior & (self.deadband > 0) & (magnitude < self.deadband))
+        slewed = emit & prior & (self.slew >= 0) & (magnitude > self.slew)
+        values = np.where(slewed, self.last_output + np.sign(delta) * self.slew, values)
+
+        self.last_output[emit] = values[emit]
+        self.has_output |= emit
+        return values, emit
@@ -0,0 +1,285 @@
+"""
+Microbenchmarks for the engine hot paths.
+
+Each case runs at every size in `sizes`: a synthetic config with that many
+lanes and that many scenes (see synthetic_settings). A case's call is
+repeated until one run takes at least `min_time` seconds. Runs are repeated
+`repeat` times and reported in nanoseconds per call as the fastest run
+(`ns_per_op`, the figure compared against baselines) and the median.
+Lane.next_value and MidiOutput._can_send do not depend on the config and
+run once, with size 0.
+
+Results are saved as JSON:
+
+    {"version": 1, "timestamp": float, "python": str, "platform": str,
+     "results": [{"name": str, "size": int, "ns_per_op": float,
+                  "median_ns": float, "ops": int, "repeat": int}, ...]}
+
+compare() flags a case as a regression when its ns_per_op grows by more
+than `threshold` (a fraction) over the baseline file's.
+"""
+
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import mido
+
+from .clock import ClockFollower
+from .config import LaneDefinition, MidiConfig, SceneDefinition, Settings, SpiralConfig, TransportConfig
+from .derive import derive_scenes
+from .engine import AutomationEngine, _Discard
+from .lanes import Lane
+from .midi_io import MidiOutput
+from .spiral import SpiralWalker
+
+VERSION = 1
+SIZES = (10, 100, 1000)
+MIN_TIME = 0.05  # seconds per run
+REPEAT = 5
+THRESHOLD = 0.25  # slowdown fraction flagged by compare()
+LOG_BARS = 256  # bars in the synthetic session log derive_scenes reads
+
+CURVES = ("sine", "ramp", "random_walk", "step_hold")
+SHAPES = ("linear", "exp", "log", "s_curve")
+DIVISIONS = ("1/16", "1/8", "1/4")
+
+Result = Dict[str, float | int | str]
+
+
+def _lane_spec(i: int) -> Dict:
+    spec = {
+        "name": f"lane{i}",
+        "cc": 20 + i % 100,
+        "channel": (i // 100) % 16,
+        "division": DIVISIONS[i % len(DIVISIONS)],
+        "curve": CURVES[i % len(CURVES)],
+        "shape": SHAPES[(i // len(CURVES)) % len(SHAPES)],
+        "smoothing": round(0.1 + 0.1 * (i % 4), 2),
+        "deadband": i % 3,
+    }
+    if i % 5 == 4:
+        spec["slew_limit"] = 8 + i % 8
+    if i < 2:
+        spec["role"] = ("restraint", "contrast")[i]
+    return spec
+
+
+def _scene_spec(scene: int, lane: int) -> Tuple[int, int, int]:
+    """(min, max, curve parameter) for a lane in a scene."""
+    low = (lane * 37 + scene * 11) % 64
+    return low, low + 32 + (lane + scene) % 32, 4 + (lane * 7 + scene * 3) % 24
+
+
+def _curve_params(curve: str, value: int) -> Dict:
+    if curve == "random_walk":
+        return {"step_size": value / 200}
+    if curve == "step_hold":
+        return {"hold_steps": value}
+    return {"cycle_steps": value}
+
+
+def generate_config(lanes: int, scenes: int, seed: int = 0) -> Dict:
+    """A config dict (as load_settings reads from YAML/JSON) with `lanes` lanes and `scenes` scenes."""
+    lane_specs = [_lane_spec(i) for i in range(lanes)]
+    scene_block = {}
+    for s in range(scenes):
+        scene_block[f"scene{s + 1}"] = {}
+        for i, spec in enumerate(lane_specs):
+            low, high, value = _scene_spec(s, i)
+            scene_block[f"scene{s + 1}"][spec["name"]] = {"min": low, "max": high, "curve_params": _curve_params(spec["curve"], value)}
+    return {
+        "transport": {"phrase_bars": 8, "ppq_division": 24},
+        "spiral": {"k_step": 5, "memory_k": 2, "p_jump": 0.08, "seed": seed},
+        "midi": {"in_port_name": None, "out_port_name": None, "max_messages_per_sec": 200},
+        "lanes": lane_specs,
+        "scenes": scene_block,
+    }
+
+
+def synthetic_settings(lanes: int, scenes: int, seed: int = 0) -> Settings:
+    """
+    The Settings load_settings would build from generate_config(lanes, scenes,
+    seed). Built directly, with identical scene entries shared, so 1,000 x
+    1,000 configs do not need a million-entry dict first.
+    """
+    lane_defs = []
+    for i in range(lanes):
+        spec = _lane_spec(i)
+        lane_defs.append(LaneDefinition(**spec, interpolate=spec["curve"] != "step_hold"))
+    pool: Dict[Tuple[str, int, int, int], SceneDefinition] = {}
+    scene_map: Dict[str, Dict[str, SceneDefinition]] = {}
+    for s in range(scenes):
+        row = scene_map[f"scene{s + 1}"] = {}
+        for i, lane in enumerate(lane_defs):
+            key = (lane.curve,) + _scene_spec(s, i)
+            definition = pool.get(key)
+            if definition is None:
+                definition = pool[key] = SceneDefinition(min=key[1], max=key[2], curve_params=_curve_params(lane.curve, key[3]))
+            row[lane.name] = definition
+    return Settings(
+        lanes=lane_defs,
+        scenes=scene_map,
+        transport=TransportConfig(phrase_bars=8),
+        spiral=SpiralConfig(seed=seed),
+        midi=MidiConfig(in_port_name=None, out_port_name=None),
+    )
+
+
+def time_call(func: Callable[[], object], min_time: float = MIN_TIME, repeat: int = REPEAT) -> Tuple[float, float, int]:
+    """(fastest, median) ns per call over `repeat` runs of `ops` calls each, and `ops`."""
+    ops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(ops):
+            func()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9:
+            break
+        # aim straight for min_time, growing at most 10x per calibration run
+        ops = min(ops * 10, max(ops + 1, int(ops * min_time * 1e9 / max(1, elapsed) * 1.2)))
+    runs = [elapsed / ops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter_ns()
+        for _ in range(ops):
+            func()
+        runs.append((time.perf_counter_ns() - start) / ops)
+    return min(runs), statistics.median(runs), ops
+
+
+def _bench_clock(settings: Settings) -> Callable[[], None]:
+    # one no-op callback per lane on the lane's division, as the engine registers them
+    clock = ClockFollower(ppq=settings.transport.ppq_division)
+    for lane in settings.lanes:
+        clock.register_callback(lane.division, lambda bar, quarter, tick: None)
+    clock.start()
+    return clock.handle_clock_tick
+
+
+def _bench_division(settings: Settings) -> Callable[[], None]:
+    engine = AutomationEngine(settings, dry_run=True)
+    engine.output_port = _Discard()  # time the lane work, not the rate limiter
+    engine._on_midi_message(mido.Message("start"))
+    on_division = engine._on_division
+    # the busiest division; lanes cycle through DIVISIONS
+    return lambda: on_division(DIVISIONS[0], 0, 0, 0)
+
+
+def _bench_spiral(settings: Settings) -> Callable[[], int]:
+    return SpiralWalker(scene_count=len(settings.scenes), seed=0).next_scene
+
+
+def _write_log(path: Path, lanes: int, bars: int) -> None:
+    rng = random.Random(0)
+    names = [f"lane{i}" for i in range(lanes)]
+    with path.open("w", encoding="utf-8") as handle:
+        for bar in range(bars):
+            entry = {"timestamp": float(bar), "bar": bar, "scene_index": bar // 32, "lanes": {name: rng.randrange(128) for name in names}}
+            handle.write(json.dumps(entry) + "\n")
+
+
+def _lane_cases() -> List[Tuple[str, Callable[[], object]]]:
+    cases = []
+    for curve in CURVES:
+        for shape in SHAPES:
+            lane = Lane(name="bench", cc=20, channel=0, division="1/16", curve=curve, smoothing=0.2, shape=shape, rng=random.Random(0))
+            params = {"min": 10, "max": 110, "curve_params": _curve_params(curve, 16)}
+            cases.append((f"lane.next_value[{curve},{shape}]", lambda lane=lane, params=params: lane.next_value(params)))
+    return cases
+
+
+def _rate_case() -> Callable[[], bool]:
+    output = MidiOutput(None, max_messages_per_sec=1_000_000, dry_run=True)
+    return output._can_send
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = SIZES,
+    min_time: float = MIN_TIME,
+    repeat: int = REPEAT,
+    only: str | None = None,
+    progress: Callable[[Result], None] | None = None,
+) -> Dict:
+    """Runs every case whose name contains `only` (all when None) and returns the results document."""
+    results: List[Result] = []
+
+    def measure(name: str, size: int, func: Callable[[], object]) -> None:
+        fastest, median, ops = time_call(func, min_time=min_time, repeat=repeat)
+        result = {"name": name, "size": size, "ns_per_op": round(fastest, 1), "median_ns": round(median, 1), "ops": ops, "repeat": repeat}
+        results.append(result)
+        if progress:
+            progress(result)
+
+    def wanted(name: str) -> bool:
+        return only is None or only in name
+
+    for name, func in _lane_cases():
+        if wanted(name):
+            measure(name, 0, func)
+    if wanted("midi_output._can_send"):
+        measure("midi_output._can_send", 0, _rate_case())
+
+    sized = {
+        "clock.handle_clock_tick": _bench_clock,
+        "engine._on_division": _bench_division,
+        "spiral.next_scene": _bench_spiral,
+    }
+    for size in sizes:
+        if any(wanted(name) for name in sized):
+            settings = synthetic_settings(size, size)
+            for name, build in sized.items():
+                if wanted(name):
+                    measure(name, size, build(settings))
+            del settings
+        if wanted("derive_scenes"):
+            with tempfile.TemporaryDirectory() as tmp:
+                log_path = Path(tmp) / "bench.jsonl"
+                _write_log(log_path, size, LOG_BARS)
+                measure("derive_scenes", size, lambda: derive_scenes(str(log_path)))
+
+    return {
+        "version": VERSION,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def save_results(path: str | Path, document: Dict) -> None:
+    Path(path).write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def load_results(path: str | Path) -> Dict:
+    document = json.loads(Path(path).read_text(encoding="utf-8"))
+    if document.get("version") != VERSION:
+        raise ValueError(f"Unsupported benchmark results version {document.get('version')}")
+    return document
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = THRESHOLD) -> List[Dict]:
+    """
+    One row per case present in both documents: name, size, baseline and
+    current ns_per_op, their ratio and whether it counts as a regression.
+    """
+    previous = {(r["name"], r["size"]): r["ns_per_op"] for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is None:
+            continue
+        ratio = result["ns_per_op"] / before if before else float("inf")
+        rows.append({
+            "name": result["name"],
+            "size": result["size"],
+            "baseline_ns": before,
+            "ns_per_op": result["ns_per_op"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
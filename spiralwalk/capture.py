@@ -0,0 +1,203 @@
+"""
+High-resolution capture log (.swcap).
+
+The session log keeps one snapshot per bar. A capture log records every CC
+the engine emits, tagged with the clock pulse it went out on, so replay can
+reproduce the motion between bar lines:
+
+    magic      6 bytes   b"SWCAP\\x00"
+    version    uint16
+    header_len uint32
+    header     JSON: {"ppq": int, "lanes": [{"name": str, "cc": int, "channel": int, "port": int,
+                                          "output": str, "nrpn": int | null}, ...]}
+    records    tick uint32, lane uint16, scene_index uint16, division uint16, value uint16
+
+`tick` is the clock's tick count (it restarts at 0 on Start), `lane` indexes
+the header lane list and `division` is the lane's update interval in ticks.
+`channel` is the MIDI channel (0-15) and `port` the index of the output port
+the lane sent to (0 when absent). `output` is the lane's output kind
+(midi_io.OUTPUT_KINDS) and `value` the value at that kind's resolution, so
+cc14 and NRPN lanes keep all 14 bits.
+All integers are little-endian.
+
+Records are packed on the clock thread into a preallocated ring of
+`ring_chunks` chunks of `chunk_records` records; a writer thread creates the
+file and spills each chunk once it fills. If the writer falls a whole ring
+behind, new records are dropped and counted instead of blocking.
+"""
+
+import json
+import logging
+import mmap
+import queue
+import struct
+import threading
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+from .clock import PPQ
+from .midi_io import CC, NRPN, port_channel
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SWCAP\x00"
+VERSION = 2  # 2: 16-bit values, output kind and NRPN parameter per lane
+PREAMBLE = struct.Struct("<6sHI")
+RECORD = struct.Struct("<IHHHH")
+CAPTURE_SUFFIX = ".swcap"
+CHUNK_RECORDS = 4096  # records per spill
+RING_CHUNKS = 16
+
+CaptureEvent = Tuple[int, int, int, int, int]  # tick, lane, scene_index, division, value
+CaptureLane = Tuple[str, int, int, int, str, int | None]  # name, cc, channel, port, output kind, NRPN parameter
+
+
+class CaptureLog:
+    def __init__(
+        self,
+        path: str | Path,
+        lanes: Sequence[CaptureLane],
+        ppq: int = PPQ,
+        chunk_records: int = CHUNK_RECORDS,
+        ring_chunks: int = RING_CHUNKS,
+    ):
+        self.path = Path(path)
+        self.lanes = [tuple(lane) for lane in lanes]  # port is the output port index
+        self.ppq = ppq
+        self.chunk_records = max(1, chunk_records)
+        self.capacity = self.chunk_records * max(2, ring_chunks)
+        self.dropped = 0
+        self._buffer = bytearray(self.capacity * RECORD.size)
+        self._pack = RECORD.pack_into
+        self._head = 0  # records packed so far
+        self._spilled = 0  # records written to disk; only the writer thread advances it
+        self._ready: queue.SimpleQueue = queue.SimpleQueue()
+        self._handle = None
+        self._thread: threading.Thread | None = None
+
+    def record(self, tick: int, lane: int, scene_index: int, division: int, value: int) -> None:
+        head = self._head
+        if head - self._spilled >= self.capacity:
+            self.dropped += 1
+            return
+        self._pack(self._buffer, (head % self.capacity) * RECORD.size, tick, lane, scene_index, division, value)
+        head += 1
+        self._head = head
+        if head % self.chunk_records == 0:
+            if self._thread is None:
+                self._start()
+            self._ready.put(head)
+
+    def _open(self) -> None:
+        lanes = [{"name": n, "cc": cc, "channel": ch, "port": port, "output": output, "nrpn": nrpn} for n, cc, ch, port, output, nrpn in self.lanes]
+        header = json.dumps({"ppq": self.ppq, "lanes": lanes}).encode("utf-8")
+        self._handle = self.path.open("wb")
+        self._handle.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        self._handle.write(header)
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._spill, name="spiralwalk-capture", daemon=True)
+        self._thread.start()
+
+    def _write_range(self, start: int, end: int) -> None:
+        offset = (start % self.capacity) * RECORD.size
+        self._handle.write(memoryview(self._buffer)[offset:offset + (end - start) * RECORD.size])
+
+    def _spill(self) -> None:
+        self._open()
+        while True:
+            end = self._ready.get()
+            if end is None:
+                return
+            self._write_range(end - self.chunk_records, end)
+            self._handle.flush()
+            self._spilled = end
+
+    def close(self) -> None:
+        """Spills everything still buffered (including a partial chunk) and closes the file."""
+        if self._thread is not None:
+            self._ready.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._handle is None:
+            self._open()
+        self._write_range(self._spilled, self._head)
+        self._spilled = self._head
+        self._handle.close()
+        self._handle = None
+        logger.info("Capture log: %s events written to %s, %s dropped", self._head, self.path, self.dropped)
+
+
+def is_capture_log(path: str | Path) -> bool:
+    with Path(path).open("rb") as handle:
+        return handle.read(len(MAGIC)) == MAGIC
+
+
+class CaptureReader:
+    """Memory-mapped view of a capture log."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREAMBLE.unpack_from(self._map, 0) if len(self._map) >= PREAMBLE.size else (b"", 0, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a capture log")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported capture log version {version}")
+        header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_len].decode("utf-8"))
+        self.ppq: int = header.get("ppq", PPQ)
+        self.lanes: List[CaptureLane] = [
+            (lane["name"], lane["cc"], lane["channel"], lane.get("port", 0), lane.get("output", CC), lane.get("nrpn"))
+            for lane in header["lanes"]
+        ]
+        self.data_offset = PREAMBLE.size + header_len
+        self.count = (len(self._map) - self.data_offset) // RECORD.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def event(self, index: int) -> CaptureEvent:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._map, self.data_offset + index * RECORD.size)
+
+    def iter_events(self) -> Iterator[CaptureEvent]:
+        step = CHUNK_RECORDS * RECORD.size
+        end = self.data_offset + self.count * RECORD.size
+        for start in range(self.data_offset, end, step):
+            yield from RECORD.iter_unpack(self._map[start:min(end, start + step)])
+
+
+def iter_timeline(reader: CaptureReader) -> Iterator[Tuple[int, str, int, int, int]]:
+    """
+    (position, output kind, number, channel, value) per event, ready for
+    midi_io.send_value: position is counted in ticks from the start of the
+    capture, number is the lane's CC or NRPN parameter and the channel is
+    extended by the port index as outputs take it (midi_io.port_channel).
+    Each restart of the clock continues from the last captured tick, so gaps
+    while stopped are not reproduced.
+    """
+    lanes = [(output, nrpn if output == NRPN else cc, port_channel(port, channel)) for _, cc, channel, port, output, nrpn in reader.lanes]
+    base = 0
+    previous = 0
+    for tick, lane, _, _, value in reader.iter_events():
+        if tick < previous:
+            base += previous
+        previous = tick
+        kind, number, channel = lanes[lane]
+        yield base + tick, kind, number, channel, value
@@ -0,0 +1,98 @@
+"""
+Engine checkpoints.
+
+A checkpoint file holds one JSON object, the most recent engine snapshot:
+
+    {"version": 1, "timestamp": float, "bar": int, "tick": int, "snapshot": {...}}
+
+The engine takes the snapshot on the clock thread (a handful of copies) and
+hands it to CheckpointWriter. The writer's thread serializes it and replaces
+the file atomically (write to a temporary file, fsync, rename), so a crash
+never leaves a torn checkpoint behind. If snapshots arrive faster than the
+disk keeps up, only the newest one waiting is written.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def write_checkpoint(path: str | Path, snapshot) -> None:
+    """Atomically replaces `path` with `snapshot` (an EngineSnapshot)."""
+    path = Path(path)
+    data = {"version": VERSION, "timestamp": time.time(), "bar": snapshot.bar, "tick": snapshot.tick_count, "snapshot": snapshot.to_dict()}
+    temp = path.with_name(path.name + ".tmp")
+    with temp.open("w", encoding="utf-8") as handle:
+        json.dump(data, handle, separators=(",", ":"))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp, path)
+
+
+def read_checkpoint(path: str | Path) -> Dict:
+    """The snapshot dict stored in a checkpoint file."""
+    with Path(path).open("r", encoding="utf-8") as handle:
+        data = json.load(handle)
+    if data.get("version") != VERSION:
+        raise ValueError(f"Unsupported checkpoint version {data.get('version')}")
+    return data["snapshot"]
+
+
+class CheckpointWriter:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.written = 0
+        self.skipped = 0  # superseded by a newer snapshot before they were written
+        self._pending = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def submit(self, snapshot) -> None:
+        """Queues `snapshot` for writing; never blocks on the disk."""
+        with self._lock:
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = snapshot
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="spiralwalk-checkpoint", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            snapshot, self._pending = self._pending, None
+        if snapshot is None:
+            return
+        try:
+            write_checkpoint(self.path, snapshot)
+            self.written += 1
+        except OSError as exc:
+            logger.warning("Checkpoint write to %s failed: %s", self.path, exc)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self._write_pending()
+            if self._closed:
+                return
+
+    def close(self) -> None:
+        """Writes the last pending snapshot and stops the writer thread."""
+        self._closed = True
+        if self._thread is not None:
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self._write_pending()
+        logger.info("Checkpoints: %s written to %s, %s superseded", self.written, self.path, self.skipped)
@@ -1,14 +1,19 @@
 import argparse
-import json
 import sys
 import time
 from pathlib import Path
 
-from .config import load_settings
+from . import bench
+from .capture import CaptureReader, is_capture_log, iter_timeline
+from .clock import TempoTracker
+from .config import assign_output_ports, load_settings
 from .engine import AutomationEngine
-from .midi_io import MidiOutput, list_ports
+from .host import EngineHost
+from .midi_io import MidiOutput, build_output, list_ports, send_value
 from .derive import derive_scenes
-from .replay import TempoReplay
+from .render import render
+from .replay import CaptureReplay, FrameStream, TempoReplay, lane_targets, send_logged
+from .sessionlog import build_index, convert_log, load_index, resolve_log_position
 
 
 def cmd_list_ports(_: argparse.Namespace) -> int:
@@ -25,10 +30,25 @@ def cmd_list_ports(_: argparse.Namespace) -> int:
 def cmd_run(args: argparse.Namespace) -> int:
     settings = load_settings(args.config)
     if args.replay:
+        if is_capture_log(args.replay):
+            return replay_capture(
+                settings=settings,
+                path=args.replay,
+                bpm=args.replay_bpm,
+                live=args.replay_live,
+                dry_run=args.dry_run,
+                virtual=args.virtual,
+                virtual_in_name=args.virtual_in_name,
+                virtual_out_name=args.virtual_out_name,
+                arm_ticks=args.arm_ticks,
+            )
+        start = resolve_log_position(args.replay, bar=args.replay_from_bar, scene_change=args.replay_from_scene)
         if args.replay_live:
             return replay_tempo_locked(
                 settings=settings,
                 path=args.replay,
+                start=start,
+                count=args.replay_bars,
                 dry_run=args.dry_run,
                 virtual=args.virtual,
                 virtual_in_name=args.virtual_in_name,
@@ -38,6 +58,8 @@ def cmd_run(args: argparse.Namespace) -> int:
         return replay_session(
             settings=settings,
             path=args.replay,
+            start=start,
+            count=args.replay_bars,
             interval=args.replay_interval,
             dry_run=args.dry_run,
             virtual=args.virtual,
@@ -67,11 +89,62 @@ def cmd_run(args: argparse.Namespace) -> int:
         in_port_override=args.virtual_in_name,
         out_port_override=args.virtual_out_name,
         soft_start=args.soft_start,
+        batch=args.batch,
+        lookahead_ticks=_lookahead_ticks(args, settings),
+        log_queue_size=args.log_queue_size,
+        log_flush_interval=args.log_flush_interval,
+        log_flush_size=args.log_flush_size,
+        capture_path=args.capture,
+        log_index=args.log_index,
+        checkpoint_path=args.checkpoint,
+        checkpoint_bars=args.checkpoint_bars,
+        resume_from=args.resume_from,
+        interpolate=args.interpolate,
+        stats=args.stats,
+        stats_interval=args.stats_interval,
+        stats_port=args.stats_port,
+        watch_config=args.config if args.watch else None,
     )
     engine.run()
     return 0
 
 
+def cmd_host(args: argparse.Namespace) -> int:
+    configs = [Path(config) for config in args.config]
+    stems = [config.stem for config in configs]
+    if len(set(stems)) != len(stems) and (args.session_log_dir or args.checkpoint_dir):
+        print("Config file names must be distinct to name per-engine session logs and checkpoints.")
+        return 1
+    all_settings = [load_settings(config) for config in configs]
+    in_port = args.virtual_in_name if args.virtual else args.in_port or all_settings[0].midi.in_port_name
+    for config, settings in zip(configs, all_settings[1:]):
+        if not args.in_port and settings.midi.in_port_name != all_settings[0].midi.in_port_name:
+            print(f"Note: {config} names input {settings.midi.in_port_name!r}; all engines listen on {in_port!r}")
+    host = EngineHost(in_port, use_virtual=args.virtual, ppq=all_settings[0].transport.ppq_division)
+    for index, (stem, settings) in enumerate(zip(stems, all_settings)):
+        host.add(
+            settings,
+            dry_run=args.dry_run,
+            arm_ticks=args.arm_ticks,
+            soft_start=args.soft_start,
+            session_log_path=str(Path(args.session_log_dir) / f"{stem}.jsonl") if args.session_log_dir else None,
+            checkpoint_path=str(Path(args.checkpoint_dir) / f"{stem}.ckpt") if args.checkpoint_dir else None,
+            interpolate=args.interpolate,
+            stats=args.stats,
+            stats_interval=args.stats_interval,
+            stats_port=args.stats_port + index if args.stats_port is not None else None,
+            watch_config=str(configs[index]) if args.watch else None,
+        )
+    host.run()
+    return 0
+
+
+def _lookahead_ticks(args: argparse.Namespace, settings) -> int:
+    if args.lookahead_bars:
+        return args.lookahead_bars * settings.transport.ppq_division * 4
+    return args.lookahead_ticks
+
+
 def _pick_calibration_lane(settings, calibrate_cc: int | None):
     if calibrate_cc is None:
         return settings.lanes[0].cc, settings.lanes[0].channel
@@ -87,7 +160,7 @@ def run_calibration(settings, calibrate_cc: int | None, hold_value: int | None,
         channel = channel_override
 
     out_name = virtual_out_name or settings.midi.out_port_name
-    out = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=virtual)
+    out = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=virtual, burst=settings.midi.burst)
     out.open()
     print(f"Calibration mode on CC {cc} channel {channel + 1} (Ctrl+C to exit)")
     try:
@@ -109,42 +182,32 @@ def run_calibration(settings, calibrate_cc: int | None, hold_value: int | None,
     return 0
 
 
-def replay_session(settings, path: str, interval: float, dry_run: bool, virtual: bool, virtual_out_name: str | None) -> int:
-    out_name = virtual_out_name or settings.midi.out_port_name
-    out = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=virtual)
+def replay_session(settings, path: str, interval: float, dry_run: bool, virtual: bool, virtual_out_name: str | None, start: int = 0, count: int | None = None) -> int:
+    out_ports, lane_ports = assign_output_ports(settings, virtual_out_name)
+    out = build_output(out_ports, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=virtual, burst=settings.midi.burst)
     out.open()
     print(f"Replaying log from {path} every {interval} sec (Ctrl+C to stop)")
-    lane_map = {lane.name: (lane.cc, lane.channel) for lane in settings.lanes}
+    lane_map = lane_targets(settings, lane_ports)
+    frames = FrameStream(path, loop=False, start=start, count=count)
     try:
-        for line in Path(path).read_text().splitlines():
-            if not line.strip():
-                continue
-            data = json.loads(line)
-            lanes = data.get("lanes", {})
+        while (lanes := frames.next_frame()) is not None:
             for lane_name, value in lanes.items():
-                mapping = lane_map.get(lane_name)
-                if mapping is None:
-                    continue
-                cc, channel = mapping
-                out.send_cc(cc, int(value), channel=channel)
+                target = lane_map.get(lane_name)
+                if target is not None:
+                    send_logged(out, target, int(value))
             time.sleep(interval)
     except KeyboardInterrupt:
         print("Replay stopped.")
     finally:
+        frames.close()
         out.close()
     return 0
 
 
-def replay_tempo_locked(settings, path: str, dry_run: bool, virtual: bool, virtual_in_name: str | None, virtual_out_name: str | None, arm_ticks: int) -> int:
-    frames = []
-    for line in Path(path).read_text().splitlines():
-        if not line.strip():
-            continue
-        data = json.loads(line)
-        frames.append({k: int(v) for k, v in data.get("lanes", {}).items()})
+def replay_tempo_locked(settings, path: str, dry_run: bool, virtual: bool, virtual_in_name: str | None, virtual_out_name: str | None, arm_ticks: int, start: int = 0, count: int | None = None) -> int:
     replay = TempoReplay(
         settings=settings,
-        frames=frames,
+        frames=FrameStream(path, start=start, count=count),
         virtual=virtual,
         in_port_override=virtual_in_name,
         out_port_override=virtual_out_name,
@@ -155,8 +218,46 @@ def replay_tempo_locked(settings, path: str, dry_run: bool, virtual: bool, virtu
     return 0
 
 
+def replay_capture(settings, path: str, bpm: float, live: bool, dry_run: bool, virtual: bool, virtual_in_name: str | None, virtual_out_name: str | None, arm_ticks: int) -> int:
+    with CaptureReader(path) as reader:
+        ppq = reader.ppq
+        timeline = list(iter_timeline(reader))
+    if live:
+        replay = CaptureReplay(
+            settings,
+            timeline,
+            virtual=virtual,
+            in_port_override=virtual_in_name,
+            out_port_override=virtual_out_name,
+            arm_ticks=arm_ticks,
+            dry_run=dry_run,
+        )
+        replay.run()
+        return 0
+
+    # capture channels are extended (port * 16 + channel), as the engine sent them
+    out_ports, _ = assign_output_ports(settings, virtual_out_name)
+    out = build_output(out_ports, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=virtual, burst=settings.midi.burst)
+    out.open()
+    tick_seconds = 60.0 / (bpm * ppq)
+    print(f"Replaying capture from {path} at {bpm} BPM (Ctrl+C to stop)")
+    try:
+        started = time.perf_counter()
+        first = timeline[0][0] if timeline else 0
+        for position, kind, number, channel, value in timeline:
+            delay = started + (position - first) * tick_seconds - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            send_value(out, kind, number, value, channel)
+    except KeyboardInterrupt:
+        print("Replay stopped.")
+    finally:
+        out.close()
+    return 0
+
+
 def cmd_derive(args: argparse.Namespace) -> int:
-    text = derive_scenes(args.log, scene_count=args.scenes)
+    text = derive_scenes(args.log, scene_count=args.scenes, jobs=args.jobs, segmentation=args.segmentation, scene_hints=not args.no_scene_hints)
     if args.output:
         Path(args.output).write_text(text, encoding="utf-8")
         print(f"Wrote scenes to {args.output}")
@@ -165,6 +266,69 @@ def cmd_derive(args: argparse.Namespace) -> int:
     return 0
 
 
+def cmd_render(args: argparse.Namespace) -> int:
+    settings = load_settings(args.config)
+    result = render(
+        settings,
+        output_path=args.output,
+        bars=args.bars,
+        bpm=args.bpm,
+        pattern=args.pattern,
+        arm_ticks=args.arm_ticks,
+        freeze_scene=args.freeze_scene,
+        frozen_lanes=args.freeze_lane,
+        soft_start=args.soft_start,
+        batch=args.batch,
+    )
+    rate = result.ticks / result.seconds if result.seconds > 0 else float("inf")
+    print(f"Rendered {result.bars} bars ({result.ticks} ticks, {result.events} CCs) to {args.output} in {result.seconds:.2f}s ({rate:,.0f} ticks/sec)")
+    return 0
+
+
+def cmd_convert_log(args: argparse.Namespace) -> int:
+    count = convert_log(args.input, args.output)
+    print(f"Converted {count} records from {args.input} to {args.output}")
+    return 0
+
+
+def cmd_index_log(args: argparse.Namespace) -> int:
+    count = build_index(args.log)
+    changes = len(load_index(args.log).scene_changes())
+    print(f"Indexed {count} records ({max(0, changes - 1)} scene changes) for {args.log}")
+    return 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    def progress(result) -> None:
+        size = f"[{result['size']}]" if result["size"] else ""
+        print(f"{result['name']}{size}: {result['ns_per_op']:,.0f} ns/op (median {result['median_ns']:,.0f})")
+
+    document = bench.run_benchmarks(sizes=sizes, min_time=args.min_time, repeat=args.repeat, only=args.only, progress=progress)
+    if args.output:
+        bench.save_results(args.output, document)
+        print(f"Wrote {len(document['results'])} results to {args.output}")
+    if not args.compare:
+        return 0
+    rows = bench.compare(document, bench.load_results(args.compare), threshold=args.threshold)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        size = f"[{row['size']}]" if row["size"] else ""
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']}{size}: {row['baseline_ns']:,.0f} -> {row['ns_per_op']:,.0f} ns/op (x{row['ratio']:.2f}){flag}")
+    print(f"{len(regressions)} of {len(rows)} cases slower than baseline by more than {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def cmd_gen_config(args: argparse.Namespace) -> int:
+    import yaml
+    data = bench.generate_config(args.lanes, args.scenes, seed=args.seed)
+    Path(args.output).write_text(yaml.safe_dump(data, sort_keys=False), encoding="utf-8")
+    print(f"Wrote {args.lanes} lanes x {args.scenes} scenes to {args.output}")
+    return 0
+
+
 def cmd_listen_clock(args: argparse.Namespace) -> int:
     import mido
     settings = load_settings(args.config)
@@ -174,19 +338,16 @@ def cmd_listen_clock(args: argparse.Namespace) -> int:
         return 1
     print(f"Listening for clock on {port_name} for up to {args.timeout} seconds...")
     start_time = time.time()
-    tick_times = []
+    tempo = TempoTracker(ppq=settings.transport.ppq_division)
     clocks = 0
 
     def on_msg(msg):
         nonlocal clocks
         if msg.type == "clock":
+            tempo.tick(time.monotonic())
             clocks += 1
-            tick_times.append(time.time())
-            if clocks % 24 == 0:
-                elapsed = time.time() - start_time
-                if elapsed > 0:
-                    bpm = (clocks / 24) / (elapsed / 60)
-                    print(f"Beat {clocks//24} approx BPM {bpm:.2f}")
+            if clocks % tempo.ppq == 0:
+                print(f"Beat {clocks // tempo.ppq} BPM {tempo.bpm:.2f} jitter {tempo.jitter_rms * 1000:.2f} ms rms, {tempo.jitter_max * 1000:.2f} ms max")
         elif msg.type in ("start", "continue", "stop"):
             print(f"Transport: {msg.type}")
 
@@ -196,6 +357,8 @@ def cmd_listen_clock(args: argparse.Namespace) -> int:
     if clocks == 0:
         print("No clock received.")
         return 1
+    stats = tempo.stats()
+    print(f"{stats['pulses']} pulses, {stats['bpm']:.2f} BPM, {stats['outliers']} outliers, {stats['relocks']} relocks")
     return 0
 
 
@@ -209,7 +372,7 @@ def cmd_send_test(args: argparse.Namespace) -> int:
     if not out_name:
         print("No MIDI output port configured.")
         return 1
-    out = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=False, use_virtual=False)
+    out = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=False, use_virtual=False, burst=settings.midi.burst)
     out.open()
     mode = args.mode
     hold_val = max(0, min(127, args.hold))
@@ -270,9 +433,27 @@ def build_parser() -> argparse.ArgumentParser:
     run_p.add_argument("--arm-ticks", type=int, default=0, help="Require this many clock ticks after Start before emitting CC")
     run_p.add_argument("--freeze-scene", action="store_true", help="Prevent spiral from changing scenes")
     run_p.add_argument("--freeze-lane", action="append", default=[], help="Lane names to freeze (can repeat)")
-    run_p.add_argument("--session-log", help="Write JSONL session log to this path")
-    run_p.add_argument("--replay", help="Replay a JSONL session log instead of running live")
+    run_p.add_argument("--session-log", help="Write session log to this path (binary for .swlog, JSONL otherwise)")
+    run_p.add_argument("--log-queue-size", type=int, default=1024, help="Session log entries buffered for the writer thread before dropping")
+    run_p.add_argument("--log-flush-interval", type=float, default=1.0, help="Seconds between session log flushes")
+    run_p.add_argument("--log-flush-size", type=int, default=64, help="Flush the session log after this many entries")
+    run_p.add_argument("--log-index", action="store_true", help="Write a sidecar bar index (<log>.idx) alongside the session log")
+    run_p.add_argument("--checkpoint", help="Periodically write the full engine state to this file (replaced atomically)")
+    run_p.add_argument("--checkpoint-bars", type=int, default=8, help="Bars between checkpoints (also kept in memory as seek anchors; 0 disables)")
+    run_p.add_argument("--resume-from", help="Restore the engine state from this checkpoint at the next Continue")
+    run_p.add_argument("--stats", action="store_true", help="Record callback, clock and output statistics and log a summary periodically")
+    run_p.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between logged stats summaries (0 = only at exit)")
+    run_p.add_argument("--stats-port", type=int, help="Serve stats in Prometheus text format on http://127.0.0.1:PORT/metrics (implies --stats)")
+    run_p.add_argument("--watch", action="store_true", help="Reload the config when the file changes, at the next bar line, keeping lane and spiral state")
+    run_p.add_argument("--interpolate", action="store_true", help="Glide between lane updates with intermediate CCs timed from the tracked tempo")
+    run_p.add_argument("--capture", help="Record every emitted CC with its clock tick to this capture log (.swcap)")
+    run_p.add_argument("--replay", help="Replay a session log (JSONL or .swlog) or capture log (.swcap) instead of running live")
+    run_p.add_argument("--replay-bpm", type=float, default=120.0, help="Tempo for replaying a capture log without --replay-live")
     run_p.add_argument("--replay-interval", type=float, default=0.5, help="Seconds between log frames during replay")
+    seek = run_p.add_mutually_exclusive_group()
+    seek.add_argument("--replay-from-bar", type=int, help="Start replay at the first record logged at this bar (uses the sidecar index)")
+    seek.add_argument("--replay-from-scene", type=int, help="Start replay at the Nth scene change (0 = start of log)")
+    run_p.add_argument("--replay-bars", type=int, help="Replay only this many bars from the start position (looped with --replay-live)")
     run_p.add_argument("--replay-live", action="store_true", help="Replay log tempo-locked to incoming clock (Start/Stop)")
     run_p.add_argument("--calibrate", action="store_true", help="Calibration mode: sweep CC 0→127→0 repeatedly")
     run_p.add_argument("--calibrate-cc", type=int, help="CC number to use for calibration")
@@ -282,14 +463,77 @@ def build_parser() -> argparse.ArgumentParser:
     run_p.add_argument("--virtual-in-name", help="Name for virtual MIDI input port")
     run_p.add_argument("--virtual-out-name", help="Name for virtual MIDI output port")
     run_p.add_argument("--soft-start", action="store_true", help="Start does not reset lane state (hard reset is default)")
+    run_p.add_argument("--batch", action="store_true", help="Evaluate lanes with the vectorized NumPy engine (requires numpy)")
+    lookahead = run_p.add_mutually_exclusive_group()
+    lookahead.add_argument("--lookahead-ticks", type=int, default=0, help="Precompute CCs this many clock ticks ahead on a worker thread")
+    lookahead.add_argument("--lookahead-bars", type=int, default=0, help="Precompute CCs this many bars ahead on a worker thread")
     run_p.set_defaults(func=cmd_run)
 
-    derive_p = sub.add_parser("derive-scenes", help="Generate scene ranges from a session log (JSONL)")
-    derive_p.add_argument("--log", required=True, help="Path to session log JSONL")
+    host_p = sub.add_parser("host", help="Run one engine per config in a single process on a shared clock input")
+    host_p.add_argument("--config", action="append", required=True, help="Path to YAML/JSON config file (repeat for each engine)")
+    host_p.add_argument("--in-port", help="MIDI input port every engine follows (default: the first config's in_port_name)")
+    host_p.add_argument("--dry-run", action="store_true", help="Print CC events instead of sending MIDI")
+    host_p.add_argument("--arm-ticks", type=int, default=0, help="Require this many clock ticks after Start before emitting CC")
+    host_p.add_argument("--soft-start", action="store_true", help="Start does not reset lane state (hard reset is default)")
+    host_p.add_argument("--session-log-dir", help="Write each engine's session log to <dir>/<config name>.jsonl")
+    host_p.add_argument("--checkpoint-dir", help="Write each engine's checkpoints to <dir>/<config name>.ckpt")
+    host_p.add_argument("--interpolate", action="store_true", help="Glide between lane updates with intermediate CCs timed from the tracked tempo")
+    host_p.add_argument("--stats", action="store_true", help="Record callback, clock and output statistics per engine and log summaries periodically")
+    host_p.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between logged stats summaries (0 = only at exit)")
+    host_p.add_argument("--stats-port", type=int, help="Serve engine i's stats on http://127.0.0.1:PORT+i/metrics (implies --stats)")
+    host_p.add_argument("--watch", action="store_true", help="Reload each config when its file changes, at the next bar line")
+    host_p.add_argument("--virtual", action="store_true", help="Create a virtual MIDI input port (if backend supports)")
+    host_p.add_argument("--virtual-in-name", help="Name for the virtual MIDI input port")
+    host_p.set_defaults(func=cmd_host)
+
+    derive_p = sub.add_parser("derive-scenes", help="Generate scene ranges from a session log (JSONL or .swlog)")
+    derive_p.add_argument("--log", required=True, help="Path to session log")
     derive_p.add_argument("--scenes", type=int, default=8, help="Number of scenes to propose")
+    derive_p.add_argument("--jobs", type=int, default=1, help="Split the log across this many worker processes (equal segmentation)")
+    derive_p.add_argument("--segmentation", choices=["equal", "changepoint"], default="equal", help="Equal-length segments, or change points found in the lane data (needs numpy)")
+    derive_p.add_argument("--no-scene-hints", action="store_true", help="Ignore logged scene changes when finding change points")
     derive_p.add_argument("--output", help="Write derived YAML snippet to this file (otherwise print)")
     derive_p.set_defaults(func=cmd_derive)
 
+    render_p = sub.add_parser("render", help="Render automation offline from a simulated clock (no MIDI ports)")
+    render_p.add_argument("--config", required=True, help="Path to YAML/JSON config file")
+    render_p.add_argument("--output", required=True, help="Write the timestamped CC stream (CSV) to this path")
+    render_p.add_argument("--bars", type=int, default=64, help="Total bars of clock to simulate")
+    render_p.add_argument("--bpm", type=float, default=120.0, help="Tempo used for timestamps")
+    render_p.add_argument("--pattern", help='Transport pattern repeated until --bars, e.g. "start:16,stop:1,continue:16"')
+    render_p.add_argument("--arm-ticks", type=int, default=0, help="Require this many clock ticks after Start before emitting CC")
+    render_p.add_argument("--freeze-scene", action="store_true", help="Prevent spiral from changing scenes")
+    render_p.add_argument("--freeze-lane", action="append", default=[], help="Lane names to freeze (can repeat)")
+    render_p.add_argument("--soft-start", action="store_true", help="Start does not reset lane state (hard reset is default)")
+    render_p.add_argument("--batch", action="store_true", help="Evaluate lanes with the vectorized NumPy engine (requires numpy)")
+    render_p.set_defaults(func=cmd_render)
+
+    convert_p = sub.add_parser("convert-log", help="Convert a session log between JSONL and binary (.swlog)")
+    convert_p.add_argument("--input", required=True, help="Session log to read (format is detected)")
+    convert_p.add_argument("--output", required=True, help="Path to write in the other format")
+    convert_p.set_defaults(func=cmd_convert_log)
+
+    index_p = sub.add_parser("index-log", help="Build the sidecar bar index (<log>.idx) for a session log")
+    index_p.add_argument("--log", required=True, help="Session log to index (JSONL or .swlog)")
+    index_p.set_defaults(func=cmd_index_log)
+
+    bench_p = sub.add_parser("bench", help="Time the engine hot paths on synthetic configs")
+    bench_p.add_argument("--sizes", default=",".join(str(size) for size in bench.SIZES), help="Comma-separated lane/scene counts to benchmark")
+    bench_p.add_argument("--only", help="Run only cases whose name contains this text")
+    bench_p.add_argument("--min-time", type=float, default=bench.MIN_TIME, help="Minimum seconds per timed run")
+    bench_p.add_argument("--repeat", type=int, default=bench.REPEAT, help="Timed runs per case")
+    bench_p.add_argument("--output", help="Save results as JSON to this path")
+    bench_p.add_argument("--compare", help="Baseline results JSON; exit 1 if any case regressed")
+    bench_p.add_argument("--threshold", type=float, default=bench.THRESHOLD, help="Slowdown fraction counted as a regression")
+    bench_p.set_defaults(func=cmd_bench)
+
+    gen_p = sub.add_parser("gen-config", help="Write a synthetic config with many lanes and scenes")
+    gen_p.add_argument("--lanes", type=int, default=100, help="Number of lanes")
+    gen_p.add_argument("--scenes", type=int, default=100, help="Number of scenes")
+    gen_p.add_argument("--seed", type=int, default=0, help="Spiral seed written to the config")
+    gen_p.add_argument("--output", required=True, help="YAML file to write")
+    gen_p.set_defaults(func=cmd_gen_config)
+
     listen_p = sub.add_parser("listen-clock", help="Listen for MIDI clock/start/stop and print ticks/BPM")
     listen_p.add_argument("--config", required=True, help="Path to YAML/JSON config file")
     listen_p.add_argument("--timeout", type=float, default=10.0, help="Seconds to listen before exiting")
@@ -1,8 +1,17 @@
 import logging
+import math
 from collections import defaultdict
-from typing import Callable, Dict, List
+from typing import Callable, Dict, List, Tuple
 
 PPQ = 24  # MIDI clocks per quarter note
+DEFAULT_BPM = 120.0
+PLL_PHASE_GAIN = 0.1  # steady-state alpha; beta follows for critical damping
+OUTLIER_PERIODS = 0.5  # prediction errors are clamped to this many pulse periods
+RELOCK_PERIODS = 8.0  # a pulse this late means the clock stalled; reacquire
+RELOCK_OUTLIERS = 6  # this many clamped errors in a row means the tempo jumped; reacquire
+JITTER_SMOOTHING = 0.02
+
+TickCallback = Callable[[int, int, int], None]
 
 logger = logging.getLogger(__name__)
 
@@ -21,25 +30,181 @@ def parse_division(division: str, ppq: int = PPQ) -> int:
     return ticks_per_event
 
 
+class TempoTracker:
+    """
+    Tempo and timing estimate from clock pulse arrival times.
+
+    A second-order PLL (an alpha-beta filter on pulse index vs. arrival time)
+    predicts when the next pulse is due; each arrival corrects the phase by
+    alpha and the pulse period by beta times the prediction error. The gains
+    start at the least-squares line fit of the pulses seen so far and decay
+    to the steady-state pair, so lock is fast but jitter is filtered once
+    locked. Errors are clamped to OUTLIER_PERIODS so a single late pulse
+    cannot yank the tempo; a gap of RELOCK_PERIODS or a run of
+    RELOCK_OUTLIERS clamped errors (a tempo jump) restarts acquisition.
+    `tick()` is a few float operations, cheap enough for the MIDI callback.
+    """
+
+    def __init__(self, ppq: int = PPQ, bpm: float = DEFAULT_BPM, phase_gain: float = PLL_PHASE_GAIN):
+        self.ppq = ppq
+        self.alpha = phase_gain
+        self.beta = 2.0 - phase_gain - 2.0 * math.sqrt(1.0 - phase_gain)
+        self.period = 60.0 / (bpm * ppq)
+        self.pulses = 0
+        self.outliers = 0
+        self.relocks = 0
+        self.jitter_mean = 0.0
+        self.jitter_square = 0.0
+        self.jitter_max = 0.0
+        self._next: float | None = None
+        self._samples = 0  # pulses since (re)acquisition
+        self._outlier_run = 0
+
+    def reset(self) -> None:
+        """Drops lock (keeping the last period as the starting guess) and clears the statistics."""
+        self.pulses = self.outliers = self.relocks = 0
+        self.jitter_mean = self.jitter_square = self.jitter_max = 0.0
+        self._next = None
+        self._samples = 0
+        self._outlier_run = 0
+
+    @property
+    def locked(self) -> bool:
+        return self._samples > self.ppq
+
+    @property
+    def bpm(self) -> float:
+        return 60.0 / (self.period * self.ppq)
+
+    @property
+    def next_tick_time(self) -> float | None:
+        """Predicted arrival time of the next pulse, on the clock tick() is fed."""
+        return self._next
+
+    @property
+    def jitter_rms(self) -> float:
+        return math.sqrt(self.jitter_square)
+
+    def tick(self, now: float) -> None:
+        self.pulses += 1
+        predicted = self._next
+        if predicted is None or now - predicted > RELOCK_PERIODS * self.period or self._outlier_run >= RELOCK_OUTLIERS:
+            if predicted is not None:
+                self.relocks += 1
+            self._samples = 1
+            self._outlier_run = 0
+            self._next = now + self.period
+            return
+        self._samples = n = self._samples + 1
+        error = now - predicted
+        if self.locked:
+            # jitter is measured against the locked prediction, before this pulse corrects it
+            w = JITTER_SMOOTHING
+            self.jitter_mean += w * (error - self.jitter_mean)
+            self.jitter_square += w * (error * error - self.jitter_square)
+            if abs(error) > self.jitter_max:
+                self.jitter_max = abs(error)
+        limit = OUTLIER_PERIODS * self.period
+        if -limit <= error <= limit:
+            self._outlier_run = 0
+        else:
+            self.outliers += 1
+            self._outlier_run += 1
+            error = limit if error > 0 else -limit
+        # least-squares gains for the first n samples, floored at the steady-state pair
+        alpha = max(self.alpha, 2.0 * (2 * n - 1) / (n * (n + 1)))
+        beta = max(self.beta, 6.0 / (n * (n + 1)))
+        self.period += beta * error
+        self._next = predicted + alpha * error + self.period
+
+    def summary(self) -> str:
+        return (
+            f"{self.bpm:.2f} BPM, jitter {self.jitter_rms * 1000:.2f} ms rms / {self.jitter_max * 1000:.2f} ms max, "
+            f"{self.outliers} outliers, {self.relocks} relocks"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "bpm": self.bpm,
+            "period": self.period,
+            "next_tick_time": self._next,
+            "locked": self.locked,
+            "jitter_rms": self.jitter_rms,
+            "jitter_mean": self.jitter_mean,
+            "jitter_max": self.jitter_max,
+            "pulses": self.pulses,
+            "outliers": self.outliers,
+            "relocks": self.relocks,
+        }
+
+
 class ClockFollower:
     def __init__(self, ppq: int = PPQ, bar_quarters: int = 4):
         self.ppq = ppq
         self.bar_quarters = bar_quarters
-        self.callbacks: Dict[int, List[Callable[[int, int, int], None]]] = defaultdict(list)
+        self.callbacks: Dict[int, List[TickCallback]] = defaultdict(list)
+        self.bar_callbacks: List[TickCallback] = []
         self.running = False
         self.tick_count = 0
         self.quarter = 0
         self.bar = 0
+        self.tempo = TempoTracker(ppq)  # fed with pulse arrival times by whoever receives the MIDI
+        # schedule[phase] -> (callbacks due, quarter boundary, bar boundary); phase = tick_count % period
+        self._schedule: List[Tuple[Tuple[TickCallback, ...], bool, bool]] = []
+        self._schedule_key: Tuple[int, int] | None = None
+        self._period = 1
+        self._phase = 0
+        self._rebuild_schedule()
+
+    def _rebuild_schedule(self) -> None:
+        """
+        Precomputes which callbacks fire on each tick over one LCM period of the
+        bar length and every registered division, so a tick is a table lookup.
+        """
+        ticks_per_bar = self.ppq * self.bar_quarters
+        period = math.lcm(ticks_per_bar, *self.callbacks.keys())
+        interned: Dict[Tuple[TickCallback, ...], Tuple[TickCallback, ...]] = {}
+        schedule = []
+        for phase in range(period):
+            bar_edge = phase % ticks_per_bar == 0
+            due = tuple(self.bar_callbacks) if bar_edge else ()
+            due += tuple(cb for ticks, callbacks in self.callbacks.items() if phase % ticks == 0 for cb in callbacks)
+            due = interned.setdefault(due, due)
+            schedule.append((due, phase % self.ppq == 0, bar_edge))
+        self._schedule = schedule
+        self._schedule_key = (self.ppq, self.bar_quarters)
+        self._period = period
+        self._phase = self.tick_count % period
+        logger.debug("Clock schedule rebuilt: period %s ticks", period)
 
     def reset(self) -> None:
         self.tick_count = 0
         self.quarter = 0
         self.bar = 0
+        if self._schedule_key != (self.ppq, self.bar_quarters):
+            self._rebuild_schedule()
+        self._phase = 0
         logger.debug("Clock reset")
 
-    def register_callback(self, division: str, callback: Callable[[int, int, int], None]) -> None:
+    def set_position(self, tick_count: int, quarter: int, bar: int) -> None:
+        self.tick_count = tick_count
+        self.quarter = quarter
+        self.bar = bar
+        self._phase = tick_count % self._period
+
+    def locate(self, tick_count: int) -> None:
+        """Jumps to the position reached after `tick_count` pulses from Start."""
+        self.set_position(tick_count, tick_count // self.ppq, tick_count // (self.ppq * self.bar_quarters))
+
+    def register_callback(self, division: str, callback: TickCallback) -> None:
         ticks = parse_division(division, ppq=self.ppq)
         self.callbacks[ticks].append(callback)
+        self._rebuild_schedule()
+
+    def register_bar_callback(self, callback: TickCallback) -> None:
+        """Runs on each bar line, before any division callbacks due on the same tick."""
+        self.bar_callbacks.append(callback)
+        self._rebuild_schedule()
 
     def start(self, soft: bool = False) -> None:
         if not soft:
@@ -55,15 +220,18 @@ class ClockFollower:
         if not self.running:
             return
         self.tick_count += 1
+        phase = self._phase + 1
+        if phase == self._period:
+            phase = 0
+        self._phase = phase
+        callbacks, quarter_edge, bar_edge = self._schedule[phase]
 
-        for ticks, callbacks in self.callbacks.items():
-            if self.tick_count % ticks == 0:
-                for cb in callbacks:
-                    cb(self.bar, self.quarter, self.tick_count)
+        for cb in callbacks:
+            cb(self.bar, self.quarter, self.tick_count)
 
-        if self.tick_count % self.ppq == 0:
+        if quarter_edge:
             self.quarter += 1
-            if self.quarter % self.bar_quarters == 0:
+            if bar_edge:
                 self.bar += 1
                 logger.debug("Bar advanced to %s", self.bar)
 
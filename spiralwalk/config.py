@@ -1,10 +1,13 @@
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Tuple
 
 import yaml
 
+from .clock import parse_division
+from .midi_io import HIGH_RES_MAX, OUTPUT_KINDS
+
 
 @dataclass
 class TransportConfig:
@@ -26,6 +29,11 @@ class MidiConfig:
     in_port_name: str | None
     out_port_name: str | None
     max_messages_per_sec: int = 200
+    burst: int | None = None
+    coalesce: bool = False
+    backend: str = "mido"  # or "rtmidi": raw bytes straight to python-rtmidi
+    send_batch: int = 1  # coalesced messages sent per sender wake-up
+    out_ports: List[str] = field(default_factory=list)  # ports lanes without a `port` are spread over
 
 
 @dataclass
@@ -40,6 +48,10 @@ class LaneDefinition:
     shape: str = "linear"
     deadband: int = 0
     slew_limit: int | None = None
+    interpolate: bool = True  # glide between updates when the engine runs with interpolation
+    output: str = "cc"  # cc, cc14 (MSB on cc, LSB on cc + 32) or nrpn
+    nrpn: int | None = None
+    port: str | None = None  # output port; assigned automatically when unset
 
 
 @dataclass
@@ -66,9 +78,20 @@ def _load_file(path: Path) -> Dict[str, Any]:
 
 
 def _parse_lane(raw: Dict[str, Any]) -> LaneDefinition:
+    output = str(raw.get("output", "cc")).lower()
+    if output not in OUTPUT_KINDS:
+        raise ValueError(f"lane {raw['name']}: unknown output {output!r} (expected one of {', '.join(OUTPUT_KINDS)})")
+    nrpn = raw.get("nrpn")
+    if output == "nrpn":
+        if nrpn is None or not 0 <= int(nrpn) <= HIGH_RES_MAX:
+            raise ValueError(f"lane {raw['name']}: nrpn output needs an nrpn parameter number 0-{HIGH_RES_MAX}")
+        nrpn = int(nrpn)
+    cc = int(raw["cc"]) if output != "nrpn" else int(raw.get("cc", 0))
+    if output == "cc14" and not 0 <= cc < 32:
+        raise ValueError(f"lane {raw['name']}: cc14 output needs cc 0-31 (the LSB goes on cc + 32)")
     return LaneDefinition(
         name=raw["name"],
-        cc=int(raw["cc"]),
+        cc=cc,
         channel=int(raw.get("channel", 0)),
         division=str(raw.get("division", "1/16")),
         curve=str(raw.get("curve", "sine")),
@@ -77,6 +100,11 @@ def _parse_lane(raw: Dict[str, Any]) -> LaneDefinition:
         shape=str(raw.get("shape", "linear")),
         deadband=int(raw.get("deadband", 0)),
         slew_limit=raw.get("slew_limit"),
+        # step_hold steps are the point of the curve, so it does not glide unless asked to
+        interpolate=bool(raw.get("interpolate", raw.get("curve", "sine") != "step_hold")),
+        output=output,
+        nrpn=nrpn,
+        port=raw.get("port"),
     )
 
 
@@ -126,6 +154,11 @@ def load_settings(path: str | Path) -> Settings:
         in_port_name=midi_raw.get("in_port_name"),
         out_port_name=midi_raw.get("out_port_name"),
         max_messages_per_sec=int(midi_raw.get("max_messages_per_sec", 200)),
+        burst=int(midi_raw["burst"]) if midi_raw.get("burst") is not None else None,
+        coalesce=bool(midi_raw.get("coalesce", False)),
+        backend=str(midi_raw.get("backend", "mido")).lower(),
+        send_batch=int(midi_raw.get("send_batch", 1)),
+        out_ports=[str(name) for name in midi_raw.get("out_ports") or []],
     )
 
     return Settings(
@@ -135,3 +168,37 @@ def load_settings(path: str | Path) -> Settings:
         spiral=spiral,
         midi=midi,
     )
+
+
+def assign_output_ports(settings: Settings, out_port_override: str | None = None) -> Tuple[List[str | None], Dict[str, int]]:
+    """
+    Output port names and the index of the port each lane sends to. Lanes
+    with a `port` keep it; the rest are spread over `midi.out_ports` (or the
+    single out_port_name) by expected message rate, busiest lane first onto
+    the least loaded port. `out_port_override` renames the single output
+    port, so it cannot be combined with several `midi.out_ports`.
+    """
+    pool: List[str | None] = list(settings.midi.out_ports) or [settings.midi.out_port_name]
+    if out_port_override and len(pool) > 1:
+        raise ValueError(f"an output port override ({out_port_override}) cannot be combined with several midi.out_ports {pool}")
+    if out_port_override:
+        pool[0] = out_port_override
+    ports = list(pool)
+    load = [0.0] * len(ports)
+    assigned: Dict[str, int] = {}
+    auto = []
+    for index, lane in enumerate(settings.lanes):
+        rate = settings.transport.ppq_division * 4 / parse_division(lane.division, ppq=settings.transport.ppq_division)
+        if lane.port is None:
+            auto.append((-rate, index, lane.name))
+            continue
+        if lane.port not in ports:
+            ports.append(lane.port)
+            load.append(0.0)
+        assigned[lane.name] = ports.index(lane.port)
+        load[assigned[lane.name]] += rate
+    for negative_rate, _, name in sorted(auto):
+        port = min(range(len(pool)), key=lambda i: load[i])
+        assigned[name] = port
+        load[port] -= negative_rate
+    return ports, assigned
@@ -1,7 +1,31 @@
+"""
+Scene derivation from session logs.
+
+The log is streamed once into per-segment, per-lane 128-bin histograms of CC
+values, so memory stays flat however long the capture is. The 10th/90th
+percentiles are read off the cumulative counts and equal what `_quantile`
+gives on the sorted values. With `jobs > 1` the log is split into byte
+(JSONL) or record (binary) ranges whose histograms are built in a process
+pool and summed.
+
+`segmentation="changepoint"` replaces the equal-length segments with the ones
+spiralwalk.segment finds in the data.
+"""
+
 import json
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from .segment import changepoint_segments, load_log_matrix, segment_histograms
+from .sessionlog import MISSING, SessionLogReader, is_binary_log
+
+BINS = 128  # CC values 0..127
+COLUMN_CHUNK = 1 << 16  # bars read per lane column slice
+
+Histograms = List[Dict[str, List[int]]]  # per segment: lane -> counts per CC value
 
 
 def _quantile(values: List[int], q: float) -> float:
@@ -16,38 +40,190 @@ def _quantile(values: List[int], q: float) -> float:
     return values[f] + (values[c] - values[f]) * (k - f)
 
 
-def _segment_ranges(bars: List[Dict[str, int]], scene_count: int) -> List[Dict[str, Tuple[int, int]]]:
-    if not bars:
+def _value_at_rank(counts: Sequence[int], rank: int) -> int:
+    seen = 0
+    for value, count in enumerate(counts):
+        seen += count
+        if seen > rank:
+            return value
+    raise IndexError(rank)
+
+
+def _histogram_quantile(counts: Sequence[int], q: float) -> float:
+    """Same result as _quantile over the values the histogram counts."""
+    total = sum(counts)
+    if not total:
+        return 0
+    k = (total - 1) * q
+    f = int(k)
+    c = min(f + 1, total - 1)
+    low = _value_at_rank(counts, f)
+    if f == c:
+        return low
+    high = _value_at_rank(counts, c)
+    return low + (high - low) * (k - f)
+
+
+def _segment_size(bar_count: int, scene_count: int) -> int:
+    return max(1, bar_count // scene_count)
+
+
+def _segment_bounds(segment: int, segment_size: int, scene_count: int, bar_count: int) -> Tuple[int, int]:
+    # equal-length segments; the last one takes the remainder
+    start = segment * segment_size
+    end = (segment + 1) * segment_size if segment < scene_count - 1 else bar_count
+    return start, end
+
+
+def _empty_histograms(scene_count: int) -> Histograms:
+    return [{} for _ in range(scene_count)]
+
+
+def _add_frame(segment: Dict[str, List[int]], frame: Dict) -> None:
+    for lane, value in frame.items():
+        counts = segment.get(lane)
+        if counts is None:
+            counts = segment[lane] = [0] * BINS
+        counts[max(0, min(BINS - 1, int(value)))] += 1
+
+
+def _binary_histograms(path: str, start: int, stop: int, segment_size: int, scene_count: int) -> Histograms:
+    """Histograms for records [start, stop) of a binary log."""
+    histograms = _empty_histograms(scene_count)
+    with SessionLogReader(path) as reader:
+        for segment in range(scene_count):
+            seg_start, seg_end = _segment_bounds(segment, segment_size, scene_count, reader.count)
+            low, high = max(start, seg_start), min(stop, seg_end)
+            if low >= high:
+                continue
+            for lane in reader.lane_names:
+                tally: Counter = Counter()
+                for chunk in range(low, high, COLUMN_CHUNK):
+                    tally.update(reader.lane_column(lane, chunk, min(high, chunk + COLUMN_CHUNK)))
+                tally.pop(MISSING, None)
+                if not tally:
+                    continue
+                counts = histograms[segment].setdefault(lane, [0] * BINS)
+                for value, count in tally.items():
+                    counts[min(BINS - 1, value)] += count
+    return histograms
+
+
+def _iter_jsonl_lines(path: str, start: int, end: int):
+    with Path(path).open("rb") as handle:
+        handle.seek(start)
+        position = start
+        for line in handle:
+            if position >= end:
+                return
+            position += len(line)
+            if line.strip():
+                yield line
+
+
+def _jsonl_line_count(path: str, start: int, end: int) -> int:
+    return sum(1 for _ in _iter_jsonl_lines(path, start, end))
+
+
+def _jsonl_histograms(path: str, start: int, end: int, first_bar: int, segment_size: int, scene_count: int) -> Histograms:
+    """Histograms for the lines in bytes [start, end) of a JSONL log; first_bar is the index of its first entry."""
+    histograms = _empty_histograms(scene_count)
+    for bar, line in enumerate(_iter_jsonl_lines(path, start, end), start=first_bar):
+        lanes = json.loads(line).get("lanes", {})
+        if lanes:
+            _add_frame(histograms[min(bar // segment_size, scene_count - 1)], lanes)
+    return histograms
+
+
+def _jsonl_chunks(path: str, jobs: int) -> List[Tuple[int, int]]:
+    """Byte ranges that start on line boundaries."""
+    size = Path(path).stat().st_size
+    bounds = [0]
+    with Path(path).open("rb") as handle:
+        for i in range(1, jobs):
+            handle.seek(size * i // jobs)
+            handle.readline()
+            position = handle.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _map(jobs: int, func: Callable, tasks: List[tuple]) -> List:
+    if jobs <= 1 or len(tasks) <= 1:
+        return [func(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+        return list(pool.map(func, *zip(*tasks)))
+
+
+def _merge(parts: List[Histograms], scene_count: int) -> Histograms:
+    merged = _empty_histograms(scene_count)
+    for part in parts:
+        for segment, lanes in zip(merged, part):
+            for lane, counts in lanes.items():
+                total = segment.get(lane)
+                if total is None:
+                    segment[lane] = list(counts)
+                else:
+                    segment[lane] = [a + b for a, b in zip(total, counts)]
+    return merged
+
+
+def derive_histograms(log_path: str, scene_count: int = 8, jobs: int = 1) -> Histograms:
+    """Per-segment, per-lane CC histograms over `scene_count` equal-length segments of the log."""
+    log_path = str(log_path)
+    jobs = max(1, jobs)
+    if is_binary_log(log_path):
+        with SessionLogReader(log_path) as reader:
+            bar_count = reader.count
+        if not bar_count:
+            return []
+        segment_size = _segment_size(bar_count, scene_count)
+        step = -(-bar_count // jobs)
+        tasks = [(log_path, start, min(bar_count, start + step), segment_size, scene_count) for start in range(0, bar_count, step)]
+        return _merge(_map(jobs, _binary_histograms, tasks), scene_count)
+
+    chunks = _jsonl_chunks(log_path, jobs)
+    line_counts = _map(jobs, _jsonl_line_count, [(log_path, start, end) for start, end in chunks])
+    bar_count = sum(line_counts)
+    if not bar_count:
         return []
-    segment_size = max(1, len(bars) // scene_count)
+    segment_size = _segment_size(bar_count, scene_count)
+    first_bars = [0] + list(accumulate(line_counts))[:-1]
+    tasks = [(log_path, start, end, first, segment_size, scene_count) for (start, end), first in zip(chunks, first_bars)]
+    return _merge(_map(jobs, _jsonl_histograms, tasks), scene_count)
+
+
+def _ranges_from_histograms(histograms: Histograms) -> List[Dict[str, Tuple[int, int]]]:
     scenes: List[Dict[str, Tuple[int, int]]] = []
-    for i in range(scene_count):
-        start = i * segment_size
-        end = (i + 1) * segment_size if i < scene_count - 1 else len(bars)
-        segment = bars[start:end]
-        lane_values: Dict[str, List[int]] = defaultdict(list)
-        for bar in segment:
-            for lane, val in bar.items():
-                lane_values[lane].append(int(val))
+    for segment in histograms:
         scene_ranges: Dict[str, Tuple[int, int]] = {}
-        for lane, vals in lane_values.items():
-            lo = int(_quantile(vals, 0.1))
-            hi = int(_quantile(vals, 0.9))
+        for lane, counts in segment.items():
+            lo = int(_histogram_quantile(counts, 0.1))
+            hi = int(_histogram_quantile(counts, 0.9))
             scene_ranges[lane] = (lo, hi)
         scenes.append(scene_ranges)
     return scenes
 
 
-def derive_scenes(log_path: str, scene_count: int = 8) -> str:
-    bars: List[Dict[str, int]] = []
-    for line in Path(log_path).read_text().splitlines():
-        if not line.strip():
-            continue
-        data = json.loads(line)
-        lanes = {k: int(v) for k, v in data.get("lanes", {}).items()}
-        bars.append(lanes)
+def changepoint_histograms(log_path: str, scene_count: int = 8, scene_hints: bool = True) -> Histograms:
+    """Histograms over the segments chosen by change-point segmentation (needs numpy)."""
+    lane_names, values, scenes = load_log_matrix(log_path)
+    segments = changepoint_segments(values, scene_count, scenes=scenes if scene_hints else None)
+    if not segments:
+        return []
+    return segment_histograms(lane_names, values, segments, scene_count)
+
 
-    scenes = _segment_ranges(bars, scene_count=scene_count)
+def derive_scenes(log_path: str, scene_count: int = 8, jobs: int = 1, segmentation: str = "equal", scene_hints: bool = True) -> str:
+    if segmentation == "equal":
+        histograms = derive_histograms(log_path, scene_count=scene_count, jobs=jobs)
+    elif segmentation == "changepoint":
+        histograms = changepoint_histograms(log_path, scene_count=scene_count, scene_hints=scene_hints)
+    else:
+        raise ValueError(f"Unknown segmentation: {segmentation}")
+    scenes = _ranges_from_histograms(histograms)
     lines = ["scenes:"]
     for idx, scene in enumerate(scenes, start=1):
         lines.append(f"  scene{idx}:")
@@ -1,19 +1,84 @@
-import json
 import logging
+import math
 import signal
 import threading
 import time
+import zlib
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
-from .clock import ClockFollower
-from .config import Settings
-from .lanes import Lane
-from .midi_io import MidiInput, MidiOutput
-from .spiral import SpiralWalker
+from .batch import LaneBatch, adjust_ranges, require_numpy
+from .capture import CaptureLog
+from .checkpoint import CheckpointWriter, read_checkpoint
+from .clock import ClockFollower, TempoTracker, parse_division
+from .config import LaneDefinition, Settings, assign_output_ports
+from .interpolate import Interpolator
+from .lanes import Lane, LaneState
+from .lookahead import LookaheadBuffer
+from .reload import ConfigWatcher, ReloadPlan, diff_settings
+from .midi_io import MidiInput, build_output
+from .scenes import SceneTable
+from .sessionlog import AsyncSessionLog, JsonlSessionLog, open_session_log
+from .spiral import SpiralState, SpiralWalker
+from .stats import STATS_INTERVAL, EngineStats, StatsReporter
 
 logger = logging.getLogger(__name__)
 
+SEEK_WARMUP_BARS = 1  # simulated silently at the end of a seek to rebuild output and meta-lane values
+CHECKPOINT_BARS = 8
+SEEK_ANCHORS = 64  # in-memory checkpoints kept as starting points for seeks
+
+
+class _Discard:
+    """Output sink for ticks simulated during a seek."""
+
+    def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        pass
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        pass
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        pass
+
+
+@dataclass
+class EngineSnapshot:
+    """Everything needed to put the engine back at an exact clock position."""
+
+    tick_count: int
+    quarter: int
+    bar: int
+    running: bool
+    spiral_scene: int
+    spiral_bar: int
+    spiral_history: List[int]
+    spiral_random: tuple
+    current_scene_index: int
+    lane_states: Dict[str, LaneState]
+    lane_random: Dict[str, tuple]
+    last_values: Dict[str, int]
+    armed: bool
+    ticks_since_start: int
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "EngineSnapshot":
+        def rng_state(state) -> tuple:
+            # random.getstate(): (version, 625-int tuple, gauss_next)
+            version, internal, gauss = state
+            return version, tuple(internal), gauss
+
+        fields = dict(data)
+        fields["spiral_random"] = rng_state(data["spiral_random"])
+        fields["lane_states"] = {name: LaneState(**state) for name, state in data["lane_states"].items()}
+        fields["lane_random"] = {name: rng_state(state) for name, state in data["lane_random"].items()}
+        return cls(**fields)
+
 
 class AutomationEngine:
     def __init__(
@@ -29,6 +94,23 @@ class AutomationEngine:
         in_port_override: str | None = None,
         out_port_override: str | None = None,
         soft_start: bool = False,
+        batch: bool = False,
+        lookahead_ticks: int = 0,
+        log_queue_size: int = 1024,
+        log_flush_interval: float = 1.0,
+        log_flush_size: int = 64,
+        capture_path: str | None = None,
+        log_index: bool = False,
+        checkpoint_path: str | None = None,
+        checkpoint_bars: int = CHECKPOINT_BARS,
+        resume_from: str | None = None,
+        interpolate: bool = False,
+        stats: bool = False,
+        stats_interval: float = STATS_INTERVAL,
+        stats_port: int | None = None,
+        tempo: TempoTracker | None = None,
+        own_input: bool = True,
+        watch_config: str | None = None,
     ):
         self.settings = settings
         self.dry_run = dry_run
@@ -41,9 +123,16 @@ class AutomationEngine:
         self.in_port_override = in_port_override
         self.out_port_override = out_port_override
         self.soft_start = soft_start
+        self.batch = batch
+        if batch:
+            require_numpy()
 
         self.clock = ClockFollower(ppq=settings.transport.ppq_division)
-        self.lanes: Dict[str, Lane] = {}
+        if tempo is not None:
+            self.clock.tempo = tempo  # shared with other engines and fed by their host
+        # a stats port implies stats
+        self.stats = EngineStats(self.clock.tempo) if stats or stats_port is not None else None
+        self.stats_reporter = StatsReporter(self.stats, interval=stats_interval, port=stats_port) if self.stats else None
         seed = settings.spiral.seed
         self.spiral = SpiralWalker(
             scene_count=len(settings.scenes),
@@ -54,23 +143,62 @@ class AutomationEngine:
         )
         self.current_scene_index = 0
         in_name = in_port_override or settings.midi.in_port_name
-        out_name = out_port_override or settings.midi.out_port_name
-        self.input_port = MidiInput(in_name, callback=self._on_midi_message, use_virtual=self.virtual_in)
-        self.output_port = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=self.virtual_out)
+        # lanes send on Lane.out_channel, which carries the port index to midi_io.ShardedOutput
+        self._out_ports, self._lane_ports = assign_output_ports(settings, out_port_override)
+        # without its own input the engine is fed through observe()/dispatch() (see host.EngineHost)
+        self.input_port = MidiInput(in_name, callback=self._on_midi_message, use_virtual=self.virtual_in) if own_input else None
+        self.output_port = build_output(self._out_ports, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=dry_run, use_virtual=self.virtual_out, burst=settings.midi.burst, coalesce=settings.midi.coalesce, backend=settings.midi.backend, send_batch=settings.midi.send_batch)
         self._stop_event = threading.Event()
+        self.lanes = {lane_def.name: self._make_lane(lane_def, self._lane_ports, seed) for lane_def in settings.lanes}
+        self._meta_lanes = self._find_meta_lanes(self.lanes)
+        self._meta_lane_names = {lane.name for lane in self.lanes.values() if (lane.role or "").lower() in {"restraint", "contrast"}}
+        # high-res lanes compute 0-16383; last_values, logs and meta levels keep the 7-bit MSB
+        self._high_res_lanes = {lane.name for lane in self.lanes.values() if lane.high_res}
+        self._division_lanes = self._group_lanes_by_division(self.lanes)
+        self._registered_divisions: set[str] = set()
         self._register_division_callbacks()
-        self._build_lanes(seed)
+        self._batches: Dict[str, List[Tuple[bool, LaneBatch]]] = self._build_batches(self._division_lanes) if batch else {}
         self.last_values: Dict[str, int] = {}
         self.armed = self.arm_ticks == 0
         self._ticks_since_start = 0
-        self._log_handle = None
-        self._scene_order = self._build_scene_order()
+        self._lane_index = {name: i for i, name in enumerate(self.lanes)}
+        self._division_ticks = {division: parse_division(division, ppq=self.clock.ppq) for division in self._division_lanes}
+        # kept apart from output_port, which the lookahead worker swaps out while it renders
+        self._interpolator = Interpolator(self.output_port, self.clock.tempo, self._glide_lanes(settings, self.lanes)) if interpolate else None
+        if self._interpolator:
+            self.output_port = self._interpolator
+        self.capture = (
+            CaptureLog(capture_path, [(lane.name, lane.cc, lane.channel, lane.port, lane.output, lane.nrpn) for lane in self.lanes.values()], ppq=self.clock.ppq)
+            if capture_path
+            else None
+        )
+        self.session_log = None
+        if self.session_log_path:
+            writer = open_session_log(self.session_log_path, list(self.lanes), frozen_scene=freeze_scene, frozen_lanes=sorted(self.frozen_lanes), index=log_index)
+            self.session_log = AsyncSessionLog(writer, queue_size=log_queue_size, flush_interval=log_flush_interval, flush_size=log_flush_size)
+        # binary logs fix their lane columns when opened
+        self._log_lanes_fixed = self.session_log is not None and not isinstance(self.session_log.writer, JsonlSessionLog)
+        self.checkpoint_bars = max(0, checkpoint_bars)
+        self.checkpoints = CheckpointWriter(checkpoint_path) if checkpoint_path else None
+        self._checkpoint_due = False
+        self._anchors: "OrderedDict[int, EngineSnapshot]" = OrderedDict()
+        # also a seek anchor until Start drops it (see _reset_anchors)
+        self._resume: EngineSnapshot | None = EngineSnapshot.from_dict(read_checkpoint(resume_from)) if resume_from else None
+        self._scene_order = self._build_scene_order(settings)
+        self.scene_table = SceneTable(settings, self._scene_order)
+        self._reload: ReloadPlan | None = None  # prepared off the clock thread, swapped in on a bar line
+        self.watcher = ConfigWatcher(watch_config, self.request_reload) if watch_config else None
         self._hard_reset_state()
+        if self.stats:
+            self.stats.output = self.output_port
+            self.stats.session_log = self.session_log
+        self.lookahead = LookaheadBuffer(self, lookahead_ticks) if lookahead_ticks > 0 else None
 
-    def _build_scene_order(self) -> List[str]:
-        if self.settings.transport.scene_order:
-            return self.settings.transport.scene_order
-        keys = list(self.settings.scenes.keys())
+    @staticmethod
+    def _build_scene_order(settings: Settings) -> List[str]:
+        if settings.transport.scene_order:
+            return settings.transport.scene_order
+        keys = list(settings.scenes.keys())
         # natural sort for names like scene1, scene2, scene10
         def nat_key(k: str) -> List:
             import re
@@ -78,31 +206,95 @@ class AutomationEngine:
 
         return sorted(keys, key=nat_key)
 
-    def _build_lanes(self, seed: int | None) -> None:
-        for lane_def in self.settings.lanes:
-            lane_seed = None if seed is None else hash((lane_def.name, seed)) & 0xFFFFFFFF
-            lane = Lane(
-                name=lane_def.name,
-                cc=lane_def.cc,
-                channel=lane_def.channel,
-                division=lane_def.division,
-                curve=lane_def.curve,
-                smoothing=lane_def.smoothing,
-                role=lane_def.role,
-                shape=lane_def.shape,
-                deadband=lane_def.deadband,
-                slew_limit=lane_def.slew_limit,
-            )
-            if lane_seed is not None:
-                lane.rng.seed(lane_seed)
-            self.lanes[lane.name] = lane
+    def _make_lane(self, lane_def: LaneDefinition, lane_ports: Dict[str, int], seed: int | None) -> Lane:
+        # crc32 rather than hash(): str hashing is salted per process, which broke reproducible runs
+        lane_seed = None if seed is None else zlib.crc32(f"{lane_def.name}:{seed}".encode("utf-8"))
+        lane = Lane(
+            name=lane_def.name,
+            cc=lane_def.cc,
+            channel=lane_def.channel,
+            division=lane_def.division,
+            curve=lane_def.curve,
+            smoothing=lane_def.smoothing,
+            role=lane_def.role,
+            shape=lane_def.shape,
+            deadband=lane_def.deadband,
+            slew_limit=lane_def.slew_limit,
+            output=lane_def.output,
+            nrpn=lane_def.nrpn,
+            port=lane_ports[lane_def.name],
+        )
+        if lane_seed is not None:
+            lane.rng.seed(lane_seed)
+        return lane
+
+    @staticmethod
+    def _group_lanes_by_division(lanes: Dict[str, Lane]) -> Dict[str, List[Lane]]:
+        # meta lanes first so their fresh values scale the rest of the group
+        ordered_lanes = sorted(lanes.values(), key=lambda l: 0 if (l.role or "").lower() in {"restraint", "contrast"} else 1)
+        groups: Dict[str, List[Lane]] = {}
+        for lane in ordered_lanes:
+            groups.setdefault(lane.division, []).append(lane)
+        return groups
+
+    @staticmethod
+    def _build_batches(division_lanes: Dict[str, List[Lane]]) -> Dict[str, List[Tuple[bool, LaneBatch]]]:
+        # meta lanes get their own batch so they update before the lanes they scale
+        batches: Dict[str, List[Tuple[bool, LaneBatch]]] = {}
+        for division, lanes in division_lanes.items():
+            meta = [lane for lane in lanes if (lane.role or "").lower() in {"restraint", "contrast"}]
+            rest = [lane for lane in lanes if (lane.role or "").lower() not in {"restraint", "contrast"}]
+            batches[division] = [(is_meta, LaneBatch(group)) for is_meta, group in ((True, meta), (False, rest)) if group]
+        return batches
+
+    def _glide_lanes(self, settings: Settings, lanes: Dict[str, Lane]) -> Dict[Tuple[str, int, int], Tuple[int, int]]:
+        return {
+            (d.output, lanes[d.name].out_channel, d.nrpn if d.output == "nrpn" else d.cc): (parse_division(d.division, ppq=self.clock.ppq), d.deadband)
+            for d in settings.lanes
+            if d.interpolate
+        }
 
     def _register_division_callbacks(self) -> None:
-        divisions = {lane.division for lane in self.settings.lanes}
-        for division in divisions:
-            self.clock.register_callback(division, lambda bar, quarter, tick, d=division: self._on_division(d, bar, quarter, tick))
+        self.clock.register_bar_callback(self._on_bar)
+        for division in self._division_lanes:
+            self._register_division(division)
+
+    def _register_division(self, division: str) -> None:
+        callback = lambda bar, quarter, tick, d=division: self._on_division(d, bar, quarter, tick)
+        if self.stats:
+            callback = self.stats.timed(division, callback, time.perf_counter)
+        self.clock.register_callback(division, callback)
+        self._registered_divisions.add(division)
 
     def _on_midi_message(self, message) -> None:
+        # arrival time, before the lookahead worker decouples computation from it
+        now = time.monotonic()
+        self.observe(message, now)
+        if message.type == "clock":
+            self.clock.tempo.tick(now)
+        self.dispatch(message)
+
+    def observe(self, message, now: float) -> None:
+        """Records a message's arrival time in the stats; call before the tempo tracker sees it."""
+        if not self.stats:
+            return
+        if message.type == "clock":
+            self.stats.on_clock(now, self.clock.tempo.next_tick_time)
+        elif message.type in ("start", "stop", "continue"):
+            self.stats.on_transport()
+
+    def dispatch(self, message) -> None:
+        """Applies a received message to the engine (through the lookahead buffer when there is one)."""
+        if self.lookahead:
+            self.lookahead.on_message(message)
+            return
+        self._handle_message(message)
+
+    def _handle_message(self, message) -> None:
+        if self._reload is not None and (
+            not self.clock.running or message.type == "clock" and (self.clock.tick_count + 1) % (self.clock.ppq * self.clock.bar_quarters) == 0
+        ):
+            self._apply_reload(self._reload)
         if message.type == "clock":
             self.clock.handle_message("clock")
             if self.clock.running and not self.armed:
@@ -110,112 +302,147 @@ class AutomationEngine:
                 if self._ticks_since_start >= self.arm_ticks:
                     self.armed = True
                     logger.info("Engine armed after %s ticks", self._ticks_since_start)
+            if self._checkpoint_due:
+                self._checkpoint()
         elif message.type == "start":
+            if self._resume:
+                logger.info("Start received; dropping the pending resume checkpoint")
+                self._resume = None
             self.clock.handle_message("start")
-            if not self.soft_start:
+            if self.soft_start:
+                self._reset_anchors()  # positions restart at 0, so anchors from the last take no longer line up
+            else:
                 self._hard_reset_state()
             self.armed = self.arm_ticks == 0
             self._ticks_since_start = 0
         elif message.type == "stop":
             self.clock.handle_message("stop")
             self.armed = False
+            if self.checkpoints:
+                self.checkpoints.submit(self.snapshot_state())
         elif message.type == "continue":
+            if self._resume:
+                self.restore_state(self._resume)
+                logger.info("Resumed from checkpoint at bar %s tick %s", self.clock.bar + 1, self.clock.tick_count)
+                self._resume = None
             self.clock.start(soft=True)
             if self.arm_ticks == 0:
                 self.armed = True
             else:
                 self.armed = False
                 self._ticks_since_start = 0
+        elif message.type == "songpos":
+            # Song Position Pointer counts MIDI beats (sixteenth notes)
+            self.seek(message.pos * self.clock.ppq // 4)
 
-    def _scene_for_index(self, idx: int) -> Dict:
-        order = self._scene_order
-        scene_name = order[idx % len(order)]
-        return self.settings.scenes[scene_name]
+    @staticmethod
+    def _find_meta_lanes(lanes: Dict[str, Lane]) -> Tuple[str | None, str | None]:
+        # the first lane with each meta role drives it, matching config order
+        def first(role: str) -> str | None:
+            for lane in lanes.values():
+                if (lane.role or "").lower() == role:
+                    return lane.name
+            return None
 
-    def _on_division(self, division: str, bar: int, quarter: int, tick: int) -> None:
+        return first("restraint"), first("contrast")
+
+    def _on_bar(self, bar: int, quarter: int, tick: int) -> None:
         if not self.armed:
             return
-        ticks_per_bar = self.clock.ppq * self.clock.bar_quarters
-        if tick % ticks_per_bar == 0:
-            logger.info("Bar %s Scene %s", bar + 1, self.current_scene_index)
-            self._log_bar(bar)
-            if not self.freeze_scene and bar and bar % self.settings.transport.phrase_bars == 0:
-                self.current_scene_index = self.spiral.on_phrase_boundary()
+        logger.info("Bar %s Scene %s", bar + 1, self.current_scene_index)
+        self._log_bar(bar)
+        if self.checkpoint_bars and bar % self.checkpoint_bars == 0:
+            self._checkpoint_due = True  # taken once the whole tick has run
+        if not self.freeze_scene and bar and bar % self.settings.transport.phrase_bars == 0:
+            self.current_scene_index = self.spiral.on_phrase_boundary()
 
-        scene = self._scene_for_index(self.current_scene_index)
-        ordered_lanes = sorted(self.lanes.values(), key=lambda l: 0 if (l.role or "").lower() in {"restraint", "contrast"} else 1)
-        for lane in ordered_lanes:
-            if lane.division != division:
-                continue
-            scene_params = scene.get(lane.name)
-            if not scene_params:
+    def _on_division(self, division: str, bar: int, quarter: int, tick: int) -> None:
+        if not self.armed:
+            return
+        scene_index = self.current_scene_index % len(self.scene_table)
+        if self.batch:
+            self._on_division_batch(division, scene_index, tick)
+            return
+        row = self.scene_table.rows[scene_index]
+        last_values = self.last_values
+        capture = self.capture
+        for lane in self._division_lanes[division]:
+            name = lane.name
+            params = row.get(name)
+            if params is None:
                 continue
-            if lane.name in self.frozen_lanes and lane.name in self.last_values:
+            if name in self.frozen_lanes and name in last_values:
                 continue
-            sp = scene_params.__dict__ if hasattr(scene_params, "__dict__") else dict(scene_params)
-            adjusted_params = self._apply_meta_to_scene(sp, lane)
-            value = lane.next_value(adjusted_params)
+            if name not in self._meta_lane_names:
+                restraint, contrast = self._meta_levels()
+                params = self.scene_table.adjusted(scene_index, name, restraint, contrast)
+            value = lane.next_value(params)
             if value is None:
                 continue
-            self.last_values[lane.name] = value
-            self.output_port.send_cc(lane.cc, value, channel=lane.channel)
+            if capture:
+                capture.record(tick, self._lane_index[name], scene_index, self._division_ticks[division], value)
+            if name in self._high_res_lanes:
+                self._send_high_res(lane, value)
+                value >>= 7
+            else:
+                self.output_port.send_cc(lane.cc, value, channel=lane.out_channel)
+            last_values[name] = value
+
+    def _on_division_batch(self, division: str, scene_index: int, tick: int) -> None:
+        capture = self.capture
+        for is_meta, batch in self._batches.get(division, []):
+            params = batch.compile_scene(self.scene_table.rows[scene_index])
+            due = params.active.copy()
+            if self.frozen_lanes:
+                for i, name in enumerate(batch.names):
+                    if name in self.frozen_lanes and name in self.last_values:
+                        due[i] = False
+            scene_min, scene_max = params.scene_min, params.scene_max
+            if not is_meta:
+                restraint, contrast = self._meta_levels()
+                scene_min, scene_max = adjust_ranges(scene_min, scene_max, restraint / 127.0, contrast / 127.0)
+            values, emit = batch.step(params, due, scene_min, scene_max)
+            for i in emit.nonzero()[0].tolist():
+                lane = batch.lanes[i]
+                value = int(values[i])
+                if capture:
+                    capture.record(tick, self._lane_index[lane.name], scene_index, self._division_ticks[division], value)
+                if lane.name in self._high_res_lanes:
+                    self._send_high_res(lane, value)
+                    value >>= 7
+                else:
+                    self.output_port.send_cc(lane.cc, value, channel=lane.out_channel)
+                self.last_values[lane.name] = value
+
+    def _send_high_res(self, lane: Lane, value: int) -> None:
+        if lane.output == "nrpn":
+            self.output_port.send_nrpn(lane.nrpn, value, channel=lane.out_channel)
+        else:
+            self.output_port.send_cc14(lane.cc, value, channel=lane.out_channel)
 
     def _log_bar(self, bar: int) -> None:
-        if not self.session_log_path:
+        if not self.session_log:
             return
-        if self._log_handle is None:
-            self._log_handle = self.session_log_path.open("a", encoding="utf-8")
         entry = {
             "timestamp": time.time(),
             "bar": bar,
             "scene_index": self.current_scene_index,
             "frozen_scene": self.freeze_scene,
             "frozen_lanes": sorted(self.frozen_lanes),
-            "lanes": self.last_values,
+            "lanes": dict(self.last_values),
         }
-        self._log_handle.write(json.dumps(entry) + "\n")
-        self._log_handle.flush()
-
-    def _meta_values(self) -> Dict[str, float]:
-        def norm(role: str) -> float:
-            for lane in self.lanes.values():
-                if (lane.role or "").lower() == role:
-                    val = self.last_values.get(lane.name)
-                    return (val or 0) / 127.0
-            return 0.0
-
-        return {"restraint": norm("restraint"), "contrast": norm("contrast")}
-
-    def _apply_meta_to_scene(self, scene_params: Dict, lane: Lane) -> Dict:
-        role = (lane.role or "").lower()
-        if role in {"restraint", "contrast"}:
-            return scene_params
+        self.session_log.write(entry)
 
-        meta = self._meta_values()
-        scene_min = int(scene_params.get("min", 0))
-        scene_max = int(scene_params.get("max", 127))
-        midpoint = (scene_min + scene_max) / 2
-        half_range = max(1.0, (scene_max - scene_min) / 2)
-
-        restraint = meta["restraint"]
-        contrast = meta["contrast"]
-
-        # shrink/expand ranges
-        half_range *= (1 - 0.8 * restraint)
-        half_range *= (1 + 0.8 * contrast)
-
-        new_min = max(0, int(midpoint - half_range))
-        new_max = min(127, int(midpoint + half_range))
-        scene_params = dict(scene_params)
-        scene_params["min"] = new_min
-        scene_params["max"] = new_max
-        return scene_params
+    def _meta_levels(self) -> Tuple[int, int]:
+        """Current restraint/contrast CC values (0 until the meta lane has output)."""
+        restraint_lane, contrast_lane = self._meta_lanes
+        restraint = self.last_values.get(restraint_lane, 0) if restraint_lane else 0
+        contrast = self.last_values.get(contrast_lane, 0) if contrast_lane else 0
+        return restraint, contrast
 
     def run(self) -> None:
         logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
-        self.input_port.open()
-        self.output_port.open()
-        self._stop_event.clear()
+        self.start()
 
         def stop_signal(*_: int) -> None:
             logger.info("Received stop signal, shutting down.")
@@ -229,15 +456,346 @@ class AutomationEngine:
             while not self._stop_event.is_set():
                 time.sleep(0.01)
         finally:
+            self.shutdown()
+
+    def start(self) -> None:
+        """Opens the output, the worker threads and the input port (unless the input is shared)."""
+        self.output_port.open()
+        if self.lookahead:
+            self.lookahead.start()
+        if self.input_port:
+            self.input_port.open()
+        if self.stats_reporter:
+            self.stats_reporter.start()
+        if self.watcher:
+            self.watcher.start()
+        self._stop_event.clear()
+
+    def shutdown(self) -> None:
+        """Closes everything start() opened, draining the logs and writing the last checkpoint."""
+        if self.watcher:
+            self.watcher.stop()
+        if self.input_port:
             self.input_port.close()
-            self.output_port.close()
-            if self._log_handle:
-                self._log_handle.close()
+            if self.clock.tempo.pulses:
+                logger.info("Clock: %s", self.clock.tempo.summary())
+        if self.lookahead:
+            self.lookahead.stop()
+        self.output_port.close()
+        if self.session_log:
+            self.session_log.close()
+        if self.capture:
+            self.capture.close()
+        if self.checkpoints:
+            self.checkpoints.close()
+        if self.stats_reporter:
+            self.stats_reporter.stop()
+
+    def request_reload(self, settings: Settings) -> None:
+        """
+        Diffs `settings` against the running config and prepares the swap,
+        which the clock thread makes at the next bar line. Call it off the
+        clock thread; raises ValueError for changes that need a restart.
+        """
+        plan = self._prepare_reload(settings)
+        if plan is None:
+            logger.info("Config reload: no changes")
+            return
+        logger.info("Config reload prepared (%s); applying at the next bar", plan.diff.describe())
+        self._reload = plan
+
+    def _prepare_reload(self, settings: Settings) -> ReloadPlan | None:
+        base = self.settings
+        diff = diff_settings(base, settings)
+        if settings.transport.ppq_division != base.transport.ppq_division:
+            raise ValueError("ppq_division cannot change while running")
+        if diff.midi:
+            logger.warning("Config reload: changes to the midi section take effect after a restart")
+            settings = replace(settings, midi=base.midi)
+        out_ports, lane_ports = assign_output_ports(settings, self.out_port_override)
+        if out_ports != self._out_ports:
+            raise ValueError(f"lanes would need output ports {out_ports}, but {self._out_ports} are open; restart to change ports")
+        if diff.added_lanes and self.capture:
+            raise ValueError("the capture log has a fixed lane table; restart to add lanes")
+        if diff.added_lanes and self._log_lanes_fixed:
+            logger.warning("Config reload: the binary session log will not record added lanes %s", ", ".join(diff.added_lanes))
+        moved = [name for name, port in lane_ports.items() if name in self._lane_ports and port != self._lane_ports[name]]
+        if not diff and not moved:
+            return None
+
+        rebuilt = set(diff.added_lanes) | set(diff.changed_lanes)
+        lanes: Dict[str, Lane] = {}
+        carried: List[str] = []
+        for lane_def in settings.lanes:
+            old = self.lanes.get(lane_def.name)
+            if old is not None and lane_def.name not in rebuilt and lane_def.name not in diff.rerouted_lanes and lane_def.name not in moved:
+                lanes[lane_def.name] = old
+                continue
+            if old is not None and lane_def.name not in rebuilt:
+                # routing only: takes over the old lane's state and generator when the swap is made
+                carried.append(lane_def.name)
+            lanes[lane_def.name] = self._make_lane(lane_def, lane_ports, settings.spiral.seed)
+        division_lanes = self._group_lanes_by_division(lanes)
+        # divisions that lost all their lanes keep an empty group; their clock callbacks stay registered
+        for division in self._division_lanes:
+            division_lanes.setdefault(division, [])
+        scene_order = self._build_scene_order(settings)
+        reuse = {name: row for name, row in zip(self._scene_order, self.scene_table.rows) if name in settings.scenes and name not in diff.changed_scenes}
+        return ReloadPlan(
+            base=base,
+            settings=settings,
+            diff=diff,
+            lanes=lanes,
+            carried=carried,
+            lane_ports=lane_ports,
+            division_lanes=division_lanes,
+            division_ticks={division: parse_division(division, ppq=self.clock.ppq) for division in division_lanes},
+            meta_lanes=self._find_meta_lanes(lanes),
+            meta_lane_names={lane.name for lane in lanes.values() if (lane.role or "").lower() in {"restraint", "contrast"}},
+            high_res_lanes={lane.name for lane in lanes.values() if lane.high_res},
+            # fresh batches: their compiled-scene caches are keyed by row identity
+            batches=self._build_batches(division_lanes) if self.batch else {},
+            scene_order=scene_order,
+            scene_table=SceneTable(settings, scene_order, reuse=reuse),
+            glide=self._glide_lanes(settings, lanes) if self._interpolator else None,
+        )
+
+    def _apply_reload(self, plan: ReloadPlan) -> None:
+        """Swaps a prepared reload in; runs on the clock thread between ticks."""
+        self._reload = None
+        if plan.base is not self.settings:
+            logger.warning("Config reload dropped: prepared against an older config")
+            if self.watcher:
+                self.watcher.retry()
+            return
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.store_state()
+        # copied only now: store_state() above may have replaced the old lanes' state objects
+        for name in plan.carried:
+            old = self.lanes[name]
+            plan.lanes[name].state, plan.lanes[name].rng = old.state, old.rng
+        self.settings = plan.settings
+        self.lanes = plan.lanes
+        self._lane_ports = plan.lane_ports
+        self._division_lanes = plan.division_lanes
+        self._division_ticks = plan.division_ticks
+        self._meta_lanes = plan.meta_lanes
+        self._meta_lane_names = plan.meta_lane_names
+        self._high_res_lanes = plan.high_res_lanes
+        self._batches = plan.batches
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.load_state()
+        self._scene_order = plan.scene_order
+        self.scene_table = plan.scene_table
+        for division in plan.division_lanes:
+            if division not in self._registered_divisions:
+                self._register_division(division)
+        spiral = self.settings.spiral
+        self.spiral.scene_count = len(self.scene_table)
+        self.spiral.k_step = spiral.k_step
+        self.spiral.p_jump = spiral.p_jump
+        if spiral.memory_k != self.spiral.memory_k:
+            self.spiral.memory_k = spiral.memory_k
+            self.spiral.history = deque(self.spiral.history, maxlen=max(1, spiral.memory_k))
+        for name in plan.diff.removed_lanes:
+            self.last_values.pop(name, None)
+        if plan.glide is not None:
+            self._interpolator.lanes = plan.glide
+        # seek anchors hold state for the old config
+        self._anchors.clear()
+        logger.info("Config reloaded at bar %s: %s", self.clock.bar + 1, plan.diff.describe())
+
+    def _checkpoint(self) -> None:
+        self._checkpoint_due = False
+        snapshot = self.snapshot_state()
+        self._anchors[snapshot.tick_count] = snapshot
+        self._anchors.move_to_end(snapshot.tick_count)
+        while len(self._anchors) > SEEK_ANCHORS:
+            self._anchors.popitem(last=False)
+        if self.checkpoints:
+            self.checkpoints.submit(snapshot)
+
+    def _anchor_before(self, tick: int) -> EngineSnapshot | None:
+        best = max((anchor for anchor in self._anchors if anchor <= tick), default=None)
+        return None if best is None else self._anchors[best]
+
+    def snapshot_state(self) -> EngineSnapshot:
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.store_state()
+        return EngineSnapshot(
+            tick_count=self.clock.tick_count,
+            quarter=self.clock.quarter,
+            bar=self.clock.bar,
+            running=self.clock.running,
+            spiral_scene=self.spiral.state.current_scene,
+            spiral_bar=self.spiral.state.bar,
+            spiral_history=list(self.spiral.history),
+            spiral_random=self.spiral.random.getstate(),
+            current_scene_index=self.current_scene_index,
+            lane_states={name: replace(lane.state) for name, lane in self.lanes.items()},
+            lane_random={name: lane.rng.getstate() for name, lane in self.lanes.items()},
+            last_values=dict(self.last_values),
+            armed=self.armed,
+            ticks_since_start=self._ticks_since_start,
+        )
+
+    def restore_state(self, snapshot: EngineSnapshot) -> None:
+        self.clock.set_position(snapshot.tick_count, snapshot.quarter, snapshot.bar)
+        self.clock.running = snapshot.running
+        self.spiral.state = SpiralState(current_scene=snapshot.spiral_scene, bar=snapshot.spiral_bar)
+        self.spiral.history.clear()
+        self.spiral.history.extend(snapshot.spiral_history)
+        self.spiral.random.setstate(snapshot.spiral_random)
+        self.current_scene_index = snapshot.current_scene_index
+        for name, lane in self.lanes.items():
+            if name in snapshot.lane_states:
+                lane.state = replace(snapshot.lane_states[name])
+                lane.rng.setstate(snapshot.lane_random[name])
+        self.last_values.clear()
+        self.last_values.update(snapshot.last_values)
+        self.armed = snapshot.armed
+        self._ticks_since_start = snapshot.ticks_since_start
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.load_state()
+
+    def seek(self, tick: int) -> None:
+        """
+        Puts the engine where a run from Start would be after `tick` clock
+        pulses (used for Song Position Pointer). The run starts from the
+        latest checkpoint at or before `tick`, or from a hard reset when
+        there is none. Scene changes and curve and smoothing state are
+        fast-forwarded without simulating ticks up to a short warm-up window,
+        which is then simulated silently to rebuild output and meta-lane
+        values. Lanes with a deadband or slew limit remember every earlier
+        output, so they (and the meta lanes that scale them) are stepped
+        through each update instead of skipped.
+        """
+        started = time.perf_counter()
+        tick = max(0, tick)
+        running, armed = self.clock.running, self.armed
+        anchor = self._anchor_before(tick)
+        if anchor:
+            self.restore_state(anchor)
+        else:
+            self._hard_reset_state(keep_anchors=True)
+        origin = self.clock.tick_count
+        warmup = min(tick - origin, SEEK_WARMUP_BARS * self.clock.ppq * self.clock.bar_quarters)
+        self._fast_forward(origin, tick - warmup)
+        self.clock.locate(tick - warmup)
+
+        output, session_log, capture = self.output_port, self.session_log, self.capture
+        self.output_port, self.session_log, self.capture = _Discard(), None, None
+        self.clock.running = True
+        self.armed = True
+        try:
+            for _ in range(warmup):
+                self.clock.handle_clock_tick()
+        finally:
+            self.output_port, self.session_log, self.capture = output, session_log, capture
+            self.clock.running = running
+            self.armed = armed
+            self._checkpoint_due = False
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.store_state()
+        logger.info("Seeked to bar %s tick %s in %.2f ms", self.clock.bar + 1, tick, (time.perf_counter() - started) * 1000)
+
+    def _fast_forward(self, origin: int, ticks: int) -> None:
+        """Advances scene choice and every lane's state from pulse `origin` to pulse `ticks` without simulating the clock."""
+        if ticks <= origin:
+            return
+        ticks_per_bar = self.clock.ppq * self.clock.bar_quarters
+        phrase_bars = self.settings.transport.phrase_bars
+        # (first tick, scene) runs: the bar callback for bar b fires on tick (b + 1) * ticks_per_bar,
+        # before the division callbacks of that tick
+        runs = [(origin + 1, self.current_scene_index)]
+        if not self.freeze_scene and phrase_bars > 0:
+            bar = max(phrase_bars, (origin // ticks_per_bar) // phrase_bars * phrase_bars)
+            if (bar + 1) * ticks_per_bar <= origin:
+                bar += phrase_bars
+            while (bar + 1) * ticks_per_bar <= ticks:
+                self.current_scene_index = self.spiral.on_phrase_boundary()
+                runs.append(((bar + 1) * ticks_per_bar, self.current_scene_index))
+                bar += phrase_bars
+        bounds = [first for first, _ in runs[1:]] + [ticks + 1]
+
+        rows = self.scene_table.rows
+        stepped = self._history_lanes()
+        for name, lane in self.lanes.items():
+            if name in self.frozen_lanes or name in stepped:
+                continue  # a frozen lane keeps its first value, which the warm-up produces
+            division = self._division_ticks[lane.division]
+            steps = []
+            for (first, scene_index), end in zip(runs, bounds):
+                params = rows[scene_index % len(rows)].get(name)
+                if params is not None:
+                    steps.append((params, (end - 1) // division - (first - 1) // division))
+            # only the last smoothing_memory() updates can still show in the smoothed value
+            remaining = sum(count for _, count in steps)
+            memory = lane.smoothing_memory()
+            for params, count in steps:
+                remaining -= count
+                lane.advance_curve(params, count, smooth=remaining < memory)
+        if stepped:
+            self._step_lanes(stepped, runs, bounds)
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.load_state()
+
+    def _history_lanes(self) -> set:
+        """Lanes whose output depends on every earlier update (deadband/slew), plus the meta lanes that scale them."""
+        names = {name for name, lane in self.lanes.items() if lane.deadband or (lane.slew_limit is not None and lane.slew_limit >= 0)}
+        if names - self._meta_lane_names:
+            names |= self._meta_lane_names
+        return names - self.frozen_lanes
+
+    def _step_lanes(self, names: set, runs: List[Tuple[int, int]], bounds: List[int]) -> None:
+        """Runs every update of lanes `names` over the (first tick, scene) runs, in the clock's callback order, without output."""
+        callback_order = list(self.clock.callbacks)
+        divisions = sorted(self._division_lanes, key=lambda d: callback_order.index(self._division_ticks[d]))
+        groups = [(self._division_ticks[d], [lane for lane in self._division_lanes[d] if lane.name in names]) for d in divisions]
+        groups = [(ticks, lanes) for ticks, lanes in groups if lanes]
+        stride = math.gcd(*(ticks for ticks, _ in groups))
+        rows = self.scene_table.rows
+        last_values = self.last_values
+        for (first, scene_index), end in zip(runs, bounds):
+            scene_index %= len(rows)
+            row = rows[scene_index]
+            for tick in range(-(-first // stride) * stride, end, stride):
+                for ticks, lanes in groups:
+                    if tick % ticks:
+                        continue
+                    for lane in lanes:
+                        name = lane.name
+                        params = row.get(name)
+                        if params is None:
+                            continue
+                        if name not in self._meta_lane_names:
+                            restraint, contrast = self._meta_levels()
+                            params = self.scene_table.adjusted(scene_index, name, restraint, contrast)
+                        value = lane.next_value(params)
+                        if value is not None:
+                            last_values[name] = value >> 7 if name in self._high_res_lanes else value
+
+    def _reset_anchors(self) -> None:
+        self._anchors.clear()
+        if self._resume:
+            self._anchors[self._resume.tick_count] = self._resume
 
-    def _hard_reset_state(self) -> None:
+    def _hard_reset_state(self, keep_anchors: bool = False) -> None:
+        """Back to the state at Start; seek keeps the anchors, which still belong to the current take."""
+        if not keep_anchors:
+            self._reset_anchors()
         self.clock.reset()
         self.spiral.reset()
         self.current_scene_index = 0
         self.last_values.clear()
         for lane in self.lanes.values():
             lane.reset()
+        for batches in self._batches.values():
+            for _, batch in batches:
+                batch.load_state()
@@ -0,0 +1,93 @@
+"""
+Several engines in one process.
+
+EngineHost owns the one MidiInput every engine listens to and the one
+clock.TempoTracker they share. Each message is timestamped once, fed to the
+tracker once, then handed to every engine in turn from the same callback,
+so all engines see exactly the same pulse sequence and apply pulse n before
+any engine sees pulse n + 1. Each engine keeps its own ClockFollower
+(callback schedule and position), lanes, spiral, output port(s), session
+log and checkpoints.
+
+Compared with one process per config, the host opens the input port once,
+parses each clock message once and shares the interpreter and imports. An
+exception in one engine's callback is logged and does not stop the others.
+"""
+
+import logging
+import signal
+import threading
+import time
+from typing import List
+
+from .clock import PPQ, TempoTracker
+from .config import Settings
+from .engine import AutomationEngine
+from .midi_io import MidiInput
+
+logger = logging.getLogger(__name__)
+
+
+class EngineHost:
+    def __init__(self, in_port_name: str | None, use_virtual: bool = False, ppq: int = PPQ):
+        self.ppq = ppq
+        self.tempo = TempoTracker(ppq)
+        self.engines: List[AutomationEngine] = []
+        self.input_port = MidiInput(in_port_name, callback=self._on_midi_message, use_virtual=use_virtual)
+        self._stop_event = threading.Event()
+
+    def add(self, settings: Settings, **engine_kwargs) -> AutomationEngine:
+        """Builds an engine for `settings` on the shared input and tempo tracker; kwargs go to AutomationEngine."""
+        if settings.transport.ppq_division != self.ppq:
+            raise ValueError(f"all hosted configs must use ppq_division {self.ppq} (got {settings.transport.ppq_division})")
+        engine = AutomationEngine(settings, tempo=self.tempo, own_input=False, **engine_kwargs)
+        self.engines.append(engine)
+        return engine
+
+    def _on_midi_message(self, message) -> None:
+        now = time.monotonic()
+        engines = self.engines
+        for engine in engines:
+            engine.observe(message, now)
+        if message.type == "clock":
+            self.tempo.tick(now)
+        for index, engine in enumerate(engines):
+            try:
+                engine.dispatch(message)
+            except Exception:
+                logger.exception("Engine %s failed on %s", index, message.type)
+
+    def start(self) -> None:
+        for engine in self.engines:
+            engine.start()
+        self.input_port.open()
+        self._stop_event.clear()
+
+    def shutdown(self) -> None:
+        self.input_port.close()
+        if self.tempo.pulses:
+            logger.info("Clock: %s", self.tempo.summary())
+        for engine in self.engines:
+            engine.shutdown()
+
+    def run(self) -> None:
+        if not self.engines:
+            raise ValueError("no engines to host")
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        self.start()
+        logger.info("Hosting %s engines", len(self.engines))
+
+        def stop_signal(*_: int) -> None:
+            logger.info("Received stop signal, shutting down.")
+            self._stop_event.set()
+            for engine in self.engines:
+                engine.clock.stop()
+
+        signal.signal(signal.SIGINT, stop_signal)
+        signal.signal(signal.SIGTERM, stop_signal)
+
+        try:
+            while not self._stop_event.is_set():
+                time.sleep(0.01)
+        finally:
+            self.shutdown()
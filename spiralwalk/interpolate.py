@@ -0,0 +1,185 @@
+"""
+Sub-tick CC interpolation.
+
+With interpolation on, the engine sends its CCs to an Interpolator that sits
+in front of MidiOutput. Each new lane value becomes a ramp. The ramp starts
+from the value last sent on that CC and ends when the lane's next division
+update is predicted to arrive, using clock.TempoTracker's next-tick time and
+period. A scheduler thread sends the values in between, one step per
+`deadband` units (at least 1), so motion is smooth while lanes are still
+computed at their division rate. The output therefore trails the lane by one
+division. 14-bit CC and NRPN lanes glide in their own resolution.
+
+Intermediate steps only spend spare rate budget. They are skipped while the
+MidiOutput token bucket holds fewer than `reserve` tokens beyond the step.
+The value at the end of a ramp always goes out as a regular CC. Slew limits
+hold because a ramp never moves further than the lane update it spreads out.
+CCs of lanes that do not interpolate are sent as soon as the thread sees them.
+All port writes happen on the scheduler thread, which sleeps on a condition
+until the earliest step is due (or a new value arrives).
+
+Times come from `clock` (time.monotonic, the TempoTracker's clock, unless
+one is injected).
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from .midi_io import CC, CC14, NRPN
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, int, int]  # output kind, channel, cc or NRPN parameter
+
+
+class _Ramp:
+    __slots__ = ("start", "target", "sign", "step", "distance", "t0", "span", "k", "due")
+
+    def __init__(self, start: int, target: int, t0: float, t1: float, step: int):
+        self.start = start
+        self.target = target
+        self.sign = 1 if target >= start else -1
+        self.step = max(1, step)
+        self.distance = abs(target - start)
+        self.t0 = t0
+        self.span = max(0.0, t1 - t0)
+        self.k = 0
+        self.due = t0
+        self._advance_due()
+
+    def _advance_due(self) -> None:
+        self.k += 1
+        moved = self.k * self.step
+        self.due = self.t0 + self.span if moved >= self.distance else self.t0 + self.span * moved / self.distance
+
+    def pop(self) -> Tuple[int, bool]:
+        """(value due now, whether it ends the ramp)."""
+        moved = self.k * self.step
+        if moved >= self.distance:
+            return self.target, True
+        value = self.start + self.sign * moved
+        self._advance_due()
+        return value, False
+
+
+class Interpolator:
+    def __init__(self, output, tempo, lanes: Dict[Key, Tuple[int, int]], reserve: float | None = None, clock: Callable[[], float] = time.monotonic):
+        """`lanes` maps (output kind, channel, cc or NRPN parameter) to (division in ticks, deadband) for every lane that glides."""
+        self.output = output
+        self.tempo = tempo
+        self.lanes = dict(lanes)
+        self.reserve = float(len(self.lanes)) if reserve is None else reserve
+        self.clock = clock
+        self.intermediate = 0
+        self.skipped = 0
+        self._ramps: Dict[Key, _Ramp] = {}
+        self._sent: Dict[Key, int] = {}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread: threading.Thread | None = None
+
+    def open(self) -> None:
+        self.output.open()
+        if self._thread is None:
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="spiralwalk-interpolate", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Sends every ramp's target, stops the scheduler and closes the output."""
+        if self._thread is not None:
+            with self._cond:
+                self._closing = True
+                self._cond.notify()
+            self._thread.join()
+            self._thread = None
+        if self.intermediate or self.skipped:
+            logger.info("Interpolation: %s intermediate CCs sent, %s skipped for rate budget", self.intermediate, self.skipped)
+        self.output.close()
+
+    def stats(self) -> dict:
+        return dict(self.output.stats(), intermediate=self.intermediate, skipped=self.skipped)
+
+    def _ramp_end(self, ticks: int, now: float) -> float:
+        # the next division update lands `ticks` pulses after the one that produced this value
+        period = self.tempo.period
+        next_tick = self.tempo.next_tick_time
+        if next_tick is None or next_tick < now:
+            next_tick = now + period
+        return next_tick + (ticks - 1) * period
+
+    def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        self._target((CC, channel, cc), value)
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        self._target((CC14, channel, cc), value)
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        self._target((NRPN, channel, param), value)
+
+    def _target(self, key: Key, value: int) -> None:
+        now = self.clock()
+        lane = self.lanes.get(key)
+        with self._cond:
+            start = self._sent.get(key)
+            if lane is None or start is None or start == value:
+                ramp = _Ramp(value, value, now, now, 1)
+            else:
+                ticks, deadband = lane
+                ramp = _Ramp(start, value, now, self._ramp_end(ticks, now), deadband)
+            self._ramps[key] = ramp
+            self._cond.notify()
+
+    def _pop_due(self, now: float) -> List[Tuple[Key, int, bool]]:
+        """(key, value, whether it ends the ramp) for every step due by `now`, in due order; call holding _cond."""
+        due = []
+        for key, ramp in self._ramps.items():
+            while ramp.due <= now:
+                at = ramp.due
+                value, final = ramp.pop()
+                due.append((at, key, value, final))
+                if final:
+                    break
+        due.sort(key=lambda item: item[0])
+        for _, key, value, final in due:
+            if final:
+                self._ramps.pop(key, None)
+            self._sent[key] = value
+        return [(key, value, final) for _, key, value, final in due]
+
+    def _emit(self, key: Key, value: int, final: bool) -> None:
+        kind, channel, number = key
+        if final:
+            self.output.send(kind, number, value, channel=channel)
+        elif self.output.try_send(kind, number, value, channel=channel, reserve=self.reserve):
+            self.intermediate += 1
+        else:
+            self.skipped += 1
+
+    def _send_due(self) -> None:
+        """Sends every step due now; what the scheduler thread does each time it wakes."""
+        with self._cond:
+            due = self._pop_due(self.clock())
+        for step in due:
+            self._emit(*step)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closing:
+                    finals = [(key, ramp.target) for key, ramp in self._ramps.items()]
+                    self._ramps.clear()
+                    break
+                if not self._ramps:
+                    self._cond.wait()
+                    continue
+                # sleep until the earliest step; a new value notifies and may bring an earlier one
+                wait = min(ramp.due for ramp in self._ramps.values()) - self.clock()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+            self._send_due()
+        for (kind, channel, number), value in finals:
+            self.output.send(kind, number, value, channel=channel)
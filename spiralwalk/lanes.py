@@ -3,6 +3,10 @@ import random
 from dataclasses import dataclass, field
 from typing import Dict, Optional
 
+from .midi_io import HIGH_RES_MAX, port_channel
+
+EMA_FLOOR = 1e-12  # smoothing weight below which older updates are ignored when fast-forwarding
+
 
 @dataclass
 class LaneState:
@@ -26,13 +30,30 @@ class Lane:
     shape: str = "linear"
     deadband: int = 0
     slew_limit: int | None = None
+    output: str = "cc"  # cc lanes emit 0-127; cc14/nrpn lanes emit 0-16383
+    nrpn: int | None = None
+    port: int = 0  # index of the output port the lane sends to
     rng: random.Random = field(default_factory=random.Random)
     state: LaneState = field(default_factory=LaneState)
 
+    @property
+    def out_channel(self) -> int:
+        """The channel as outputs take it: MIDI channel extended by the port index (see midi_io.port_channel)."""
+        return port_channel(self.port, self.channel)
+
+    @property
+    def high_res(self) -> bool:
+        return self.output != "cc"
+
+    @property
+    def scale(self) -> float:
+        """Output units per 7-bit step; scene ranges stay 0-127 for every lane."""
+        return HIGH_RES_MAX / 127 if self.output != "cc" else 1.0
+
     def _normalize(self, value: float, scene_min: int, scene_max: int) -> int:
         value = max(0.0, min(1.0, value))
         scaled = scene_min + (scene_max - scene_min) * value
-        return int(round(max(0, min(127, scaled))))
+        return int(round(max(0, min(127, scaled)) * self.scale))
 
     def _curve_value(self, scene_params: Dict) -> float:
         curve_params = scene_params.get("curve_params") or {}
@@ -67,6 +88,105 @@ class Lane:
         # default fallback
         return self.rng.random()
 
+    def smoothing_memory(self) -> int:
+        """Number of recent updates that carry weight in the smoothed value (see EMA_FLOOR)."""
+        keep = 1 - max(0.0, min(1.0, self.smoothing))
+        if keep <= 0.0:
+            return 1
+        if keep >= 1.0:
+            return 1 << 62
+        return math.ceil(math.log(EMA_FLOOR) / math.log(keep))
+
+    def advance_curve(self, scene_params: Dict, steps: int, smooth: bool = True) -> None:
+        """
+        Moves curve and smoothing state on by `steps` updates without producing
+        output, as next_value would have. Sine/ramp phase is closed form and
+        their smoothing is rebuilt from the updates that still carry weight;
+        the random curves run a tight loop so the lane's generator ends exactly
+        where stepping would leave it. With smooth=False only the curve state
+        moves (for updates too old to matter to the smoothed value). Output
+        (deadband/slew) state is untouched.
+        """
+        if steps <= 0:
+            return
+        curve_params = scene_params.get("curve_params") or {}
+        curve = self.curve
+        state = self.state
+        alpha = max(0.0, min(1.0, self.smoothing))
+        keep = 1 - alpha
+        smoothed = state.previous_value
+
+        if curve in ("sine", "ramp"):
+            cycle_steps = max(1, int(curve_params.get("cycle_steps", 16)))
+            phase = state.phase
+            if curve == "sine":
+                step = 2 * math.pi / cycle_steps
+
+                def raw(j: int) -> float:
+                    return 0.5 * (1 + math.sin(phase + j * step))
+
+                state.phase = phase + steps * step
+            else:
+                span = cycle_steps - 1 if cycle_steps > 1 else 1
+
+                def raw(j: int) -> float:
+                    return ((phase + j) % cycle_steps) / span
+
+                state.phase = (phase + steps) % cycle_steps
+            if not smooth:
+                return
+            if smoothed is None:
+                smoothed = raw(1)
+            if keep >= 1.0:
+                state.previous_value = smoothed
+                return
+            # updates older than `memory` weigh less than EMA_FLOOR in the result
+            memory = min(steps, self.smoothing_memory())
+            first = steps - memory + 1
+            smoothed *= keep ** (first - 1)
+            for j in range(first, steps + 1):
+                smoothed = alpha * raw(j) + keep * smoothed
+            state.previous_value = smoothed
+        elif curve == "random_walk":
+            step_size = float(curve_params.get("step_size", 0.08))
+            draw = self.rng.random
+            span = step_size - -step_size
+            position = state.random_position
+            for _ in range(steps):
+                position += -step_size + span * draw()
+                if position < 0.0:
+                    position = 0.0
+                elif position > 1.0:
+                    position = 1.0
+                if smooth:
+                    smoothed = position if smoothed is None else alpha * position + keep * smoothed
+            state.random_position = position
+            if smooth:
+                state.previous_value = smoothed
+        elif curve == "step_hold":
+            hold_steps = max(1, int(curve_params.get("hold_steps", 4)))
+            while steps:
+                if state.hold_remaining <= 0:
+                    state.hold_value = self.rng.random()
+                    state.hold_remaining = hold_steps
+                taken = min(steps, state.hold_remaining)
+                state.hold_remaining -= taken
+                steps -= taken
+                if smooth:
+                    # `taken` updates toward a constant value
+                    value = state.hold_value
+                    smoothed = value if smoothed is None else value + (smoothed - value) * keep ** taken
+            if smooth:
+                state.previous_value = smoothed
+        else:
+            draw = self.rng.random
+            for _ in range(steps):
+                value = draw()
+                if smooth:
+                    smoothed = value if smoothed is None else alpha * value + keep * smoothed
+            if smooth:
+                state.previous_value = smoothed
+
     def _apply_shape(self, value: float) -> float:
         value = max(0.0, min(1.0, value))
         shape = (self.shape or "linear").lower()
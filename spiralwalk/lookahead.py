@@ -0,0 +1,235 @@
+"""
+Lookahead rendering.
+
+A worker thread runs the engine ahead of the incoming clock and stores the
+CCs, session-log entries and capture events each future tick produces in a
+ring buffer keyed by tick index. The MIDI callback then only advances its tick counter and
+flushes the slot that is due.
+
+Transport messages (including Song Position Pointer) rewind the engine to the tick actually played (restoring
+the nearest snapshot and re-simulating the few ticks after it), apply the
+message with the normal engine logic, and rebuild the buffer from there, so
+Start/Stop/Continue and arming behave exactly as without lookahead.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+import mido
+
+from .midi_io import CC, CC14, NRPN
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_INTERVAL = 24  # ticks between rewind snapshots (one quarter at 24 ppq)
+
+Slot = Tuple[int, List[Tuple[str, int, int, int]], List[dict], List[Tuple[int, int, int, int, int]]]
+
+
+class _SlotRecorder:
+    """Stands in for the engine's output port, session log and capture log while ticks are precomputed."""
+
+    def __init__(self) -> None:
+        self.ccs: List[Tuple[str, int, int, int]] = []  # kind, cc or NRPN parameter, value, channel
+        self.entries: List[dict] = []
+        self.events: List[Tuple[int, int, int, int, int]] = []
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        self.ccs.append((CC, cc, value, channel))
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        self.ccs.append((CC14, cc, value, channel))
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        self.ccs.append((NRPN, param, value, channel))
+
+    def write(self, entry: dict) -> None:
+        self.entries.append(entry)
+
+    def record(self, *event: int) -> None:
+        self.events.append(event)
+
+
+class LookaheadBuffer:
+    def __init__(self, engine, ticks_ahead: int, snapshot_interval: int = SNAPSHOT_INTERVAL):
+        if ticks_ahead < 1:
+            raise ValueError("ticks_ahead must be at least 1")
+        self.engine = engine
+        self.size = ticks_ahead
+        self.snapshot_interval = max(1, snapshot_interval)
+        self.underruns = 0
+
+        # one spare slot so the worker never overwrites a slot the callback has claimed but not taken yet
+        self._ring: List[Slot | None] = [None] * (ticks_ahead + 1)
+        self._cond = threading.Condition()  # guards ring, counters and flags
+        self._engine_lock = threading.Lock()  # held while the engine state is advanced
+        self._played = 0  # clock ticks flushed since the last transport message
+        self._computed = 0  # clock ticks the engine has been advanced through
+        self._running = False
+        self._shutdown = False
+        self._generation = 0
+        self._snapshots: Deque[Tuple[int, object]] = deque()
+        self._recorder = _SlotRecorder()
+        self._clock_msg = mido.Message("clock")
+        self._output = None
+        self._session_log = None
+        self._capture = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        engine = self.engine
+        self._output = engine.output_port
+        self._session_log = engine.session_log
+        self._capture = engine.capture
+        engine.output_port = self._recorder
+        if engine.session_log:
+            engine.session_log = self._recorder
+        if engine.capture:
+            engine.capture = self._recorder
+        with self._cond:
+            self._shutdown = False
+            self._running = engine.clock.running
+            self._played = self._computed = 0
+            self._snapshots.clear()
+            self._snapshots.append((0, engine.snapshot_state()))
+        self._thread = threading.Thread(target=self._work, name="spiralwalk-lookahead", daemon=True)
+        self._thread.start()
+        logger.info("Lookahead enabled: %s ticks ahead", self.size)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._output is not None:
+            self.engine.output_port = self._output
+            self.engine.session_log = self._session_log
+            self.engine.capture = self._capture
+
+    def on_message(self, message) -> None:
+        if message.type == "clock":
+            self._on_clock()
+        elif message.type in ("start", "stop", "continue", "songpos"):
+            self._on_transport(message)
+        else:
+            with self._engine_lock:
+                self.engine._handle_message(message)
+
+    def _on_clock(self) -> None:
+        with self._cond:
+            if not self._running:
+                return
+            self._played += 1
+            tick = self._played
+            slot = self._take(tick)
+            self._cond.notify()
+        if slot is None:
+            slot = self._compute_due(tick)
+        self._flush(slot)
+
+    def _take(self, tick: int) -> Slot | None:
+        index = tick % len(self._ring)
+        slot = self._ring[index]
+        if slot is None or slot[0] != tick:
+            return None
+        self._ring[index] = None
+        return slot
+
+    def _compute_due(self, tick: int) -> Slot:
+        # underrun: the worker has not produced this tick yet, so compute it here
+        with self._engine_lock:
+            with self._cond:
+                slot = self._take(tick)
+                if slot is not None:
+                    return slot
+                self.underruns += 1
+            slot = (tick, [], [], [])
+            while self._computed < tick:
+                slot = self._compute_next()
+            return slot
+
+    def _flush(self, slot: Slot) -> None:
+        _, ccs, entries, events = slot
+        output = self._output
+        for kind, number, value, channel in ccs:
+            if kind == CC:
+                output.send_cc(number, value, channel=channel)
+            elif kind == CC14:
+                output.send_cc14(number, value, channel=channel)
+            else:
+                output.send_nrpn(number, value, channel=channel)
+        if events and self._capture:
+            for event in events:
+                self._capture.record(*event)
+        if entries and self._session_log:
+            for entry in entries:
+                entry["timestamp"] = time.time()
+                self._session_log.write(entry)
+
+    def _compute_next(self) -> Slot:
+        """Advances the engine one tick; caller holds the engine lock."""
+        if self._computed % self.snapshot_interval == 0 and self._computed > self._snapshots[-1][0]:
+            self._snapshots.append((self._computed, self.engine.snapshot_state()))
+        recorder = self._recorder
+        recorder.ccs = []
+        recorder.entries = []
+        recorder.events = []
+        self.engine._handle_message(self._clock_msg)
+        with self._cond:
+            self._computed += 1
+        return (self._computed, recorder.ccs, recorder.entries, recorder.events)
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._shutdown and (not self._running or self._computed - self._played >= self.size):
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                generation = self._generation
+            with self._engine_lock:
+                if generation != self._generation or self._computed - self._played >= self.size:
+                    continue
+                slot = self._compute_next()
+                with self._cond:
+                    self._ring[slot[0] % len(self._ring)] = slot
+                    while len(self._snapshots) > 1 and self._snapshots[1][0] <= self._played:
+                        self._snapshots.popleft()
+
+    def _rewind(self, position: int) -> None:
+        """Puts the engine back at `position` played ticks; caller holds the engine lock."""
+        if self._computed == position:
+            return
+        while self._snapshots[-1][0] > position:
+            self._snapshots.pop()
+        snap_tick, snapshot = self._snapshots[-1]
+        self.engine.restore_state(snapshot)
+        self._computed = snap_tick
+        while self._computed < position:
+            self._compute_next()
+
+    def _on_transport(self, message) -> None:
+        with self._engine_lock:
+            with self._cond:
+                self._generation += 1
+                self._ring = [None] * len(self._ring)
+                played = self._played
+            self._rewind(played)
+            self.engine._handle_message(message)
+            with self._cond:
+                self._played = self._computed = 0
+                self._snapshots.clear()
+                self._snapshots.append((0, self.engine.snapshot_state()))
+                self._running = self.engine.clock.running
+                self._cond.notify()
@@ -1,11 +1,73 @@
 import logging
+import threading
 import time
-from typing import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
 
 import mido
 
 logger = logging.getLogger(__name__)
 
+CHANNELS = 16
+
+# lane output kinds
+CC = "cc"
+CC14 = "cc14"  # MSB on cc, LSB on cc + 32
+NRPN = "nrpn"
+OUTPUT_KINDS = (CC, CC14, NRPN)
+HIGH_RES_MAX = 16383  # largest cc14/NRPN value (and NRPN parameter number)
+
+# output backends: mido builds and validates a Message per CC; rtmidi writes preformatted bytes to python-rtmidi
+MIDO = "mido"
+RTMIDI = "rtmidi"
+BACKENDS = (MIDO, RTMIDI)
+
+NRPN_PARAM_MSB = 99
+NRPN_PARAM_LSB = 98
+DATA_ENTRY_MSB = 6
+DATA_ENTRY_LSB = 38
+
+
+class HighResEncoder:
+    """
+    Splits 14-bit CC and NRPN values into 7-bit CC messages, leaving out what
+    the receiver already holds: the MSB (and for NRPN the parameter select)
+    goes out only when it differs from the last value sent. The MSB always
+    precedes the LSB, since receivers may clear the LSB when a new MSB
+    arrives.
+    """
+
+    def __init__(self) -> None:
+        self._values: Dict[Tuple[str, int, int], int] = {}
+        self._selected: Dict[int, int] = {}  # channel -> NRPN parameter
+
+    def messages(self, kind: str, number: int, value: int, channel: int) -> List[Tuple[int, int]]:
+        msb, lsb = (value >> 7) & 0x7F, value & 0x7F
+        previous = self._values.get((kind, channel, number))
+        if kind == NRPN:
+            messages = []
+            selected = self._selected.get(channel) == number
+            if not selected:
+                messages += [(NRPN_PARAM_MSB, (number >> 7) & 0x7F), (NRPN_PARAM_LSB, number & 0x7F)]
+            if not selected or previous is None or previous >> 7 != msb:
+                messages.append((DATA_ENTRY_MSB, msb))
+            messages.append((DATA_ENTRY_LSB, lsb))
+            return messages
+        messages = [] if previous is not None and previous >> 7 == msb else [(number, msb)]
+        messages.append((number + 32, lsb))
+        return messages
+
+    def sent(self, kind: str, number: int, value: int, channel: int) -> None:
+        """Records that the messages for `value` went out."""
+        self._values[(kind, channel, number)] = value
+        if kind == NRPN:
+            self._selected[channel] = number
+
+    def encode(self, kind: str, number: int, value: int, channel: int) -> List[Tuple[int, int]]:
+        messages = self.messages(kind, number, value, channel)
+        self.sent(kind, number, value, channel)
+        return messages
+
 
 class MidiInput:
     def __init__(self, port_name: str | None, callback: Callable[[mido.Message], None], use_virtual: bool = False):
@@ -38,18 +100,58 @@ class MidiInput:
 
 
 class MidiOutput:
-    def __init__(self, port_name: str | None, max_messages_per_sec: int = 200, dry_run: bool = False, use_virtual: bool = False):
+    def __init__(
+        self,
+        port_name: str | None,
+        max_messages_per_sec: int = 200,
+        dry_run: bool = False,
+        use_virtual: bool = False,
+        burst: int | None = None,
+        coalesce: bool = False,
+        drain_timeout: float = 1.0,
+        backend: str = MIDO,
+        send_batch: int = 1,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown MIDI output backend: {backend}")
         self.port_name = port_name
+        self.backend = backend
+        self._raw = None  # rtmidi backend: the python-rtmidi port, written raw bytes
         self.max_messages_per_sec = max_messages_per_sec
         self.dry_run = dry_run
         self.use_virtual = use_virtual
         self._port = None
-        self._sent_times: list[float] = []
+        # token bucket: refills at max_messages_per_sec, holds at most `burst` tokens
+        self.burst = max_messages_per_sec if burst is None else burst
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self.allowed = 0
+        self.denied = 0
+        # coalescing mode: latest value per (channel, cc), drained by a paced sender thread
+        self.coalesce = coalesce
+        self.drain_timeout = drain_timeout
+        self.coalesced = 0
+        self.send_batch = max(1, send_batch)  # pending messages sent per sender wake-up
+        self._pending: Dict[Tuple[str, int, int], int] = {}  # (kind, channel, number) -> value
+        self.encoder = HighResEncoder()
+        self._cond = threading.Condition()
+        self._closing = False
+        self._sender: threading.Thread | None = None
 
     def open(self) -> None:
+        self._open_port()
+        if self.coalesce and self._sender is None:
+            self._closing = False
+            self._sender = threading.Thread(target=self._sender_loop, name="spiralwalk-midi-out", daemon=True)
+            self._sender.start()
+
+    def _open_port(self) -> None:
         if self.dry_run:
             logger.info("Dry-run: MIDI output disabled")
             return
+        if self.backend == RTMIDI:
+            self._open_raw_port()
+            return
         if self.use_virtual:
             name = self.port_name or "Spiralwalk Virtual Out"
             try:
@@ -65,29 +167,258 @@ class MidiOutput:
         self._port = mido.open_output(self.port_name)
         logger.info("Opened MIDI output: %s", self.port_name)
 
+    def _open_raw_port(self) -> None:
+        if not self.port_name and not self.use_virtual:
+            logger.warning("No MIDI output port configured.")
+            return
+        import rtmidi  # python-rtmidi, which mido's default backend uses as well
+
+        port = rtmidi.MidiOut()
+        if self.use_virtual:
+            name = self.port_name or "Spiralwalk Virtual Out"
+            port.open_virtual_port(name)
+            self._raw = port
+            logger.info("Opened virtual MIDI output (rtmidi): %s", name)
+            return
+        names = port.get_ports()
+        # exact name first; rtmidi may append client:port numbers that mido's names lack
+        index = names.index(self.port_name) if self.port_name in names else next((i for i, n in enumerate(names) if n.startswith(self.port_name)), None)
+        if index is None:
+            raise IOError(f"Unknown MIDI output port: {self.port_name!r} (available: {names})")
+        port.open_port(index)
+        self._raw = port
+        logger.info("Opened MIDI output (rtmidi): %s", names[index])
+
     def close(self) -> None:
+        if self._sender:
+            with self._cond:
+                self._closing = True
+                self._cond.notify()
+            self._sender.join()
+            self._sender = None
+        if self.allowed or self.denied or self.coalesced:
+            logger.info("MIDI output: %s sent, %s rate-limited, %s coalesced", self.allowed, self.denied, self.coalesced)
         if self._port:
             self._port.close()
             logger.info("Closed MIDI output")
+        if self._raw is not None:
+            self._raw.close_port()
+            self._raw = None
+            logger.info("Closed MIDI output")
+
+    def stats(self) -> dict:
+        return {
+            "port": self.port_name,
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+            "tokens": self._tokens,
+            "burst": self.burst,
+        }
 
-    def _can_send(self) -> bool:
+    def _refill(self) -> float:
         now = time.monotonic()
-        window_start = now - 1
-        self._sent_times = [t for t in self._sent_times if t >= window_start]
-        if len(self._sent_times) >= self.max_messages_per_sec:
+        tokens = self._tokens + (now - self._last_refill) * self.max_messages_per_sec
+        self._last_refill = now
+        if tokens > self.burst:
+            tokens = self.burst
+        self._tokens = tokens
+        return tokens
+
+    def _can_send(self, count: int = 1) -> bool:
+        # a message group larger than the burst goes out once the bucket is full and leaves it in debt
+        if self._refill() < min(count, max(1.0, self.burst)):
+            self.denied += 1
             return False
-        self._sent_times.append(now)
+        self._tokens -= count
+        self.allowed += count
         return True
 
     def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        if self.coalesce:
+            self._queue((CC, channel, cc), value)
+            return
         if not self._can_send():
             logger.debug("Rate limit hit; skipping CC %s", cc)
             return
-        msg = mido.Message("control_change", control=cc, value=value, channel=channel)
+        self._write(cc, value, channel)
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        """0-16383 value as MSB on `cc` and LSB on `cc + 32`; the MSB is only resent when it changes."""
+        self.send(CC14, cc, value, channel)
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        """0-16383 value for NRPN `param`; parameter select and data MSB are only resent when they change."""
+        self.send(NRPN, param, value, channel)
+
+    def send(self, kind: str, number: int, value: int, channel: int = 0) -> None:
+        if kind == CC:
+            self.send_cc(number, value, channel)
+            return
+        if self.coalesce:
+            self._queue((kind, channel, number), value)
+            return
+        # the encoder's view of what the receiver holds must not change between messages() and sent()
+        with self._cond:
+            messages = self.encoder.messages(kind, number, value, channel)
+            if not self._can_send(len(messages)):
+                logger.debug("Rate limit hit; skipping %s %s", kind, number)
+                return
+            self._transmit(kind, number, value, channel, messages)
+
+    def try_send(self, kind: str, number: int, value: int, channel: int = 0, reserve: float = 0.0) -> bool:
+        """
+        Sends only if the rate budget still holds `reserve` tokens after this
+        message group, for optional traffic that must not crowd out regular
+        CCs. A refusal is not counted as rate-limited.
+        """
+        if self.coalesce:
+            self.send(kind, number, value, channel)
+            return True
+        with self._cond:
+            messages = [(number, value)] if kind == CC else self.encoder.messages(kind, number, value, channel)
+            if self._refill() < len(messages) + reserve:
+                return False
+            self._tokens -= len(messages)
+            self.allowed += len(messages)
+            self._transmit(kind, number, value, channel, messages)
+        return True
+
+    def _queue(self, key: Tuple[str, int, int], value: int) -> None:
+        with self._cond:
+            if key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = value
+            self._cond.notify()
+
+    def _transmit(self, kind: str, number: int, value: int, channel: int, messages: List[Tuple[int, int]]) -> None:
+        for cc, data in messages:
+            self._write(cc, data, channel)
+        if kind != CC:
+            self.encoder.sent(kind, number, value, channel)
+
+    def _sender_loop(self) -> None:
+        deadline = None
+        while True:
+            batch: List[Tuple[int, List[Tuple[int, int]]]] = []
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    deadline = deadline or time.monotonic() + self.drain_timeout
+                    if not self._pending or time.monotonic() >= deadline:
+                        return
+                need = 0.0
+                while self._pending and len(batch) < self.send_batch:
+                    # dict order is first-dirtied order; a superseded value keeps its place in line
+                    key = next(iter(self._pending))
+                    kind, channel, number = key
+                    value = self._pending[key]
+                    messages = [(number, value)] if kind == CC else self.encoder.messages(kind, number, value, channel)
+                    need = min(len(messages), max(1.0, self.burst))
+                    if self._refill() < need:
+                        break
+                    del self._pending[key]
+                    self._tokens -= len(messages)
+                    self.allowed += len(messages)
+                    if kind != CC:
+                        self.encoder.sent(kind, number, value, channel)
+                    batch.append((channel, messages))
+                if not batch:
+                    rate = self.max_messages_per_sec
+                    self._cond.wait((need - self._tokens) / rate if rate > 0 else self.drain_timeout)
+                    continue
+            for channel, messages in batch:
+                for cc, data in messages:
+                    self._write(cc, data, channel)
+
+    def _write(self, cc: int, value: int, channel: int) -> None:
+        raw = self._raw
+        if raw is not None:
+            # built per call: the clock, sender and interpolator threads can all write
+            raw.send_message((0xB0 | (channel & 0x0F), cc & 0x7F, value & 0x7F))
+            return
         if self.dry_run or not self._port:
-            logger.info("CC ch%s cc%s val%s", channel + 1, cc, value)
+            if self.port_name:
+                logger.info("CC %s ch%s cc%s val%s", self.port_name, channel + 1, cc, value)
+            else:
+                logger.info("CC ch%s cc%s val%s", channel + 1, cc, value)
             return
-        self._port.send(msg)
+        self._port.send(mido.Message("control_change", control=cc, value=value, channel=channel))
+
+
+class ShardedOutput:
+    """
+    Several MidiOutputs, each with its own rate budget and sender thread,
+    behind the single-port interface. Channels are extended: channel
+    `port * CHANNELS + c` is MIDI channel c on port `port`.
+    """
+
+    def __init__(self, outputs: Sequence[MidiOutput]):
+        self.outputs = list(outputs)
+
+    def _each(self, method: str) -> None:
+        # opening a port can take a while (virtual ports, device enumeration), so do them together
+        with ThreadPoolExecutor(max_workers=len(self.outputs)) as pool:
+            for future in [pool.submit(getattr(output, method)) for output in self.outputs]:
+                future.result()
+
+    def open(self) -> None:
+        self._each("open")
+
+    def close(self) -> None:
+        self._each("close")
+
+    def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        self.outputs[channel >> 4].send_cc(cc, value, channel & 0x0F)
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        self.outputs[channel >> 4].send_cc14(cc, value, channel & 0x0F)
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        self.outputs[channel >> 4].send_nrpn(param, value, channel & 0x0F)
+
+    def send(self, kind: str, number: int, value: int, channel: int = 0) -> None:
+        self.outputs[channel >> 4].send(kind, number, value, channel & 0x0F)
+
+    def try_send(self, kind: str, number: int, value: int, channel: int = 0, reserve: float = 0.0) -> bool:
+        return self.outputs[channel >> 4].try_send(kind, number, value, channel & 0x0F, reserve=reserve)
+
+    @property
+    def allowed(self) -> int:
+        return sum(output.allowed for output in self.outputs)
+
+    @property
+    def denied(self) -> int:
+        return sum(output.denied for output in self.outputs)
+
+    def stats(self) -> dict:
+        ports = [output.stats() for output in self.outputs]
+        totals = {key: sum(port[key] for port in ports) for key in ("allowed", "denied", "coalesced", "pending")}
+        return dict(totals, ports=ports)
+
+
+def port_channel(port: int, channel: int) -> int:
+    """Extended channel for MIDI channel `channel` on output port index `port`."""
+    return port * CHANNELS + channel
+
+
+def send_value(output, kind: str, number: int, value: int, channel: int = 0) -> None:
+    """Sends `value` as a lane of output `kind` does; `number` is the CC or, for NRPN, the parameter."""
+    if kind == NRPN:
+        output.send_nrpn(number, value, channel=channel)
+    elif kind == CC14:
+        output.send_cc14(number, value, channel=channel)
+    else:
+        output.send_cc(number, value, channel=channel)
+
+
+def build_output(port_names: Sequence[str | None], **kwargs) -> "MidiOutput | ShardedOutput":
+    """One MidiOutput per port (all with the same settings), sharded when there is more than one."""
+    if len(port_names) == 1:
+        return MidiOutput(port_names[0], **kwargs)
+    return ShardedOutput([MidiOutput(name, **kwargs) for name in port_names])
 
 
 def list_ports() -> tuple[Iterable[str], Iterable[str]]:
@@ -0,0 +1,168 @@
+"""
+Hot config reload.
+
+ConfigWatcher polls the config file's mtime and size. When they change, it
+parses and validates the file on its own thread and hands the new Settings
+to the engine (AutomationEngine.request_reload). The engine diffs them
+against the running ones and prepares everything the clock thread will need
+on the watcher thread: new Lane objects for lanes whose definition changed,
+the regrouped division lists, batches and a SceneTable that reuses the rows
+of unchanged scenes. The prepared ReloadPlan is then published with one
+reference assignment. The clock thread swaps it in just before the next bar
+line's tick runs (or on the next message while the transport is stopped),
+so every tick runs entirely on the old config or entirely on the new one.
+
+Unchanged lanes keep their Lane object, and with it their phase,
+smoothing, deadband/slew state and RNG. A lane whose only changes are to
+routing (`cc`, `channel`, `nrpn`, `port`, `interpolate`) also keeps its
+state. Spiral position, history and RNG are kept, as are arming and the
+clock position. A config that fails to parse or validate is logged and
+ignored, and the engine carries on with the running one.
+
+Some changes need a restart and are rejected or ignored: `ppq_division`,
+the `midi` section (ports, rate limits, backend), lane ports that would
+need an output port that is not open, and adding lanes while a capture log
+(fixed lane table) is being written.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from .config import LaneDefinition, Settings, load_settings
+
+logger = logging.getLogger(__name__)
+
+POLL_SECONDS = 0.5
+ROUTING_FIELDS = ("cc", "channel", "nrpn", "port", "interpolate")  # changes that leave a lane's motion alone
+
+
+@dataclass
+class SettingsDiff:
+    added_lanes: List[str] = field(default_factory=list)
+    removed_lanes: List[str] = field(default_factory=list)
+    changed_lanes: List[str] = field(default_factory=list)  # rebuilt with fresh state
+    rerouted_lanes: List[str] = field(default_factory=list)  # only routing changed; state kept
+    added_scenes: List[str] = field(default_factory=list)
+    removed_scenes: List[str] = field(default_factory=list)
+    changed_scenes: List[str] = field(default_factory=list)
+    transport: bool = False
+    spiral: bool = False
+    midi: bool = False
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, f.name) for f in fields(self))
+
+    def describe(self) -> str:
+        parts = []
+        for name in ("added_lanes", "removed_lanes", "changed_lanes", "rerouted_lanes", "added_scenes", "removed_scenes", "changed_scenes"):
+            names = getattr(self, name)
+            if names:
+                parts.append(f"{name.replace('_', ' ')} {', '.join(names)}")
+        parts.extend(section for section in ("transport", "spiral", "midi") if getattr(self, section))
+        return "; ".join(parts) or "no changes"
+
+
+def _motion_fields(lane: LaneDefinition) -> Tuple:
+    return tuple(getattr(lane, f.name) for f in fields(lane) if f.name not in ROUTING_FIELDS)
+
+
+def diff_settings(old: Settings, new: Settings) -> SettingsDiff:
+    diff = SettingsDiff()
+    old_lanes = {lane.name: lane for lane in old.lanes}
+    new_lanes = {lane.name: lane for lane in new.lanes}
+    for name, lane in new_lanes.items():
+        previous = old_lanes.get(name)
+        if previous is None:
+            diff.added_lanes.append(name)
+        elif previous != lane:
+            (diff.rerouted_lanes if _motion_fields(previous) == _motion_fields(lane) else diff.changed_lanes).append(name)
+    diff.removed_lanes = [name for name in old_lanes if name not in new_lanes]
+    for name, scene in new.scenes.items():
+        if name not in old.scenes:
+            diff.added_scenes.append(name)
+        elif old.scenes[name] != scene:
+            diff.changed_scenes.append(name)
+    diff.removed_scenes = [name for name in old.scenes if name not in new.scenes]
+    diff.transport = old.transport != new.transport
+    diff.spiral = old.spiral != new.spiral
+    diff.midi = old.midi != new.midi
+    return diff
+
+
+@dataclass
+class ReloadPlan:
+    """Everything the clock thread swaps in for a reload, built off it."""
+
+    base: Settings  # the settings this plan was diffed against
+    settings: Settings
+    diff: SettingsDiff
+    lanes: Dict
+    carried: List[str]  # rebuilt lanes that take over the running lane's state and RNG
+    lane_ports: Dict[str, int]
+    division_lanes: Dict[str, List]
+    division_ticks: Dict[str, int]
+    meta_lanes: Tuple[str | None, str | None]
+    meta_lane_names: set
+    high_res_lanes: set
+    batches: Dict
+    scene_order: List[str]
+    scene_table: object
+    glide: Dict | None
+
+
+class ConfigWatcher:
+    def __init__(self, path: str | Path, on_change: Callable[[Settings], None], poll: float = POLL_SECONDS):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.poll = poll
+        self.reloads = 0
+        self.rejected = 0
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _stat(self) -> Tuple[int, int] | None:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="spiralwalk-config-watch", daemon=True)
+            self._thread.start()
+            logger.info("Watching %s for changes", self.path)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def retry(self) -> None:
+        """Makes the next check reload even if the file has not changed again."""
+        self._signature = None
+
+    def check(self) -> bool:
+        """Reloads if the file changed since the last check; True when the new config was accepted."""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.on_change(load_settings(self.path))
+        except Exception as exc:  # a half-written or invalid file must not stop the watcher
+            self.rejected += 1
+            logger.warning("Config reload from %s rejected: %s", self.path, exc)
+            return False
+        self.reloads += 1
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll):
+            self.check()
@@ -0,0 +1,152 @@
+"""
+Offline rendering: drive the engine from a synthetic clock as fast as possible.
+
+No MIDI ports are opened; every CC the engine emits is recorded with its
+simulated timestamp and clock pulse index and streamed to a CSV file.
+"""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Tuple
+
+import mido
+
+from .config import Settings
+from .engine import AutomationEngine
+from .midi_io import CC14, NRPN, HighResEncoder
+
+TRANSPORT_EVENTS = ("start", "stop", "continue")
+FLUSH_EVERY = 65536  # recorded CCs buffered before a file write
+
+
+def parse_pattern(pattern: str | None, bars: int) -> List[Tuple[str, int]]:
+    """
+    Parses "start:16,stop:1,continue:16" into (event, bars) segments.
+    Each event is sent once, then that many bars of clock follow. No pattern
+    means a single Start followed by `bars` bars.
+    """
+    if not pattern:
+        return [("start", bars)]
+    segments: List[Tuple[str, int]] = []
+    for item in pattern.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        event, _, count = item.partition(":")
+        event = event.strip().lower()
+        if event not in TRANSPORT_EVENTS:
+            raise ValueError(f"Unknown transport event in pattern: {event}")
+        bar_count = int(count) if count else 0
+        if bar_count < 0:
+            raise ValueError(f"Negative bar count in pattern: {item}")
+        segments.append((event, bar_count))
+    if not segments or not any(count for _, count in segments):
+        raise ValueError("Pattern must contain at least one bar of clock")
+    return segments
+
+
+class CCRecorder:
+    """
+    Stands in for MidiOutput during renders; stores raw (tick, port, channel,
+    cc, value) tuples, no mido messages. Extended channels are split back
+    into the output port index and the MIDI channel.
+    """
+
+    def __init__(self) -> None:
+        self.tick = 0
+        self.events: List[Tuple[int, int, int, int, int]] = []
+        self.encoder = HighResEncoder()
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def send_cc(self, cc: int, value: int, channel: int = 0) -> None:
+        self.events.append((self.tick, channel >> 4, channel & 0x0F, cc, value))
+
+    def send_cc14(self, cc: int, value: int, channel: int = 0) -> None:
+        for number, data in self.encoder.encode(CC14, cc, value, channel):
+            self.events.append((self.tick, channel >> 4, channel & 0x0F, number, data))
+
+    def send_nrpn(self, param: int, value: int, channel: int = 0) -> None:
+        for number, data in self.encoder.encode(NRPN, param, value, channel):
+            self.events.append((self.tick, channel >> 4, channel & 0x0F, number, data))
+
+
+@dataclass
+class RenderResult:
+    bars: int
+    ticks: int
+    events: int
+    seconds: float
+
+
+def render(
+    settings: Settings,
+    output_path: str | Path,
+    bars: int,
+    bpm: float = 120.0,
+    pattern: str | None = None,
+    arm_ticks: int = 0,
+    freeze_scene: bool = False,
+    frozen_lanes: list[str] | None = None,
+    soft_start: bool = False,
+    batch: bool = False,
+) -> RenderResult:
+    if bars <= 0:
+        raise ValueError("bars must be positive")
+    if bpm <= 0:
+        raise ValueError("bpm must be positive")
+    segments = parse_pattern(pattern, bars)
+
+    engine = AutomationEngine(
+        settings=settings,
+        dry_run=True,
+        freeze_scene=freeze_scene,
+        frozen_lanes=frozen_lanes,
+        arm_ticks=arm_ticks,
+        soft_start=soft_start,
+        batch=batch,
+    )
+    recorder = CCRecorder()
+    engine.output_port = recorder
+    on_message = engine._on_midi_message
+    messages = {event: mido.Message(event) for event in TRANSPORT_EVENTS + ("clock",)}
+    clock_msg = messages["clock"]
+    ticks_per_bar = engine.clock.ppq * engine.clock.bar_quarters
+    tick_seconds = 60.0 / (bpm * engine.clock.ppq)
+
+    total_ticks = bars * ticks_per_bar
+    tick = 0
+    event_count = 0
+    started = time.perf_counter()
+    with Path(output_path).open("w", encoding="utf-8") as handle:
+        handle.write("time,tick,port,channel,cc,value\n")
+
+        def flush() -> None:
+            handle.writelines(
+                f"{t * tick_seconds:.6f},{t},{port},{channel},{cc},{value}\n" for t, port, channel, cc, value in recorder.events
+            )
+            recorder.events.clear()
+
+        while tick < total_ticks:
+            for event, count in segments:
+                recorder.tick = tick
+                on_message(messages[event])
+                end = min(total_ticks, tick + count * ticks_per_bar)
+                while tick < end:
+                    for tick in range(tick + 1, min(end, tick + ticks_per_bar) + 1):
+                        recorder.tick = tick
+                        on_message(clock_msg)
+                    if len(recorder.events) >= FLUSH_EVERY:
+                        event_count += len(recorder.events)
+                        flush()
+                if tick >= total_ticks:
+                    break
+        event_count += len(recorder.events)
+        flush()
+
+    return RenderResult(bars=bars, ticks=tick, events=event_count, seconds=time.perf_counter() - started)
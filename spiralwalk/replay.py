@@ -1,20 +1,169 @@
 import logging
 import threading
 import time
-from typing import Dict, List
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple
 
 from .clock import ClockFollower
-from .config import Settings
-from .midi_io import MidiInput, MidiOutput
+from .config import Settings, assign_output_ports
+from .midi_io import CC, NRPN, MidiInput, build_output, port_channel, send_value
+from .sessionlog import iter_log_frames
 
 logger = logging.getLogger(__name__)
 
+PREFETCH_FRAMES = 32
+START_PREFILL_SECONDS = 0.25  # longest a Start waits for the reread section's first frames
+
+
+def lane_targets(settings: Settings, lane_ports: Dict[str, int]) -> Dict[str, Tuple[str, int, int]]:
+    """(output kind, CC or NRPN parameter, extended channel) per lane name, for midi_io.send_value."""
+    return {
+        lane.name: (lane.output, lane.nrpn if lane.output == NRPN else lane.cc, port_channel(lane_ports[lane.name], lane.channel))
+        for lane in settings.lanes
+    }
+
+
+def send_logged(output, target: Tuple[str, int, int], value: int) -> None:
+    """Sends a session-log value to a lane target; logs keep only the 7-bit MSB of cc14/NRPN lanes."""
+    kind, number, channel = target
+    send_value(output, kind, number, value if kind == CC else value << 7, channel)
+
+
+class FrameStream:
+    """
+    Session-log frames decoded lazily on a background thread, never more than
+    `prefetch` ahead of the reader, so memory and time to the first frame do
+    not depend on the log's length. Reading begins at record `start` (see
+    sessionlog.resolve_log_position) and covers `count` records, or the rest
+    of the log. With `loop` the section starts over when it runs out;
+    `restart()` drops the window and rereads it from the top. The clock
+    thread reads with `poll()`, which never waits; `prefill()` waits for the
+    window to fill first.
+    """
+
+    def __init__(self, path: str | Path, prefetch: int = PREFETCH_FRAMES, loop: bool = True, start: int = 0, count: int | None = None):
+        self.path = Path(path)
+        self.prefetch = max(1, prefetch)
+        self.loop = loop
+        self.start_record = start
+        self.count = count
+        self._buffer: Deque[Dict[str, int]] = deque()
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._ended = False
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._fill, name="spiralwalk-frames", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def restart(self) -> None:
+        with self._cond:
+            self._generation += 1
+            self._buffer.clear()
+            self._ended = False
+            self._cond.notify_all()
+
+    def is_empty(self) -> bool:
+        """Waits for the first frame; True if the log has none."""
+        self.start()
+        with self._cond:
+            while not self._buffer and not self._ended and not self._closed:
+                self._cond.wait()
+            return not self._buffer
+
+    def prefill(self, timeout: float | None = None) -> bool:
+        """Waits until `prefetch` frames are buffered or the stream has ended; False on timeout."""
+        self.start()
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self._buffer) >= self.prefetch or self._ended or self._closed, timeout)
+
+    def poll(self) -> Dict[str, int] | None:
+        """The next frame if one is buffered, without waiting; see `exhausted` to tell an underrun from the end."""
+        with self._cond:
+            if not self._buffer:
+                return None
+            frame = self._buffer.popleft()
+            self._cond.notify_all()
+            return frame
+
+    @property
+    def exhausted(self) -> bool:
+        """True once a non-looping stream has handed out its last frame."""
+        with self._cond:
+            return self._ended and not self._buffer
+
+    def next_frame(self) -> Dict[str, int] | None:
+        """The next frame, or None once a non-looping stream is exhausted."""
+        self.start()
+        with self._cond:
+            while not self._buffer and not self._ended and not self._closed:
+                self._cond.wait()
+            if not self._buffer:
+                return None
+            frame = self._buffer.popleft()
+            self._cond.notify_all()
+            return frame
+
+    def _frames(self):
+        frames = iter_log_frames(self.path, start=self.start_record)
+        try:
+            yield from (frames if self.count is None else islice(frames, self.count))
+        finally:
+            frames.close()
+
+    def _fill(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                generation = self._generation
+            produced = self._read_pass(generation)
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                if self.loop and produced:
+                    continue
+                self._ended = True
+                self._cond.notify_all()
+                while not self._closed and generation == self._generation:
+                    self._cond.wait()
+
+    def _read_pass(self, generation: int) -> int:
+        produced = 0
+        frames = self._frames()
+        try:
+            for frame in frames:
+                with self._cond:
+                    while not self._closed and generation == self._generation and len(self._buffer) >= self.prefetch:
+                        self._cond.wait()
+                    if self._closed or generation != self._generation:
+                        break
+                    self._buffer.append(frame)
+                    self._cond.notify_all()
+                produced += 1
+        finally:
+            frames.close()
+        return produced
+
 
 class TempoReplay:
     def __init__(
         self,
         settings: Settings,
-        frames: List[Dict[str, int]],
+        frames: FrameStream | None,
         virtual: bool = False,
         in_port_override: str | None = None,
         out_port_override: str | None = None,
@@ -30,36 +179,47 @@ class TempoReplay:
         self.dry_run = dry_run
 
         self.clock = ClockFollower(ppq=settings.transport.ppq_division)
-        self.clock.register_callback("1/16", self._on_division)
+        self.clock.register_bar_callback(self._on_bar)
 
         in_name = in_port_override or settings.midi.in_port_name
-        out_name = out_port_override or settings.midi.out_port_name
+        out_ports, lane_ports = assign_output_ports(settings, out_port_override)
         self.input_port = MidiInput(in_name, callback=self._on_midi_message, use_virtual=self.virtual)
-        self.output_port = MidiOutput(out_name, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=self.dry_run, use_virtual=self.virtual)
+        self.output_port = build_output(out_ports, max_messages_per_sec=settings.midi.max_messages_per_sec, dry_run=self.dry_run, use_virtual=self.virtual, burst=settings.midi.burst, coalesce=settings.midi.coalesce, backend=settings.midi.backend, send_batch=settings.midi.send_batch)
 
-        self.lane_map = {lane.name: (lane.cc, lane.channel) for lane in settings.lanes}
+        self.lane_map = lane_targets(settings, lane_ports)
         self._stop_event = threading.Event()
         self._armed = self.arm_ticks == 0
         self._ticks_since_start = 0
         self._frame_index = 0
+        self.underruns = 0  # bars that found no frame buffered and held the previous one
+
+    def _is_empty(self) -> bool:
+        return self.frames.is_empty()
 
     def run(self) -> None:
         logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
-        if not self.frames:
-            logger.warning("No frames to replay.")
-            return
-        self.input_port.open()
-        self.output_port.open()
-        self._stop_event.clear()
         try:
-            while not self._stop_event.is_set():
-                time.sleep(0.01)
+            if self._is_empty():
+                logger.warning("No frames to replay.")
+                return
+            if self.frames:
+                self.frames.prefill()
+            self.input_port.open()
+            self.output_port.open()
+            self._stop_event.clear()
+            try:
+                while not self._stop_event.is_set():
+                    time.sleep(0.01)
+            finally:
+                self.input_port.close()
+                self.output_port.close()
         finally:
-            self.input_port.close()
-            self.output_port.close()
+            if self.frames:
+                self.frames.close()
 
     def _on_midi_message(self, message) -> None:
         if message.type == "clock":
+            self.clock.tempo.tick(time.monotonic())
             self.clock.handle_message("clock")
             if self.clock.running and not self._armed:
                 self._ticks_since_start += 1
@@ -69,6 +229,10 @@ class TempoReplay:
         elif message.type == "start":
             self.clock.start()
             self._frame_index = 0
+            if self.frames:
+                self.frames.restart()
+                # the section is reread from the top; let it buffer before the first bar pops from it
+                self.frames.prefill(START_PREFILL_SECONDS)
             self._armed = self.arm_ticks == 0
             self._ticks_since_start = 0
         elif message.type == "continue":
@@ -82,18 +246,60 @@ class TempoReplay:
             self.clock.stop()
             self._armed = False
 
-    def _on_division(self, bar: int, quarter: int, tick: int) -> None:
+    def _on_bar(self, bar: int, quarter: int, tick: int) -> None:
         if not self._armed:
             return
-        ticks_per_bar = self.clock.ppq * self.clock.bar_quarters
-        if tick % ticks_per_bar != 0:
+        # never wait for the reader on the clock thread; the outputs hold the last frame's values
+        frame = self.frames.poll()
+        if frame is None:
+            if not self.frames.exhausted:
+                self.underruns += 1
+                logger.warning("Replay underrun at bar %s: frame %s not read yet, holding the last frame", bar + 1, self._frame_index)
             return
-        frame = self.frames[self._frame_index % len(self.frames)]
         logger.info("Replay bar %s frame %s", bar + 1, self._frame_index)
         for lane_name, value in frame.items():
-            mapping = self.lane_map.get(lane_name)
-            if not mapping:
-                continue
-            cc, channel = mapping
-            self.output_port.send_cc(cc, int(value), channel=channel)
+            target = self.lane_map.get(lane_name)
+            if target:
+                send_logged(self.output_port, target, int(value))
         self._frame_index += 1
+
+
+class CaptureReplay(TempoReplay):
+    """
+    Tempo-locked replay of a capture log: every CC goes out on the clock pulse
+    it was recorded on. Loops when the capture runs out; Start rewinds.
+    """
+
+    def __init__(self, settings: Settings, timeline: List[Tuple[int, str, int, int, int]], **kwargs):
+        super().__init__(settings, frames=None, **kwargs)
+        self.timeline = timeline  # capture.iter_timeline events, position ascending
+        self._cursor = 0
+        self._offset = 0  # incoming tick at which the current pass of the timeline began
+        self.clock.register_callback(f"1/{self.clock.ppq * 4}", self._on_tick)
+
+    def _is_empty(self) -> bool:
+        return not self.timeline
+
+    def _on_midi_message(self, message) -> None:
+        super()._on_midi_message(message)
+        if message.type == "start":
+            self._cursor = 0
+            self._offset = 0
+
+    def _on_bar(self, bar: int, quarter: int, tick: int) -> None:
+        pass
+
+    def _on_tick(self, bar: int, quarter: int, tick: int) -> None:
+        timeline = self.timeline
+        if self._cursor >= len(timeline):
+            self._cursor = 0
+            self._offset = tick - 1
+        position = tick - self._offset
+        cursor = self._cursor
+        while cursor < len(timeline) and timeline[cursor][0] <= position:
+            event_position, kind, number, channel, value = timeline[cursor]
+            # events passed while disarmed are skipped, not sent late
+            if self._armed and event_position == position:
+                send_value(self.output_port, kind, number, value, channel)
+            cursor += 1
+        self._cursor = cursor
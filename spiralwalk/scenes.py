@@ -0,0 +1,69 @@
+from typing import Dict, List, Tuple
+
+from .config import Settings
+
+MAX_ADJUSTED_ENTRIES = 1 << 16  # memo is cleared past this many (scene, lane, meta) combinations
+
+
+def adjust_scene_params(scene_params: Dict, restraint: float, contrast: float) -> Dict:
+    """Shrinks/expands a lane's min/max around its midpoint using the meta lane levels (0..1)."""
+    scene_min = int(scene_params.get("min", 0))
+    scene_max = int(scene_params.get("max", 127))
+    midpoint = (scene_min + scene_max) / 2
+    half_range = max(1.0, (scene_max - scene_min) / 2)
+
+    # shrink/expand ranges
+    half_range *= (1 - 0.8 * restraint)
+    half_range *= (1 + 0.8 * contrast)
+
+    new_min = max(0, int(midpoint - half_range))
+    new_max = min(127, int(midpoint + half_range))
+    scene_params = dict(scene_params)
+    scene_params["min"] = new_min
+    scene_params["max"] = new_max
+    return scene_params
+
+
+class SceneTable:
+    """
+    Scenes compiled once into flat per-scene, per-lane parameter dicts, in
+    scene-order position. Meta-adjusted copies are memoized by the meta lanes'
+    CC values, so a division callback only does dict lookups.
+    """
+
+    def __init__(self, settings: Settings, scene_order: List[str], reuse: Dict[str, Dict[str, Dict]] | None = None):
+        """`reuse` maps scene names to rows compiled earlier from identical scene definitions (config reload)."""
+        self.scene_order = list(scene_order)
+        self.rows: List[Dict[str, Dict]] = []
+        for scene_name in self.scene_order:
+            row = reuse.get(scene_name) if reuse else None
+            if row is None:
+                row = self._compile(settings.scenes[scene_name])
+            self.rows.append(row)
+        self._adjusted: Dict[Tuple[int, str, int, int], Dict] = {}
+
+    @staticmethod
+    def _compile(scene: Dict) -> Dict[str, Dict]:
+        row: Dict[str, Dict] = {}
+        for lane_name, scene_params in scene.items():
+            if not scene_params:
+                continue
+            params = dict(scene_params.__dict__ if hasattr(scene_params, "__dict__") else scene_params)
+            params["min"] = int(params.get("min", 0))
+            params["max"] = int(params.get("max", 127))
+            row[lane_name] = params
+        return row
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def adjusted(self, scene_index: int, lane_name: str, restraint: int, contrast: int) -> Dict:
+        """Params for a lane with the meta lanes at the given CC values (0..127)."""
+        key = (scene_index, lane_name, restraint, contrast)
+        params = self._adjusted.get(key)
+        if params is None:
+            if len(self._adjusted) >= MAX_ADJUSTED_ENTRIES:
+                self._adjusted.clear()
+            params = adjust_scene_params(self.rows[scene_index][lane_name], restraint / 127.0, contrast / 127.0)
+            self._adjusted[key] = params
+        return params
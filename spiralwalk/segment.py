@@ -0,0 +1,211 @@
+"""
+Change-point segmentation for derive-scenes.
+
+Splits a log into the `scene_count` contiguous segments that best explain the
+lane data, scoring a segment by the squared deviation of each lane from its
+segment mean (bars where a lane has no value are skipped). Per-lane prefix
+sums make any segment's cost O(lanes), so:
+
+1. candidate boundaries are restricted to at most `max_candidates`
+   positions: the bars where the logged scene_index changes (evenly
+   subsampled to half the budget when there are more) plus an evenly spaced
+   grid filling the rest;
+2. an exact dynamic program picks the best `scene_count` segments over the
+   candidates, one vectorized min-plus step per segment. A boundary on a
+   scene_index change is discounted by `hint_weight` bars' worth of the
+   log's average per-bar cost, so logged scene changes win close calls;
+3. each boundary is refined bar-by-bar within one grid step of where the DP
+   put it, holding its neighbours fixed. Boundaries on a scene_index change
+   stay put.
+
+Requires numpy.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from .sessionlog import MISSING, RECORD_HEAD, SessionLogReader, is_binary_log
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+MAX_CANDIDATES = 2048
+REFINE_PASSES = 2
+HINT_WEIGHT = 8.0
+BINS = 128
+
+Segment = Tuple[int, int]
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("Change-point segmentation requires numpy (pip install numpy)")
+
+
+def load_log_matrix(log_path: str | Path) -> Tuple[List[str], "np.ndarray", "np.ndarray | None"]:
+    """
+    (lane names, bars x lanes uint8 values with MISSING for absent lanes,
+    per-bar scene_index or None when the log has none).
+    """
+    require_numpy()
+    if is_binary_log(log_path):
+        with SessionLogReader(log_path) as reader:
+            lane_names = list(reader.lane_names)
+            if not reader.count:
+                return lane_names, np.zeros((0, len(lane_names)), dtype=np.uint8), None
+            records = np.frombuffer(reader.raw_records(), dtype=np.uint8).reshape(reader.count, reader.record_size)
+        values = records[:, RECORD_HEAD.size:].copy()
+        scenes = records[:, 4:6].copy().view("<u2").ravel().astype(np.int64)
+        return lane_names, values, scenes
+
+    lane_names: List[str] = []
+    columns: Dict[str, bytearray] = {}
+    scenes: List[int] = []
+    has_scenes = False
+    bars = 0
+    with Path(log_path).open("r", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "scene_index" in entry:
+                has_scenes = True
+            scenes.append(int(entry.get("scene_index", -1)))
+            for name, value in entry.get("lanes", {}).items():
+                column = columns.get(name)
+                if column is None:
+                    lane_names.append(name)
+                    column = columns[name] = bytearray([MISSING]) * bars
+                column.append(max(0, min(BINS - 1, int(value))))
+            bars += 1
+            for column in columns.values():
+                if len(column) < bars:
+                    column.append(MISSING)
+    values = np.zeros((bars, len(lane_names)), dtype=np.uint8)
+    for i, name in enumerate(lane_names):
+        values[:, i] = np.frombuffer(bytes(columns[name]), dtype=np.uint8)
+    return lane_names, values, np.array(scenes, dtype=np.int64) if has_scenes else None
+
+
+class _CostModel:
+    """Segment costs from per-lane prefix sums of count, sum and sum of squares."""
+
+    def __init__(self, values: "np.ndarray"):
+        present = values != MISSING
+        x = np.where(present, values, 0).astype(np.float64)
+        n, lanes = values.shape
+        self.count = np.zeros((n + 1, lanes))
+        self.total = np.zeros((n + 1, lanes))
+        self.squares = np.zeros((n + 1, lanes))
+        np.cumsum(present, axis=0, out=self.count[1:])
+        np.cumsum(x, axis=0, out=self.total[1:])
+        np.cumsum(x * x, axis=0, out=self.squares[1:])
+
+    def cost(self, starts: "np.ndarray", ends: "np.ndarray") -> "np.ndarray":
+        """Cost of segments [starts, ends), broadcasting the two index arrays."""
+        starts = np.asarray(starts)
+        ends = np.asarray(ends)
+        count = self.count[ends] - self.count[starts]
+        total = self.total[ends] - self.total[starts]
+        squares = self.squares[ends] - self.squares[starts]
+        mean_term = np.divide(total * total, count, out=np.zeros_like(total), where=count > 0)
+        return (squares - mean_term).sum(axis=-1)
+
+    def cost_matrix(self, positions: "np.ndarray") -> "np.ndarray":
+        """cost[i, j] for segments [positions[i], positions[j]), summed one lane at a time to bound memory."""
+        size = len(positions)
+        cost = np.zeros((size, size))
+        for lane in range(self.count.shape[1]):
+            count = self.count[positions, lane]
+            total = self.total[positions, lane]
+            squares = self.squares[positions, lane]
+            seg_count = count[None, :] - count[:, None]
+            seg_total = total[None, :] - total[:, None]
+            cost += squares[None, :] - squares[:, None]
+            cost -= np.divide(seg_total * seg_total, seg_count, out=np.zeros_like(seg_total), where=seg_count > 0)
+        return cost
+
+
+def _hint_positions(scenes: "np.ndarray | None") -> "np.ndarray":
+    if scenes is None or scenes.size < 2:
+        return np.zeros(0, dtype=np.int64)
+    return np.flatnonzero(scenes[1:] != scenes[:-1]) + 1
+
+
+def changepoint_segments(
+    values: "np.ndarray",
+    scene_count: int,
+    scenes: "np.ndarray | None" = None,
+    max_candidates: int = MAX_CANDIDATES,
+    hint_weight: float = HINT_WEIGHT,
+) -> List[Segment]:
+    """Best `scene_count` contiguous [start, end) bar ranges; fewer if the log has fewer bars."""
+    require_numpy()
+    n = len(values)
+    if n == 0 or scene_count <= 0:
+        return []
+    model = _CostModel(values)
+    max_candidates = max(2, max_candidates)
+    hints = _hint_positions(scenes)
+    if hints.size > max_candidates // 2:
+        # the cost matrix is quadratic in the candidates, so hints share the budget with the grid
+        hints = hints[np.linspace(0, hints.size - 1, max_candidates // 2).round().astype(np.int64)]
+    step = max(1, -(-n // (max_candidates - hints.size)))
+    candidates = np.union1d(np.union1d(np.arange(0, n, step), hints), [n])
+    segments = min(scene_count, len(candidates) - 1)
+
+    # cost[i, j] = cost of the segment from candidate i to candidate j (inf unless i < j)
+    index = np.arange(len(candidates))
+    cost = model.cost_matrix(candidates)
+    cost[index[:, None] >= index[None, :]] = np.inf
+    if hints.size:
+        # the epsilon still breaks ties toward hints when the data is flat
+        bonus = hint_weight * float(model.cost(0, n)) / n + 1e-9
+        cost[:, np.isin(candidates, hints)] -= bonus
+
+    best = cost[0].copy()
+    back: List["np.ndarray"] = []
+    for _ in range(1, segments):
+        totals = best[:, None] + cost
+        back.append(totals.argmin(axis=0))
+        best = totals.min(axis=0)
+    bounds = [len(candidates) - 1]
+    for choice in reversed(back):
+        bounds.append(int(choice[bounds[-1]]))
+    bounds.append(0)
+    boundaries = [int(candidates[i]) for i in reversed(bounds)]
+
+    fixed = set(hints.tolist())
+    for _ in range(REFINE_PASSES):
+        moved = False
+        for k in range(1, len(boundaries) - 1):
+            if boundaries[k] in fixed:
+                continue
+            lo = max(boundaries[k - 1] + 1, boundaries[k] - step)
+            hi = min(boundaries[k + 1] - 1, boundaries[k] + step)
+            if lo >= hi:
+                continue
+            options = np.arange(lo, hi + 1)
+            totals = model.cost(boundaries[k - 1], options) + model.cost(options, boundaries[k + 1])
+            choice = int(options[totals.argmin()])
+            if choice != boundaries[k]:
+                boundaries[k] = choice
+                moved = True
+        if not moved:
+            break
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def segment_histograms(lane_names: Sequence[str], values: "np.ndarray", segments: Sequence[Segment], scene_count: int) -> List[Dict[str, List[int]]]:
+    """Per-segment, per-lane CC histograms in the shape derive.derive_histograms returns."""
+    histograms: List[Dict[str, List[int]]] = [{} for _ in range(scene_count)]
+    for histogram, (start, end) in zip(histograms, segments):
+        for i, name in enumerate(lane_names):
+            column = values[start:end, i]
+            column = column[column != MISSING]
+            if column.size:
+                histogram[name] = np.bincount(np.minimum(column, BINS - 1), minlength=BINS).tolist()
+    return histograms
@@ -0,0 +1,622 @@
+"""
+Session log formats.
+
+JSONL: one JSON object per bar snapshot (the original format).
+
+Binary (.swlog): a fixed header followed by fixed-width records, so readers
+can memory-map the file and index bars directly without parsing:
+
+    magic      6 bytes   b"SWLOG\\x00"
+    version    uint16
+    header_len uint32
+    header     JSON: {"lanes": [...], "frozen_scene": bool, "frozen_lanes": [...]}
+    records    bar uint32, scene_index uint16, timestamp float64, one uint8 per lane
+
+Lane bytes hold the last CC value, or MISSING when the lane had not output yet.
+All integers are little-endian.
+
+Either format can carry a sidecar bar index (<log>.idx), written alongside the
+log or rebuilt with `build_index`, so replay can seek without scanning:
+
+    magic      6 bytes   b"SWIDX\x00"
+    version    uint16
+    records    bar uint32, scene_index uint16, flags uint8, byte offset uint64
+
+One index record per log record, in log order. FLAG_SCENE_CHANGE marks the
+first record and every record whose scene_index differs from the one before.
+"""
+
+import json
+import logging
+import mmap
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from .stats import LAG_BUCKETS, Histogram
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SWLOG\x00"
+VERSION = 1
+PREAMBLE = struct.Struct("<6sHI")
+RECORD_HEAD = struct.Struct("<IHd")
+MISSING = 255
+BINARY_SUFFIX = ".swlog"
+
+CLOSE_TIMEOUT = 5.0  # seconds close() waits for room in a full queue
+
+INDEX_MAGIC = b"SWIDX\x00"
+INDEX_VERSION = 1
+INDEX_PREAMBLE = struct.Struct("<6sH")
+INDEX_RECORD = struct.Struct("<IHBQ")
+INDEX_SUFFIX = ".idx"
+FLAG_SCENE_CHANGE = 1
+
+
+def index_path(log_path: str | Path) -> Path:
+    return Path(str(log_path) + INDEX_SUFFIX)
+
+
+class BarIndexWriter:
+    """Appends one index record per log record; continues an existing index file."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._handle = None
+        self._last_scene: int | None = None
+
+    def _open(self) -> None:
+        if self.path.exists() and self.path.stat().st_size > INDEX_PREAMBLE.size:
+            index = BarIndex(self.path)
+            if len(index):
+                self._last_scene = index.entry(len(index) - 1)[1]
+            self._handle = self.path.open("ab")
+            return
+        self._handle = self.path.open("wb")
+        self._handle.write(INDEX_PREAMBLE.pack(INDEX_MAGIC, INDEX_VERSION))
+
+    def add(self, bar: int, scene_index: int, offset: int) -> None:
+        if self._handle is None:
+            self._open()
+        flags = FLAG_SCENE_CHANGE if scene_index != self._last_scene else 0
+        self._last_scene = scene_index
+        self._handle.write(INDEX_RECORD.pack(bar, scene_index, flags, offset))
+
+    def flush(self) -> None:
+        if self._handle:
+            self._handle.flush()
+
+    def close(self) -> None:
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+
+
+class BarIndex:
+    """A loaded bar index; records are decoded on access."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._data = self.path.read_bytes()
+        if len(self._data) < INDEX_PREAMBLE.size:
+            raise ValueError(f"{self.path} is not a session log index")
+        magic, version = INDEX_PREAMBLE.unpack_from(self._data, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{self.path} is not a session log index")
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported session log index version {version}")
+        self.count = (len(self._data) - INDEX_PREAMBLE.size) // INDEX_RECORD.size
+        self._bars: Dict[int, int] | None = None  # bar -> first record index, built on the first find_bar
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entry(self, index: int) -> Tuple[int, int, int, int]:
+        """(bar, scene_index, flags, byte offset) of one log record."""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return INDEX_RECORD.unpack_from(self._data, INDEX_PREAMBLE.size + index * INDEX_RECORD.size)
+
+    def offset(self, index: int) -> int:
+        return self.entry(index)[3]
+
+    def _records(self) -> Iterator[Tuple[int, int, int, int]]:
+        end = INDEX_PREAMBLE.size + self.count * INDEX_RECORD.size
+        return INDEX_RECORD.iter_unpack(memoryview(self._data)[INDEX_PREAMBLE.size:end])
+
+    def find_bar(self, bar: int) -> int:
+        """Record index of the first record logged at `bar`."""
+        if self._bars is None:
+            # bars restart when a log is appended to by a new run, so the column is not sorted
+            self._bars = {}
+            for index, record in enumerate(self._records()):
+                self._bars.setdefault(record[0], index)
+        try:
+            return self._bars[bar]
+        except KeyError:
+            raise ValueError(f"Bar {bar} is not in {self.path}") from None
+
+    def scene_changes(self) -> List[int]:
+        """Record indices where a scene starts; the first is always 0."""
+        return [index for index, record in enumerate(self._records()) if record[2] & FLAG_SCENE_CHANGE]
+
+
+def build_index(log_path: str | Path) -> int:
+    """(Re)writes the sidecar index for a log of either format. Returns the number of records."""
+    path = index_path(log_path)
+    path.unlink(missing_ok=True)
+    writer = BarIndexWriter(path)
+    count = 0
+    try:
+        writer._open()
+        if is_binary_log(log_path):
+            with SessionLogReader(log_path) as reader:
+                for index in range(reader.count):
+                    bar, scene_index, _ = RECORD_HEAD.unpack_from(reader._map, reader.offset(index))
+                    writer.add(bar, scene_index, reader.offset(index))
+                    count += 1
+        else:
+            for offset, entry in _iter_jsonl_with_offsets(log_path):
+                writer.add(int(entry.get("bar", 0)), int(entry.get("scene_index", 0)), offset)
+                count += 1
+    finally:
+        writer.close()
+    return count
+
+
+def _index_is_current(log_path: str | Path, index: BarIndex) -> bool:
+    """Whether `index` has exactly one record per record of the log."""
+    if is_binary_log(log_path):
+        with SessionLogReader(log_path) as reader:
+            return len(index) == reader.count
+    with Path(log_path).open("rb") as handle:
+        if not len(index):
+            return not any(line.strip() for line in handle)
+        # the last indexed record must be the log's last line
+        handle.seek(index.offset(len(index) - 1))
+        return handle.readline().startswith(b"{") and not any(line.strip() for line in handle)
+
+
+def _current_index(log_path: str | Path) -> BarIndex | None:
+    try:
+        index = BarIndex(index_path(log_path))
+    except (OSError, ValueError):
+        return None
+    return index if _index_is_current(log_path, index) else None
+
+
+def load_index(log_path: str | Path) -> BarIndex:
+    """The log's sidecar index, (re)built first if it is missing or does not match the log."""
+    path = index_path(log_path)
+    index = _current_index(log_path)
+    if index is None:
+        logger.info("%s index for %s; building %s", "Stale" if path.exists() else "No", log_path, path)
+        build_index(log_path)
+        index = BarIndex(path)
+    return index
+
+
+def resolve_log_position(log_path: str | Path, bar: int | None = None, scene_change: int | None = None) -> int:
+    """
+    Record index to start reading at: the first record logged at `bar`, or the
+    start of the Nth scene (0 is the start of the log).
+    """
+    if bar is None and scene_change is None:
+        return 0
+    index = load_index(log_path)
+    if bar is not None:
+        return index.find_bar(bar)
+    changes = index.scene_changes()
+    if not 0 <= scene_change < len(changes):
+        raise ValueError(f"{log_path} has {len(changes) - 1} scene changes")
+    return changes[scene_change]
+
+
+def _open_index(log_path: Path) -> BarIndexWriter:
+    # an existing log without a matching index is indexed once before appending to it
+    if log_path.exists() and log_path.stat().st_size > 0 and _current_index(log_path) is None:
+        build_index(log_path)
+    return BarIndexWriter(index_path(log_path))
+
+
+class JsonlSessionLog:
+    """Appends one JSON line per bar snapshot; the file is opened on first write."""
+
+    def __init__(self, path: str | Path, index: bool = False):
+        self.path = Path(path)
+        self.index = index
+        self._handle = None
+        self._index: BarIndexWriter | None = None
+
+    def append(self, entry: Dict) -> None:
+        if self._handle is None:
+            if self.index:
+                self._index = _open_index(self.path)
+            self._handle = self.path.open("ab")
+        if self._index:
+            self._index.add(int(entry.get("bar", 0)), int(entry.get("scene_index", 0)), self._handle.tell())
+        self._handle.write((json.dumps(entry) + "\n").encode("utf-8"))
+
+    def flush(self) -> None:
+        if self._handle:
+            self._handle.flush()
+        if self._index:
+            self._index.flush()
+
+    def write(self, entry: Dict) -> None:
+        self.append(entry)
+        self.flush()
+
+    def close(self) -> None:
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+        if self._index:
+            self._index.close()
+            self._index = None
+
+
+def _encode_header(lane_names: Sequence[str], frozen_scene: bool, frozen_lanes: Sequence[str]) -> bytes:
+    header = json.dumps({"lanes": list(lane_names), "frozen_scene": frozen_scene, "frozen_lanes": sorted(frozen_lanes)}).encode("utf-8")
+    return PREAMBLE.pack(MAGIC, VERSION, len(header)) + header
+
+
+class BinarySessionLog:
+    """Appends fixed-width bar records; the lane dictionary is fixed when the file is created."""
+
+    def __init__(self, path: str | Path, lane_names: Sequence[str], frozen_scene: bool = False, frozen_lanes: Sequence[str] = (), index: bool = False):
+        self.path = Path(path)
+        self.lane_names = list(lane_names)
+        self.frozen_scene = frozen_scene
+        self.frozen_lanes = sorted(frozen_lanes)
+        self.index = index
+        self._lane_index = {name: i for i, name in enumerate(self.lane_names)}
+        self._handle = None
+        self._index: BarIndexWriter | None = None
+
+    def _open(self) -> None:
+        existing = self.path.exists() and self.path.stat().st_size > 0
+        if existing:
+            with SessionLogReader(self.path) as reader:
+                if reader.lane_names != self.lane_names:
+                    raise ValueError(f"{self.path} was written with different lanes; use a new session log")
+                end = reader.offset(reader.count)
+            if self.path.stat().st_size > end:
+                # a crash left a partial record; appending after it would misalign every later one
+                logger.warning("Dropping a partial trailing record from %s", self.path)
+                with self.path.open("r+b") as handle:
+                    handle.truncate(end)
+        if self.index:
+            self._index = _open_index(self.path)
+        if existing:
+            self._handle = self.path.open("ab")
+            return
+        self._handle = self.path.open("wb")
+        self._handle.write(_encode_header(self.lane_names, self.frozen_scene, self.frozen_lanes))
+
+    def encode(self, entry: Dict) -> bytes:
+        values = bytearray([MISSING]) * len(self.lane_names)
+        for name, value in entry.get("lanes", {}).items():
+            i = self._lane_index.get(name)
+            if i is not None:
+                values[i] = max(0, min(127, int(value)))
+        return RECORD_HEAD.pack(int(entry.get("bar", 0)), int(entry.get("scene_index", 0)), float(entry.get("timestamp", 0.0))) + values
+
+    def append(self, entry: Dict) -> None:
+        if self._handle is None:
+            self._open()
+        if self._index:
+            self._index.add(int(entry.get("bar", 0)), int(entry.get("scene_index", 0)), self._handle.tell())
+        self._handle.write(self.encode(entry))
+
+    def flush(self) -> None:
+        if self._handle:
+            self._handle.flush()
+        if self._index:
+            self._index.flush()
+
+    def write(self, entry: Dict) -> None:
+        self.append(entry)
+        self.flush()
+
+    def close(self) -> None:
+        if self._handle:
+            self._handle.close()
+            self._handle = None
+        if self._index:
+            self._index.close()
+            self._index = None
+
+
+class AsyncSessionLog:
+    """
+    Hands entries to a background thread through a bounded queue so the clock
+    thread never touches the disk. The thread appends in batches and flushes
+    every `flush_size` records or `flush_interval` seconds, whichever comes
+    first. A full queue drops the entry rather than blocking the caller. If
+    the writer raises, the error is logged and every later entry is dropped.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, writer, queue_size: int = 1024, flush_interval: float = 1.0, flush_size: int = 64):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.flush_size = max(1, flush_size)
+        self.written = 0
+        self.dropped = 0
+        self.delayed = 0  # records that waited longer than flush_interval to reach the file
+        self.max_lag = 0.0
+        self.failed = False  # the writer thread died; entries are dropped from then on
+        self.lag = Histogram(LAG_BUCKETS)  # seconds from write() to the flush that made the record durable
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def write(self, entry: Dict) -> None:
+        if self.failed:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="spiralwalk-session-log", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((time.monotonic(), entry))
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> Dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "delayed": self.delayed,
+            "queued": self._queue.qsize(),
+            "max_lag": self.max_lag,
+        }
+
+    def _run(self) -> None:
+        try:
+            self._drain()
+        except Exception:
+            self.failed = True
+            logger.exception("Session log writer failed; dropping further entries")
+
+    def _drain(self) -> None:
+        pending: List[float] = []
+        last_flush = time.monotonic()
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is self._CLOSE:
+                self._flush(pending)
+                return
+            if item is not None:
+                queued_at, entry = item
+                self.writer.append(entry)
+                pending.append(queued_at)
+            now = time.monotonic()
+            if pending and (len(pending) >= self.flush_size or now - last_flush >= self.flush_interval):
+                self._flush(pending)
+                last_flush = time.monotonic()
+
+    def _flush(self, pending: List[float]) -> None:
+        if not pending:
+            return
+        self.writer.flush()
+        now = time.monotonic()
+        for queued_at in pending:
+            lag = now - queued_at
+            self.lag.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > self.flush_interval:
+                self.delayed += 1
+        self.written += len(pending)
+        pending.clear()
+
+    def close(self) -> None:
+        """Drains everything still queued, then closes the underlying writer."""
+        if self._thread is not None:
+            if self._thread.is_alive():
+                try:
+                    self._queue.put(self._CLOSE, timeout=CLOSE_TIMEOUT)
+                except queue.Full:
+                    logger.warning("Session log writer is not draining; closing with %s records queued", self._queue.qsize())
+                else:
+                    self._thread.join()
+            self._thread = None
+        self.writer.close()
+        if self.written or self.dropped:
+            logger.info(
+                "Session log: %s records written, %s dropped, %s delayed (max lag %.3fs)",
+                self.written,
+                self.dropped,
+                self.delayed,
+                self.max_lag,
+            )
+
+
+def open_session_log(path: str | Path, lane_names: Sequence[str], frozen_scene: bool = False, frozen_lanes: Sequence[str] = (), index: bool = False):
+    """Picks the binary writer for .swlog paths, JSONL otherwise."""
+    if Path(path).suffix.lower() == BINARY_SUFFIX:
+        return BinarySessionLog(path, lane_names, frozen_scene=frozen_scene, frozen_lanes=frozen_lanes, index=index)
+    return JsonlSessionLog(path, index=index)
+
+
+def is_binary_log(path: str | Path) -> bool:
+    with Path(path).open("rb") as handle:
+        return handle.read(len(MAGIC)) == MAGIC
+
+
+class SessionLogReader:
+    """Memory-mapped view of a binary session log; records are decoded on access only."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{self.path} is empty") from None
+        if len(self._map) < PREAMBLE.size:
+            self.close()
+            raise ValueError(f"{self.path} is not a binary session log")
+        magic, version, header_len = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a binary session log")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Unsupported session log version {version}")
+        header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_len].decode("utf-8"))
+        self.lane_names: List[str] = header["lanes"]
+        self.frozen_scene: bool = header.get("frozen_scene", False)
+        self.frozen_lanes: List[str] = header.get("frozen_lanes", [])
+        self.data_offset = PREAMBLE.size + header_len
+        self.record_size = RECORD_HEAD.size + len(self.lane_names)
+        # a partially written trailing record is ignored
+        self.count = (len(self._map) - self.data_offset) // self.record_size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "SessionLogReader":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def offset(self, index: int) -> int:
+        return self.data_offset + index * self.record_size
+
+    def record(self, index: int) -> Tuple[int, int, float, bytes]:
+        """(bar, scene_index, timestamp, lane value bytes) for one record."""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        start = self.offset(index)
+        bar, scene_index, timestamp = RECORD_HEAD.unpack_from(self._map, start)
+        values = self._map[start + RECORD_HEAD.size:start + self.record_size]
+        return bar, scene_index, timestamp, values
+
+    def frame(self, index: int) -> Dict[str, int]:
+        values = self.record(index)[3]
+        return {name: value for name, value in zip(self.lane_names, values) if value != MISSING}
+
+    def iter_frames(self, start: int = 0) -> Iterator[Dict[str, int]]:
+        for index in range(start, self.count):
+            yield self.frame(index)
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """Records in the JSONL entry shape."""
+        for index in range(self.count):
+            bar, scene_index, timestamp, values = self.record(index)
+            yield {
+                "timestamp": timestamp,
+                "bar": bar,
+                "scene_index": scene_index,
+                "frozen_scene": self.frozen_scene,
+                "frozen_lanes": self.frozen_lanes,
+                "lanes": {name: value for name, value in zip(self.lane_names, values) if value != MISSING},
+            }
+
+    def raw_records(self, start: int = 0, stop: int | None = None) -> bytes:
+        """Records [start, stop) as one contiguous copy, for callers that decode in bulk."""
+        stop = self.count if stop is None else min(stop, self.count)
+        return self._map[self.offset(start):self.offset(stop)] if stop > start else b""
+
+    def lane_column(self, name: str, start: int = 0, stop: int | None = None) -> bytes:
+        """Every value of one lane (MISSING included) as a strided slice of the map."""
+        stop = self.count if stop is None else min(stop, self.count)
+        lane_offset = self.offset(start) + RECORD_HEAD.size + self.lane_names.index(name)
+        return self._map[lane_offset:self.offset(stop):self.record_size] if stop > start else b""
+
+
+def _iter_jsonl_with_offsets(path: str | Path, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    with Path(path).open("rb") as handle:
+        handle.seek(offset)
+        for line in handle:
+            start = offset
+            offset += len(line)
+            if not line.strip():
+                continue
+            yield start, json.loads(line)
+
+
+def iter_jsonl_entries(path: str | Path, offset: int = 0) -> Iterator[Dict]:
+    """Entries from byte `offset` on (which must be the start of a line)."""
+    for _, entry in _iter_jsonl_with_offsets(path, offset):
+        yield entry
+
+
+def iter_log_entries(path: str | Path) -> Iterator[Dict]:
+    """Entries from either format, detected by the file's magic bytes."""
+    if is_binary_log(path):
+        with SessionLogReader(path) as reader:
+            yield from reader.iter_entries()
+        return
+    yield from iter_jsonl_entries(path)
+
+
+def iter_log_frames(path: str | Path, start: int = 0) -> Iterator[Dict[str, int]]:
+    """Lane values per bar from either format, from record `start` on."""
+    if is_binary_log(path):
+        with SessionLogReader(path) as reader:
+            yield from reader.iter_frames(start)
+        return
+    entries = iter_jsonl_entries(path)
+    if start:
+        index = load_index(path)
+        entries = iter_jsonl_entries(path, index.offset(start)) if start < len(index) else iter(())
+    for entry in entries:
+        yield {k: int(v) for k, v in entry.get("lanes", {}).items()}
+
+
+def convert_log(src: str | Path, dst: str | Path) -> int:
+    """Converts JSONL <-> binary, based on the source format. Returns the number of records."""
+    count = 0
+    if is_binary_log(src):
+        with Path(dst).open("w", encoding="utf-8") as out:
+            for entry in iter_log_entries(src):
+                out.write(json.dumps(entry) + "\n")
+                count += 1
+        return count
+
+    lane_names: List[str] = []
+    seen = set()
+    frozen_scene = False
+    frozen_lanes: List[str] = []
+    for entry in iter_jsonl_entries(src):
+        frozen_scene = entry.get("frozen_scene", frozen_scene)
+        frozen_lanes = entry.get("frozen_lanes", frozen_lanes)
+        for name in entry.get("lanes", {}):
+            if name not in seen:
+                seen.add(name)
+                lane_names.append(name)
+    Path(dst).unlink(missing_ok=True)
+    writer = BinarySessionLog(dst, lane_names, frozen_scene=frozen_scene, frozen_lanes=frozen_lanes)
+    writer._open()
+    try:
+        for entry in iter_jsonl_entries(src):
+            writer._handle.write(writer.encode(entry))
+            count += 1
+    finally:
+        writer.close()
+    return count
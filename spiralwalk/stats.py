@@ -0,0 +1,254 @@
+"""
+Runtime statistics for `run --stats`.
+
+The engine feeds fixed-bucket histograms from the clock thread: each
+division callback's duration, the interval between clock pulses as they
+arrive, and how far each pulse landed from clock.TempoTracker's prediction.
+An observation is one bisect and a few additions, so stats can stay on in a
+performance. Counters the outputs and the session log keep anyway (sent,
+rate-limited and coalesced CCs per port, log records written/dropped and
+their queue-to-disk lag) are read when a report is built.
+
+StatsReporter logs a one-line summary every `interval` seconds and, given a
+port, serves the same data in the Prometheus text format from
+http://127.0.0.1:<port>/metrics. Reports read the histograms without
+locking, so a report may be a single observation behind on some series.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL = 10.0  # seconds between logged summaries
+# bucket upper bounds in seconds
+CALLBACK_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2)
+INTERVAL_BUCKETS = (0.005, 0.01, 0.015, 0.018, 0.02, 0.021, 0.022, 0.025, 0.03, 0.04, 0.05, 0.1, 0.25, 1.0)
+ERROR_BUCKETS = (5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2)
+LAG_BUCKETS = (1e-3, 1e-2, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket counts values above every bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the maximum for the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen > rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(le bound, count of values <= bound) pairs, ending with +inf."""
+        buckets = []
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            buckets.append((bound, seen))
+        return buckets
+
+
+class EngineStats:
+    def __init__(self, tempo):
+        self.tempo = tempo
+        self.output = None  # the engine's output port and session log, set once they exist
+        self.session_log = None
+        self.callbacks: Dict[str, Histogram] = {}
+        self.clock_interval = Histogram(INTERVAL_BUCKETS)
+        self.clock_error = Histogram(ERROR_BUCKETS)  # |arrival - predicted arrival|
+        self._last_clock: float | None = None
+
+    def timed(self, division: str, callback: Callable, clock: Callable[[], float]) -> Callable:
+        """`callback` wrapped to record its duration under `division`, timed with `clock`."""
+        histogram = self.callbacks.setdefault(division, Histogram(CALLBACK_BUCKETS))
+        observe = histogram.observe
+
+        def run(bar: int, quarter: int, tick: int) -> None:
+            start = clock()
+            callback(bar, quarter, tick)
+            observe(clock() - start)
+
+        return run
+
+    def on_clock(self, now: float, predicted: float | None) -> None:
+        """Records a pulse arriving at `now` (seconds); `predicted` is the tracker's forecast for it."""
+        if self._last_clock is not None:
+            self.clock_interval.observe(now - self._last_clock)
+        self._last_clock = now
+        if predicted is not None:
+            self.clock_error.observe(abs(now - predicted))
+
+    def on_transport(self) -> None:
+        # the gap across a Stop/Start is not a clock interval
+        self._last_clock = None
+
+    def ports(self) -> List[Dict]:
+        """Per-port counters of the output (empty without one)."""
+        if self.output is None or not hasattr(self.output, "stats"):
+            return []
+        stats = self.output.stats()
+        return stats.get("ports") or [stats]
+
+    def summary(self) -> str:
+        tempo = self.tempo
+        parts = [
+            f"clock {tempo.bpm:.2f} BPM, interval p50 {_ms(self.clock_interval.quantile(0.5))} p99 {_ms(self.clock_interval.quantile(0.99))}, "
+            f"jitter {_ms(tempo.jitter_rms)} rms / {_ms(tempo.jitter_max)} max"
+        ]
+        for division, histogram in sorted(self.callbacks.items()):
+            if histogram.count:
+                parts.append(f"{division} callback p50 {_ms(histogram.quantile(0.5))} p99 {_ms(histogram.quantile(0.99))} max {_ms(histogram.max)}")
+        ports = self.ports()
+        if ports:
+            parts.append(
+                "MIDI "
+                + ", ".join(f"{port['port'] or 'out'} {port['allowed']} sent / {port['denied']} rate-limited / {port['coalesced']} coalesced" for port in ports)
+            )
+        if self.session_log is not None:
+            log = self.session_log.stats()
+            parts.append(f"log {log['written']} written, {log['dropped']} dropped, {log['queued']} queued, lag p99 {_ms(self.session_log.lag.quantile(0.99))}")
+        return "; ".join(parts)
+
+    def prometheus(self) -> str:
+        lines: List[str] = []
+        tempo = self.tempo
+        _metric(lines, "spiralwalk_clock_bpm", "gauge", "Tempo from the clock PLL", [({}, tempo.bpm)])
+        _metric(lines, "spiralwalk_clock_pulses_total", "counter", "Clock pulses received", [({}, tempo.pulses)])
+        _metric(lines, "spiralwalk_clock_jitter_rms_seconds", "gauge", "RMS clock arrival error against the PLL prediction", [({}, tempo.jitter_rms)])
+        _metric(lines, "spiralwalk_clock_outliers_total", "counter", "Clock pulses clamped as outliers", [({}, tempo.outliers)])
+        _metric(lines, "spiralwalk_clock_relocks_total", "counter", "PLL re-locks", [({}, tempo.relocks)])
+        _histogram(lines, "spiralwalk_clock_interval_seconds", "Time between clock pulse arrivals", [({}, self.clock_interval)])
+        _histogram(lines, "spiralwalk_clock_error_seconds", "Clock arrival error against the PLL prediction", [({}, self.clock_error)])
+        _histogram(
+            lines,
+            "spiralwalk_division_callback_seconds",
+            "Division callback duration",
+            [({"division": division}, histogram) for division, histogram in sorted(self.callbacks.items())],
+        )
+        ports = self.ports()
+        if ports:
+            for key, name, help_text in (
+                ("allowed", "spiralwalk_midi_sent_total", "MIDI messages sent"),
+                ("denied", "spiralwalk_midi_rate_limited_total", "Sends dropped by the rate limiter"),
+                ("coalesced", "spiralwalk_midi_coalesced_total", "CCs superseded while waiting for the coalescing sender"),
+            ):
+                _metric(lines, name, "counter", help_text, [({"port": port["port"] or ""}, port[key]) for port in ports])
+            _metric(lines, "spiralwalk_midi_pending", "gauge", "CCs waiting for the coalescing sender", [({"port": port["port"] or ""}, port["pending"]) for port in ports])
+        if self.session_log is not None:
+            log = self.session_log.stats()
+            _metric(lines, "spiralwalk_session_log_written_total", "counter", "Session log records written", [({}, log["written"])])
+            _metric(lines, "spiralwalk_session_log_dropped_total", "counter", "Session log records dropped on a full queue", [({}, log["dropped"])])
+            _metric(lines, "spiralwalk_session_log_queued", "gauge", "Session log records waiting for the writer", [({}, log["queued"])])
+            _histogram(lines, "spiralwalk_session_log_lag_seconds", "Time from queueing a session log record to flushing it", [({}, self.session_log.lag)])
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms"
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    items = [f'{key}="{_escape(str(value))}"' for key, value in labels.items()]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str, samples: List[Tuple[Dict, float]]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(lines: List[str], name: str, help_text: str, series: List[Tuple[Dict, Histogram]]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series:
+        for bound, count in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.total}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = self.server.stats.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("Stats request: " + format, *args)
+
+
+class StatsReporter:
+    """Logs EngineStats.summary() every `interval` seconds and optionally serves /metrics on `port`."""
+
+    def __init__(self, stats: EngineStats, interval: float = STATS_INTERVAL, port: int | None = None, host: str = "127.0.0.1"):
+        self.stats = stats
+        self.interval = interval
+        self.port = port
+        self.host = host
+        self._server: ThreadingHTTPServer | None = None
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self._stop.clear()
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.stats = self.stats
+            self.port = self._server.server_address[1]  # resolves port 0
+            self._threads.append(threading.Thread(target=self._server.serve_forever, name="spiralwalk-stats-http", daemon=True))
+            logger.info("Serving stats on http://%s:%s/metrics", self.host, self.port)
+        if self.interval > 0:
+            self._threads.append(threading.Thread(target=self._run, name="spiralwalk-stats", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            logger.info("Stats: %s", self.stats.summary())
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads.clear()
+        logger.info("Stats: %s", self.stats.summary())
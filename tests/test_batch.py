@@ -0,0 +1,46 @@
+from dataclasses import replace
+
+import mido
+import pytest
+
+pytest.importorskip("numpy")
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.render import CCRecorder
+
+
+def _high_res_settings():
+    settings = load_settings("configs/example.yaml")
+    settings.lanes[0] = replace(settings.lanes[0], output="cc14", deadband=40)
+    settings.lanes[1] = replace(settings.lanes[1], output="nrpn", nrpn=1234, slew_limit=600)
+    return settings
+
+
+def _render(batch, ticks=96 * 40, settings=None, **kwargs):
+    settings = settings or load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, batch=batch, **kwargs)
+    engine.output_port = CCRecorder()
+    engine._on_midi_message(mido.Message("start"))
+    clock = mido.Message("clock")
+    for _ in range(ticks):
+        engine._on_midi_message(clock)
+    return engine.output_port.events
+
+
+def test_batch_matches_lane_path():
+    assert _render(batch=True) == _render(batch=False)
+
+
+def test_batch_matches_lane_path_with_frozen_lanes():
+    assert _render(batch=True, frozen_lanes=["energy", "restraint"]) == _render(batch=False, frozen_lanes=["energy", "restraint"])
+
+
+def test_batch_matches_lane_path_with_high_res_lanes():
+    settings = _high_res_settings()
+    sent = _render(batch=True, settings=settings)
+    assert sent == _render(batch=False, settings=_high_res_settings())
+    numbers = {cc for _, _, _, cc, _ in sent}
+    assert {99, 98, 6, 38} <= numbers  # NRPN parameter select and data entry
+    # the cc14 lane sends its fine byte on cc + 32
+    assert any(value for _, _, _, cc, value in sent if cc == settings.lanes[0].cc + 32)
@@ -0,0 +1,26 @@
+import yaml
+
+from spiralwalk.bench import compare, generate_config, run_benchmarks, synthetic_settings
+from spiralwalk.config import load_settings
+
+
+def test_synthetic_settings_match_generated_config(tmp_path):
+    path = tmp_path / "big.yaml"
+    path.write_text(yaml.safe_dump(generate_config(6, 4, seed=3)))
+    settings = synthetic_settings(6, 4, seed=3)
+    assert load_settings(path) == settings
+    assert len(settings.lanes) == 6 and len(settings.scenes) == 4
+
+
+def test_run_and_compare(tmp_path):
+    document = run_benchmarks(sizes=[3], min_time=0.001, repeat=2, only="[")
+    names = {(r["name"], r["size"]) for r in document["results"]}
+    assert ("lane.next_value[sine,linear]", 0) in names
+    assert all(r["ns_per_op"] > 0 for r in document["results"])
+
+    document = run_benchmarks(sizes=[3], min_time=0.001, repeat=2, only="engine")
+    assert [(r["name"], r["size"]) for r in document["results"]] == [("engine._on_division", 3)]
+    baseline = {"results": [dict(document["results"][0], ns_per_op=document["results"][0]["ns_per_op"] / 2)]}
+    rows = compare(document, baseline, threshold=0.25)
+    assert rows[0]["regression"] and rows[0]["ratio"] > 1.9
+    assert not compare(document, document)[0]["regression"]
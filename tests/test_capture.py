@@ -0,0 +1,82 @@
+import os
+import threading
+
+import mido
+import pytest
+
+from spiralwalk.capture import CaptureLog, CaptureReader, iter_timeline
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.render import CCRecorder
+from spiralwalk.replay import CaptureReplay
+
+
+def _capture(path, ticks, lookahead_ticks=0):
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, capture_path=str(path), lookahead_ticks=lookahead_ticks)
+    engine.output_port = CCRecorder()
+    if engine.lookahead:
+        engine.lookahead.start()
+    clock = mido.Message("clock")
+    for message in [mido.Message("start")] + [clock] * ticks:
+        engine._on_midi_message(message)
+    if engine.lookahead:
+        engine.lookahead.stop()
+    engine.capture.close()
+    return settings, engine.output_port.events
+
+
+def test_capture_records_every_cc(tmp_path):
+    path = tmp_path / "run.swcap"
+    _, sent = _capture(path, 96 * 6, lookahead_ticks=24)
+    assert sent
+    with CaptureReader(path) as reader:
+        assert len(reader) == len(sent)
+        events = list(reader.iter_events())
+        assert [(channel >> 4, channel & 0x0F, cc, value) for _, cc, channel, value in iter_timeline(reader)] == [event[1:] for event in sent]
+    ticks = [event[0] for event in events]
+    assert ticks == sorted(ticks) and ticks[0] > 0
+
+
+def test_capture_replay_reproduces_sub_bar_motion(tmp_path):
+    path = tmp_path / "run.swcap"
+    settings, sent = _capture(path, 96 * 4)
+    with CaptureReader(path) as reader:
+        timeline = list(iter_timeline(reader))
+    replay = CaptureReplay(settings, timeline, dry_run=True)
+    replay.output_port = CCRecorder()
+    clock = mido.Message("clock")
+    for message in [mido.Message("start")] + [clock] * (96 * 4):
+        replay._on_midi_message(message)
+    assert replay.output_port.events == sent
+
+
+def test_capture_spills_in_chunks(tmp_path):
+    path = tmp_path / "chunks.swcap"
+    log = CaptureLog(path, [("a", 1, 0, 0)], chunk_records=4, ring_chunks=16)
+    for tick in range(30):
+        log.record(tick, 0, 0, 6, tick)
+    log.close()
+    with CaptureReader(path) as reader:
+        assert [event[0] for event in reader.iter_events()] == list(range(30))
+
+
+@pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+def test_capture_drops_instead_of_blocking(tmp_path):
+    # the writer thread blocks creating the file until the pipe gets a reader, like a stalled disk
+    path = tmp_path / "stalled.swcap"
+    os.mkfifo(path)
+    log = CaptureLog(path, [("a", 1, 0, 0)], chunk_records=4, ring_chunks=2)
+    for tick in range(20):
+        log.record(tick, 0, 0, 6, tick)
+    assert log.dropped == 12
+
+    data = []
+    drain = threading.Thread(target=lambda: data.append(path.read_bytes()))
+    drain.start()
+    log.close()
+    drain.join()
+    copy = tmp_path / "copy.swcap"
+    copy.write_bytes(data[0])
+    with CaptureReader(copy) as reader:
+        assert [event[0] for event in reader.iter_events()] == list(range(8))
@@ -0,0 +1,54 @@
+import json
+
+import mido
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.render import CCRecorder
+
+
+def _play(engine, messages):
+    engine.output_port = CCRecorder()
+    for message in messages:
+        engine._on_midi_message(message)
+    return engine.output_port.events
+
+
+def _reference(settings, ticks, after=960):
+    engine = AutomationEngine(settings, dry_run=True)
+    clock = mido.Message("clock")
+    _play(engine, [mido.Message("start")] + [clock] * ticks + [mido.Message("stop")])
+    return _play(engine, [mido.Message("continue")] + [clock] * after)
+
+
+def test_resume_from_checkpoint_continues_where_it_stopped(tmp_path):
+    settings = load_settings("configs/example.yaml")
+    path = tmp_path / "engine.ckpt"
+    crashed = AutomationEngine(settings, dry_run=True, checkpoint_path=str(path), checkpoint_bars=8)
+    _play(crashed, [mido.Message("start")] + [mido.Message("clock")] * (20 * 96))
+    crashed.checkpoints.close()
+    # bar callbacks for bar b run on tick (b + 1) * 96, so the last checkpoint is after bar 16's callback
+    assert json.loads(path.read_text())["tick"] == 17 * 96
+
+    resumed = AutomationEngine(settings, dry_run=True, resume_from=str(path))
+    sent = _play(resumed, [mido.Message("continue")] + [mido.Message("clock")] * 960)
+    assert resumed.clock.bar >= 17
+    assert sent == _reference(settings, 17 * 96)
+
+
+def test_checkpoints_anchor_song_position(tmp_path):
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, checkpoint_bars=8)
+    _play(engine, [mido.Message("start")] + [mido.Message("clock")] * (40 * 96) + [mido.Message("stop")])
+    engine._on_midi_message(mido.Message("songpos", pos=17 * 16))
+    sent = _play(engine, [mido.Message("continue")] + [mido.Message("clock")] * 960)
+    assert sent == _reference(settings, 17 * 96)
+
+
+def test_start_drops_anchors_of_the_previous_take():
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, checkpoint_bars=8)
+    _play(engine, [mido.Message("start")] + [mido.Message("clock")] * (40 * 96) + [mido.Message("stop")])
+    assert engine._anchors
+    _play(engine, [mido.Message("start")])
+    assert not engine._anchors
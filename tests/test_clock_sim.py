@@ -1,4 +1,8 @@
-from spiralwalk.clock import ClockFollower
+import random
+
+import pytest
+
+from spiralwalk.clock import ClockFollower, TempoTracker
 
 
 def test_clock_counts_divisions():
@@ -25,3 +29,65 @@ def test_stop_halts_ticks():
     before = clock.tick_count
     clock.handle_clock_tick()
     assert clock.tick_count == before
+
+
+def test_bar_callbacks_run_once_before_divisions():
+    clock = ClockFollower()
+    events = []
+    clock.register_callback("1/4", lambda bar, quarter, tick: events.append(("quarter", tick)))
+    clock.register_bar_callback(lambda bar, quarter, tick: events.append(("bar", tick)))
+    clock.register_callback("1/16", lambda bar, quarter, tick: events.append(("sixteenth", tick)))
+
+    clock.start()
+    for _ in range(192):
+        clock.handle_clock_tick()
+    at_bar = [name for name, tick in events if tick == 96]
+    assert at_bar == ["bar", "quarter", "sixteenth"]
+    assert [tick for name, tick in events if name == "bar"] == [96, 192]
+    assert clock.bar == 2 and clock.quarter == 8
+
+
+def test_schedule_spans_lcm_of_divisions():
+    clock = ClockFollower()
+    hits = []
+    clock.register_callback("1/5", lambda bar, quarter, tick: hits.append(tick))  # 19 ticks, not a bar divisor
+    clock.start()
+    for _ in range(96 * 20 + 7):
+        clock.handle_clock_tick()
+    assert hits == [t for t in range(1, 96 * 20 + 8) if t % 19 == 0]
+    assert clock.bar == 20
+    clock.reset()
+    clock.handle_clock_tick()
+    assert clock.tick_count == 1 and clock.bar == 0
+
+
+def _pulse_times(bpm, count, start=0.0, jitter=0.0, seed=1):
+    rng = random.Random(seed)
+    period = 60.0 / (bpm * 24)
+    return [start + i * period + rng.gauss(0.0, jitter) for i in range(count)]
+
+
+def test_tempo_tracker_filters_jitter():
+    tempo = TempoTracker()
+    for now in _pulse_times(128.0, 2000, jitter=0.003):
+        tempo.tick(now)
+    assert tempo.locked
+    assert tempo.bpm == pytest.approx(128.0, abs=0.25)
+    assert 0.002 < tempo.jitter_rms < 0.005
+    assert tempo.next_tick_time == pytest.approx(2000 * 60.0 / (128 * 24), abs=0.003)
+
+
+def test_tempo_tracker_follows_tempo_jumps_and_gaps():
+    tempo = TempoTracker()
+    times = _pulse_times(120.0, 480)
+    times += _pulse_times(140.0, 96, start=times[-1] + 60.0 / (140 * 24))
+    for now in times:
+        tempo.tick(now)
+    assert tempo.bpm == pytest.approx(140.0, abs=0.01)
+    assert tempo.relocks == 1
+
+    # clock stopped for two seconds, then resumed at the same tempo
+    for now in _pulse_times(140.0, 48, start=times[-1] + 2.0):
+        tempo.tick(now)
+    assert tempo.relocks == 2
+    assert tempo.bpm == pytest.approx(140.0, abs=0.01)
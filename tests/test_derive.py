@@ -0,0 +1,85 @@
+import json
+import random
+
+import pytest
+
+from spiralwalk.derive import _quantile, derive_scenes
+from spiralwalk.sessionlog import convert_log
+
+
+def _reference(bars, scene_count):
+    # the original list-and-sort derivation
+    segment_size = max(1, len(bars) // scene_count)
+    lines = ["scenes:"]
+    for i in range(scene_count):
+        end = (i + 1) * segment_size if i < scene_count - 1 else len(bars)
+        lane_values = {}
+        for bar in bars[i * segment_size:end]:
+            for lane, value in bar.items():
+                lane_values.setdefault(lane, []).append(value)
+        lines.append(f"  scene{i + 1}:")
+        for lane, values in sorted(lane_values.items()):
+            lines.append(f"    {lane}: {{min: {int(_quantile(values, 0.1))}, max: {int(_quantile(values, 0.9))}}}")
+    return "\n".join(lines)
+
+
+def test_histogram_derive_matches_sorted_quantiles(tmp_path):
+    rng = random.Random(7)
+    bars = []
+    for bar in range(1003):
+        lanes = {"energy": rng.randint(0, 127), "space": rng.randint(40, 60)}
+        if bar % 3:
+            lanes["grain"] = rng.randint(0, 20)
+        bars.append(lanes)
+    path = tmp_path / "session.jsonl"
+    with path.open("w", encoding="utf-8") as handle:
+        for bar, lanes in enumerate(bars):
+            handle.write(json.dumps({"bar": bar, "scene_index": 0, "lanes": lanes}) + "\n")
+            if bar % 100 == 0:
+                handle.write("\n")
+    binary = tmp_path / "session.swlog"
+    convert_log(path, binary)
+
+    expected = _reference(bars, 5)
+    assert derive_scenes(str(path), 5) == expected
+    assert derive_scenes(str(path), 5, jobs=3) == expected
+    assert derive_scenes(str(binary), 5) == expected
+    assert derive_scenes(str(binary), 5, jobs=4) == expected
+    assert derive_scenes(str(path), 2000) == _reference(bars, 2000)
+
+
+def test_changepoint_finds_planted_segments():
+    np = pytest.importorskip("numpy")
+    from spiralwalk.segment import changepoint_segments
+
+    rng = np.random.default_rng(3)
+    bounds = [0, 1300, 2100, 5000, 6001]
+    levels = [(10, 100), (90, 20), (50, 50), (120, 0)]
+    values = np.zeros((bounds[-1], 2), dtype=np.uint8)
+    for (start, end), level in zip(zip(bounds, bounds[1:]), levels):
+        values[start:end] = np.clip(rng.normal(level, 4, size=(end - start, 2)), 0, 127)
+    segments = changepoint_segments(values, 4, max_candidates=64)
+    assert segments == list(zip(bounds, bounds[1:]))
+
+    # a logged scene change is kept as a boundary even when the data is flat
+    flat = np.full((400, 1), 64, dtype=np.uint8)
+    scenes = np.repeat([0, 1], [123, 277])
+    assert (123, 400) in changepoint_segments(flat, 2, scenes=scenes)
+
+    # dense scene changes share the candidate budget instead of growing it
+    dense = np.arange(bounds[-1]) // 2
+    assert len(changepoint_segments(values, 4, scenes=dense, max_candidates=64)) == 4
+
+
+def test_changepoint_derive_reads_both_formats(tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "session.jsonl"
+    with path.open("w", encoding="utf-8") as handle:
+        for bar in range(300):
+            level = 20 if bar < 170 else 100
+            handle.write(json.dumps({"bar": bar, "scene_index": 0, "lanes": {"energy": level + bar % 5}}) + "\n")
+    binary = tmp_path / "session.swlog"
+    convert_log(path, binary)
+    text = derive_scenes(str(path), 2, segmentation="changepoint")
+    assert text == derive_scenes(str(binary), 2, segmentation="changepoint")
+    assert "energy: {min: 20, max: 24}" in text and "energy: {min: 100, max: 104}" in text
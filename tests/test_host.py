@@ -0,0 +1,46 @@
+import mido
+import pytest
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.host import EngineHost
+from spiralwalk.render import CCRecorder
+
+
+def _feed(on_message, recorders, ticks):
+    on_message(mido.Message("start"))
+    for tick in range(1, ticks + 1):
+        for recorder in recorders:
+            recorder.tick = tick
+        on_message(mido.Message("clock"))
+
+
+def test_host_fans_out_identical_ticks():
+    settings = load_settings("configs/example.yaml")
+    starter = load_settings("configs/starter_roles.yaml")
+    host = EngineHost(None)
+    engines = [host.add(settings, dry_run=True), host.add(starter, dry_run=True)]
+    recorders = [CCRecorder(), CCRecorder()]
+    for engine, recorder in zip(engines, recorders):
+        engine.output_port = recorder
+    _feed(host._on_midi_message, recorders, 96 * 4)
+
+    assert all(engine.input_port is None for engine in engines)
+    assert all(engine.clock.tempo is host.tempo for engine in engines)
+    assert host.tempo.pulses == 96 * 4
+    assert [engine.clock.tick_count for engine in engines] == [96 * 4, 96 * 4]
+
+    # each hosted engine emits exactly what it would running alone
+    for config, recorder in zip(("configs/example.yaml", "configs/starter_roles.yaml"), recorders):
+        alone = AutomationEngine(load_settings(config), dry_run=True)
+        expected = CCRecorder()
+        alone.output_port = expected
+        _feed(alone._on_midi_message, [expected], 96 * 4)
+        assert recorder.events == expected.events
+
+
+def test_host_rejects_mixed_ppq():
+    settings = load_settings("configs/example.yaml")
+    settings.transport.ppq_division = 48
+    with pytest.raises(ValueError):
+        EngineHost(None).add(settings, dry_run=True)
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from spiralwalk.clock import TempoTracker
+from spiralwalk.config import load_settings
+from spiralwalk.interpolate import Interpolator
+from spiralwalk.midi_io import CC
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class BudgetOutput:
+    def __init__(self, clock, budget=True):
+        self.clock = clock
+        self.budget = budget
+        self.sent = []
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, kind, number, value, channel=0):
+        self.sent.append((self.clock(), number, value, "final"))
+
+    def try_send(self, kind, number, value, channel=0, reserve=0.0):
+        if not self.budget:
+            return False
+        self.sent.append((self.clock(), number, value, "step"))
+        return True
+
+
+def _glide(budget=True, deadband=0, ticks=6):
+    # driven by hand on a fake clock in 0.1 ms steps, as the scheduler thread would on waking
+    clock = FakeClock()
+    output = BudgetOutput(clock, budget)
+    tempo = TempoTracker(bpm=2500.0)  # 1 ms per pulse
+    interp = Interpolator(output, tempo, {(CC, 0, 1): (ticks, deadband)}, clock=clock)
+    interp.send_cc(1, 10)
+    interp._send_due()
+    clock.now = started = 0.01
+    interp.send_cc(1, 30)
+    for step in range(1, 200):
+        clock.now = started + step * 1e-4
+        interp._send_due()
+    return started, [(at, value, kind) for at, _, value, kind in output.sent[1:]]
+
+
+def test_interpolator_ramps_to_target_over_division():
+    started, sent = _glide()
+    assert [value for _, value, _ in sent] == list(range(11, 31))
+    assert [kind for _, _, kind in sent] == ["step"] * 19 + ["final"]
+    times = [at - started for at, _, _ in sent]
+    assert times == sorted(times)
+    assert times[-1] == pytest.approx(0.006, abs=1e-4)  # 6 pulses at 1 ms
+    assert times[9] == pytest.approx(0.003, abs=1e-4)  # evenly spread: half way at half time
+
+
+def test_interpolator_steps_by_deadband_and_respects_budget():
+    _, sent = _glide(deadband=4)
+    assert [value for _, value, _ in sent] == [14, 18, 22, 26, 30]
+    _, sent = _glide(budget=False)
+    assert [(value, kind) for _, value, kind in sent] == [(30, "final")]
+
+
+def test_interpolator_thread_sends_targets_on_close():
+    output = BudgetOutput(time.monotonic)
+    interp = Interpolator(output, TempoTracker(bpm=120.0), {(CC, 0, 1): (96, 0)})
+    interp.open()
+    interp.send_cc(1, 10)
+    interp.send_cc(1, 100)  # a two-second ramp, cut short by close()
+    interp.close()
+    assert [(value, kind) for _, _, value, kind in output.sent][-1] == (100, "final")
+
+
+def test_step_hold_lanes_do_not_glide_by_default():
+    settings = load_settings("configs/example.yaml")
+    assert "motion" in {lane.name for lane in settings.lanes if lane.curve == "step_hold"}
+    assert all(lane.interpolate == (lane.curve != "step_hold") for lane in settings.lanes)
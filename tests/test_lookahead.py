@@ -0,0 +1,38 @@
+import mido
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.render import CCRecorder
+
+
+def _script():
+    clock = mido.Message("clock")
+    script = [mido.Message("start")] + [clock] * 500
+    script += [mido.Message("stop")] + [clock] * 30
+    script += [mido.Message("continue")] + [clock] * 400
+    script += [mido.Message("stop"), mido.Message("start")] + [clock] * 777
+    return script
+
+
+def _play(lookahead_ticks, **kwargs):
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, lookahead_ticks=lookahead_ticks, **kwargs)
+    engine.output_port = CCRecorder()
+    if engine.lookahead:
+        engine.lookahead.start()
+    for message in _script():
+        engine._on_midi_message(message)
+    if engine.lookahead:
+        engine.lookahead.stop()
+    return engine.output_port.events
+
+
+def test_lookahead_matches_direct_path():
+    expected = _play(0, arm_ticks=10)
+    assert expected
+    assert _play(48, arm_ticks=10) == expected
+    assert _play(5, arm_ticks=10) == expected
+
+
+def test_lookahead_soft_start():
+    assert _play(96, soft_start=True) == _play(0, soft_start=True)
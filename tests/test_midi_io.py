@@ -0,0 +1,140 @@
+import pytest
+
+from spiralwalk import midi_io
+from spiralwalk.clock import parse_division
+from spiralwalk.config import assign_output_ports, load_settings
+from spiralwalk.midi_io import MidiOutput, ShardedOutput, port_channel
+
+
+def test_token_bucket_burst_then_refill(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(midi_io.time, "monotonic", lambda: now[0])
+    out = MidiOutput(None, max_messages_per_sec=10, dry_run=True, burst=3)
+    assert [out._can_send() for _ in range(4)] == [True, True, True, False]
+    now[0] += 0.15  # 1.5 tokens refilled
+    assert out._can_send() is True
+    assert out._can_send() is False
+    now[0] += 10  # refill is capped at the burst size
+    assert sum(out._can_send() for _ in range(5)) == 3
+    assert (out.allowed, out.denied) == (7, 4)
+
+
+def test_burst_defaults_to_rate():
+    out = MidiOutput(None, max_messages_per_sec=200, dry_run=True)
+    assert out.burst == 200
+    assert sum(out._can_send() for _ in range(250)) == 200
+
+
+class FakePort:
+    def __init__(self):
+        self.messages = []
+
+    def send(self, msg):
+        self.messages.append((msg.channel, msg.control, msg.value))
+
+    def close(self):
+        pass
+
+
+def test_coalescing_keeps_latest_value_per_cc():
+    out = MidiOutput(None, max_messages_per_sec=1000, burst=1, coalesce=True)
+    port = FakePort()
+    out._port = port
+    for value in range(100):
+        out.send_cc(20, value, channel=0)
+        out.send_cc(21, 127 - value, channel=1)
+    out.open()
+    out.close()
+    assert port.messages == [(0, 20, 99), (1, 21, 28)]
+    assert out.coalesced == 198
+    assert out.denied == 0
+
+
+def test_high_res_sends_msb_only_when_it_changes():
+    out = MidiOutput(None, max_messages_per_sec=1000)
+    port = FakePort()
+    out._port = port
+    for value in (8192, 8200, 8300, 8300 + 128):
+        out.send_cc14(1, value, channel=0)
+    assert port.messages == [(0, 1, 64), (0, 33, 0), (0, 33, 8), (0, 33, 108), (0, 1, 65), (0, 33, 108)]
+    assert out.allowed == 6
+
+    port.messages.clear()
+    out.send_nrpn(300, 1000, channel=2)
+    out.send_nrpn(300, 1001, channel=2)
+    out.send_nrpn(5, 1001, channel=2)
+    assert port.messages == [
+        (2, 99, 2), (2, 98, 44), (2, 6, 7), (2, 38, 104),
+        (2, 38, 105),
+        (2, 99, 0), (2, 98, 5), (2, 6, 7), (2, 38, 105),
+    ]
+
+
+def test_high_res_message_group_is_all_or_nothing():
+    out = MidiOutput(None, max_messages_per_sec=10, dry_run=True, burst=3)
+    out.send_nrpn(1, 500)  # 4 messages: goes out on a full bucket, leaving it in debt
+    assert out.allowed == 4
+    out.send_nrpn(1, 501)
+    assert (out.allowed, out.denied) == (4, 1)
+
+
+class FakeRawPort:
+    def __init__(self):
+        self.packets = []
+
+    def send_message(self, message):
+        self.packets.append(bytes(message))
+
+    def close_port(self):
+        pass
+
+
+def test_raw_backend_writes_packets_without_messages(monkeypatch):
+    monkeypatch.setattr(midi_io.mido, "Message", None)  # any Message construction would fail
+    out = MidiOutput(None, max_messages_per_sec=1000, backend="rtmidi")
+    out._raw = raw = FakeRawPort()
+    out.send_cc(20, 99, channel=3)
+    out.send_cc14(1, 8200, channel=0)
+    assert raw.packets == [b"\xb3\x14\x63", b"\xb0\x01\x40", b"\xb0\x21\x08"]
+    dry = MidiOutput(None, dry_run=True)
+    dry.send_cc(20, 99)
+    assert dry.allowed == 1
+
+
+def test_coalescing_sends_in_batches():
+    out = MidiOutput(None, max_messages_per_sec=1000, burst=100, coalesce=True, backend="rtmidi", send_batch=8)
+    out._raw = raw = FakeRawPort()
+    for cc in range(20):
+        out.send_cc(cc, cc + 1, channel=0)
+    out.open()
+    out.close()
+    assert raw.packets == [bytes([0xB0, cc, cc + 1]) for cc in range(20)]
+
+
+def test_sharded_output_routes_by_port_with_separate_budgets():
+    outputs = [MidiOutput(f"port{i}", max_messages_per_sec=10, burst=2) for i in range(3)]
+    ports = [FakePort() for _ in outputs]
+    for output, port in zip(outputs, ports):
+        output._port = port
+    sharded = ShardedOutput(outputs)
+    for value in range(3):
+        for port in range(3):
+            sharded.send_cc(20, value, channel=port_channel(port, 5))
+    # each port spends its own burst of 2; one shared budget would have passed only 2 in total
+    assert [port.messages for port in ports] == [[(5, 20, 0), (5, 20, 1)]] * 3
+    assert (sharded.allowed, sharded.denied) == (6, 3)
+    assert [stats["port"] for stats in sharded.stats()["ports"]] == ["port0", "port1", "port2"]
+
+
+def test_lanes_spread_over_output_ports_by_rate():
+    settings = load_settings("configs/example.yaml")
+    settings.midi.out_ports = ["a", "b"]
+    settings.lanes[0].port = "synth"
+    ports, lane_ports = assign_output_ports(settings)
+    assert ports == ["a", "b", "synth"]
+    assert lane_ports[settings.lanes[0].name] == 2
+    rate = {lane.name: 96 // parse_division(lane.division) for lane in settings.lanes}
+    loads = [sum(rate[name] for name, port in lane_ports.items() if port == p) for p in (0, 1)]
+    assert abs(loads[0] - loads[1]) <= max(rate.values())
+    with pytest.raises(ValueError):
+        assign_output_ports(settings, out_port_override="virtual")
@@ -0,0 +1,116 @@
+import copy
+import os
+
+import mido
+import pytest
+import yaml
+
+from spiralwalk.config import LaneDefinition, SceneDefinition, load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.reload import ConfigWatcher, diff_settings
+
+
+def _edited(settings):
+    new = copy.deepcopy(settings)
+    lanes = {lane.name: lane for lane in new.lanes}
+    lanes["energy"].smoothing = 0.5  # motion change: rebuilt
+    lanes["space"].cc = 42  # routing only: state kept
+    new.lanes.remove(lanes["grain"])
+    new.lanes.append(LaneDefinition(name="tilt", cc=30, division="1/32", curve="sine"))
+    new.scenes["scene2"]["focus"] = SceneDefinition(min=0, max=10)
+    for scene in new.scenes.values():
+        scene["tilt"] = SceneDefinition(min=0, max=127)
+    return new
+
+
+def _clock(engine, ticks):
+    for _ in range(ticks):
+        engine._on_midi_message(mido.Message("clock"))
+
+
+def test_diff_settings():
+    settings = load_settings("configs/example.yaml")
+    diff = diff_settings(settings, _edited(settings))
+    assert diff.added_lanes == ["tilt"]
+    assert diff.removed_lanes == ["grain"]
+    assert diff.changed_lanes == ["energy"]
+    assert diff.rerouted_lanes == ["space"]
+    assert sorted(diff.changed_scenes) == sorted(settings.scenes)  # every scene gained tilt
+    assert not diff.midi and not diff.transport
+    assert not diff_settings(settings, copy.deepcopy(settings))
+
+
+def test_reload_swaps_on_the_next_bar_keeping_unchanged_lanes():
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True)
+    engine._on_midi_message(mido.Message("start"))
+    _clock(engine, 100)
+    before = dict(engine.lanes)
+    width_state = engine.lanes["width"].state
+    space_rng = engine.lanes["space"].rng
+
+    engine.request_reload(_edited(settings))
+    _clock(engine, 191 - 100)
+    assert engine.settings is settings  # still mid-bar
+
+    _clock(engine, 1)
+    assert engine.settings is not settings
+    assert engine.lanes["width"] is before["width"] and engine.lanes["width"].state is width_state
+    assert engine.lanes["space"] is not before["space"] and engine.lanes["space"].rng is space_rng
+    assert engine.lanes["space"].cc == 42
+    assert engine.lanes["energy"] is not before["energy"]
+    assert "grain" not in engine.lanes and "grain" not in engine.last_values
+    assert engine.scene_table.rows[1]["focus"]["max"] == 10
+    _clock(engine, 96)
+    assert "tilt" in engine.last_values  # the new 1/32 division was registered on the clock
+
+
+def test_reload_rejects_ppq_change():
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True)
+    new = copy.deepcopy(settings)
+    new.transport.ppq_division = 48
+    with pytest.raises(ValueError):
+        engine.request_reload(new)
+
+
+def test_watcher_reloads_changed_file_and_skips_invalid(tmp_path):
+    path = tmp_path / "live.yaml"
+    data = yaml.safe_load(open("configs/example.yaml"))
+    path.write_text(yaml.safe_dump(data))
+    engine = AutomationEngine(load_settings(path), dry_run=True)
+    watcher = ConfigWatcher(path, engine.request_reload)
+    assert not watcher.check()
+
+    data["scenes"]["scene1"]["energy"]["max"] = 64
+    path.write_text(yaml.safe_dump(data))
+    os.utime(path, ns=(0, 1))
+    assert watcher.check()
+    engine._on_midi_message(mido.Message("start"))  # stopped transport: applied on the next message
+    assert engine.settings.scenes["scene1"]["energy"].max == 64
+
+    path.write_text("lanes: [")
+    assert not watcher.check()
+    assert watcher.rejected == 1
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_rerouted_lane_continues_its_motion(batch):
+    settings = load_settings("configs/example.yaml")
+    new = copy.deepcopy(settings)
+    next(lane for lane in new.lanes if lane.name == "space").cc = 42
+
+    def run(reload):
+        engine = AutomationEngine(settings, dry_run=True, batch=batch)
+        engine._on_midi_message(mido.Message("start"))
+        values = []
+        for tick in range(96 * 4):
+            if reload and tick == 100:
+                engine.request_reload(new)
+            _clock(engine, 1)
+            values.append(engine.last_values.get("space"))
+        return engine, values
+
+    engine, values = run(reload=True)
+    assert engine.lanes["space"].cc == 42
+    assert values == run(reload=False)[1]
@@ -0,0 +1,85 @@
+import json
+
+import mido
+
+from spiralwalk.config import load_settings
+from spiralwalk.render import CCRecorder
+from spiralwalk.replay import FrameStream, TempoReplay
+
+
+def _write_log(path, bars):
+    with path.open("w", encoding="utf-8") as handle:
+        for bar in range(bars):
+            handle.write(json.dumps({"bar": bar, "scene_index": 0, "lanes": {"energy": bar}}) + "\n")
+
+
+def test_frame_stream_loops_and_restarts(tmp_path):
+    path = tmp_path / "session.jsonl"
+    _write_log(path, 100)
+    stream = FrameStream(path, prefetch=4)
+    try:
+        assert [stream.next_frame()["energy"] for _ in range(103)][-4:] == [99, 0, 1, 2]
+        assert len(stream._buffer) <= 4
+        stream.restart()
+        assert stream.next_frame() == {"energy": 0}
+    finally:
+        stream.close()
+
+    once = FrameStream(path, loop=False)
+    frames = []
+    while (frame := once.next_frame()) is not None:
+        frames.append(frame["energy"])
+    once.close()
+    assert frames == list(range(100))
+
+
+def test_tempo_replay_restarts_on_start(tmp_path):
+    path = tmp_path / "session.jsonl"
+    _write_log(path, 3)
+    settings = load_settings("configs/example.yaml")
+    energy = next(lane for lane in settings.lanes if lane.name == "energy")
+    replay = TempoReplay(settings, FrameStream(path, prefetch=2), dry_run=True)
+    replay.output_port = CCRecorder()
+    clock = mido.Message("clock")
+    for bars in (4, 2):
+        replay._on_midi_message(mido.Message("start"))
+        for _ in range(bars):
+            replay.frames.prefill(5.0)  # a bar of real time gives the reader far longer than this
+            for _ in range(96):
+                replay._on_midi_message(clock)
+    replay.frames.close()
+    assert [value for _, _, _, cc, value in replay.output_port.events if cc == energy.cc] == [0, 1, 2, 0, 0, 1]
+    assert replay.underruns == 0
+
+
+class _StalledFrames:
+    exhausted = False
+
+    def restart(self):
+        pass
+
+    def prefill(self, timeout=None):
+        return False
+
+    def poll(self):
+        return None
+
+
+def test_tempo_replay_holds_on_underrun():
+    settings = load_settings("configs/example.yaml")
+    replay = TempoReplay(settings, _StalledFrames(), dry_run=True)
+    replay.output_port = CCRecorder()
+    replay._on_midi_message(mido.Message("start"))
+    for _ in range(96):
+        replay._on_midi_message(mido.Message("clock"))  # the bar line finds nothing buffered and does not wait
+    assert replay.underruns == 1 and replay.output_port.events == []
+
+
+def test_frame_stream_loops_a_seeked_section(tmp_path):
+    path = tmp_path / "session.jsonl"
+    _write_log(path, 100)
+    stream = FrameStream(path, start=40, count=3)
+    try:
+        assert [stream.next_frame()["energy"] for _ in range(7)] == [40, 41, 42, 40, 41, 42, 40]
+    finally:
+        stream.close()
@@ -0,0 +1,21 @@
+from spiralwalk.config import load_settings
+from spiralwalk.scenes import SceneTable, adjust_scene_params
+
+
+def test_scene_table_rows_follow_scene_order():
+    settings = load_settings("configs/example.yaml")
+    table = SceneTable(settings, ["scene2", "scene1"])
+    assert len(table) == 2
+    assert table.rows[0]["energy"]["min"] == settings.scenes["scene2"]["energy"].min
+    assert table.rows[1]["time"]["curve_params"] == {"step_size": 0.04}
+
+
+def test_adjusted_params_are_memoized():
+    settings = load_settings("configs/example.yaml")
+    table = SceneTable(settings, ["scene1"])
+    first = table.adjusted(0, "energy", 64, 10)
+    assert table.adjusted(0, "energy", 64, 10) is first
+    expected = adjust_scene_params(table.rows[0]["energy"], 64 / 127.0, 10 / 127.0)
+    assert (first["min"], first["max"]) == (expected["min"], expected["max"])
+    # restraint squeezes the 30..100 range toward its midpoint
+    assert 30 < first["min"] < first["max"] < 100
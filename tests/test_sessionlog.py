@@ -0,0 +1,154 @@
+import json
+import threading
+
+from spiralwalk.derive import derive_scenes
+from spiralwalk.sessionlog import (
+    AsyncSessionLog,
+    BarIndex,
+    BinarySessionLog,
+    SessionLogReader,
+    build_index,
+    convert_log,
+    index_path,
+    is_binary_log,
+    iter_log_frames,
+    open_session_log,
+    resolve_log_position,
+)
+
+
+def _entries():
+    for bar in range(20):
+        lanes = {"energy": (bar * 7) % 128, "space": 127 - bar}
+        if bar >= 2:
+            lanes["grain"] = bar
+        yield {"timestamp": 1000.0 + bar, "bar": bar, "scene_index": bar // 8, "frozen_scene": False, "frozen_lanes": [], "lanes": lanes}
+
+
+def test_binary_log_round_trip(tmp_path):
+    path = tmp_path / "session.swlog"
+    log = BinarySessionLog(path, ["energy", "space", "grain"])
+    for entry in _entries():
+        log.write(entry)
+    log.close()
+
+    assert is_binary_log(path)
+    with SessionLogReader(path) as reader:
+        assert len(reader) == 20
+        assert reader.record(9)[:3] == (9, 1, 1009.0)
+        assert reader.frame(0) == {"energy": 0, "space": 127}
+        assert list(reader.lane_column("space", 0, 3)) == [127, 126, 125]
+        assert [entry["lanes"] for entry in reader.iter_entries()] == [entry["lanes"] for entry in _entries()]
+
+
+def test_binary_log_drops_partial_record_before_appending(tmp_path):
+    path = tmp_path / "session.swlog"
+    entries = list(_entries())
+    log = BinarySessionLog(path, ["energy", "space", "grain"])
+    for entry in entries[:5]:
+        log.write(entry)
+    log.close()
+    with path.open("ab") as handle:
+        handle.write(b"\x07\x00\x00")  # a record cut short by a crash
+
+    log = BinarySessionLog(path, ["energy", "space", "grain"])
+    for entry in entries[5:]:
+        log.write(entry)
+    log.close()
+    with SessionLogReader(path) as reader:
+        assert [reader.record(i)[0] for i in range(len(reader))] == list(range(20))
+
+
+def test_convert_jsonl_to_binary_and_back(tmp_path):
+    src = tmp_path / "session.jsonl"
+    src.write_text("".join(json.dumps(entry) + "\n" for entry in _entries()))
+    assert convert_log(src, tmp_path / "session.swlog") == 20
+    assert convert_log(tmp_path / "session.swlog", tmp_path / "back.jsonl") == 20
+    assert [json.loads(line) for line in (tmp_path / "back.jsonl").read_text().splitlines()] == list(_entries())
+    assert list(iter_log_frames(tmp_path / "session.swlog")) == list(iter_log_frames(src))
+    assert derive_scenes(str(tmp_path / "session.swlog"), 2) == derive_scenes(str(src), 2)
+
+
+class _BlockedWriter:
+    def __init__(self):
+        self.gate = threading.Event()
+        self.entries = []
+        self.flushes = 0
+        self.closed = False
+
+    def append(self, entry):
+        self.gate.wait()
+        self.entries.append(entry)
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_async_log_drops_when_full_and_drains_on_close():
+    writer = _BlockedWriter()
+    log = AsyncSessionLog(writer, queue_size=4, flush_interval=10.0, flush_size=3)
+    entries = list(_entries())
+    for entry in entries:
+        log.write(entry)  # never blocks, even though the writer is stuck
+    assert log.dropped > 0
+    writer.gate.set()
+    log.close()
+
+    assert writer.closed
+    assert log.written == len(writer.entries) == len(entries) - log.dropped
+    assert writer.entries == entries[: len(writer.entries)]
+    assert writer.flushes >= len(writer.entries) // 3
+
+
+class _FailingWriter(_BlockedWriter):
+    def append(self, entry):
+        self.gate.wait()
+        raise OSError("disk full")
+
+
+def test_async_log_survives_a_failed_writer():
+    writer = _FailingWriter()
+    log = AsyncSessionLog(writer, queue_size=2)
+    log.write({"bar": 0})
+    writer.gate.set()
+    log._thread.join(timeout=5)
+    assert log.failed
+    for entry in _entries():
+        log.write(entry)  # dropped instead of filling the queue
+    log.close()  # returns even though nothing drains the queue
+    assert writer.closed and log.written == 0
+
+
+def test_index_written_on_write_matches_rebuilt_index(tmp_path):
+    for name in ("session.jsonl", "session.swlog"):
+        path = tmp_path / name
+        log = open_session_log(path, ["energy", "space", "grain"], index=True)
+        for entry in _entries():
+            log.write(entry)
+        log.close()
+        written = index_path(path).read_bytes()
+        assert build_index(path) == 20
+        assert index_path(path).read_bytes() == written
+
+        index = BarIndex(index_path(path))
+        assert index.scene_changes() == [0, 8, 16]
+        start = resolve_log_position(path, scene_change=2)
+        assert start == 16
+        assert resolve_log_position(path, bar=11) == 11
+        assert next(iter_log_frames(path, start=start)) == {"energy": (16 * 7) % 128, "space": 111, "grain": 16}
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    path = tmp_path / "session.jsonl"
+    entries = list(_entries())
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries[:10]))
+    build_index(path)
+    with path.open("a") as handle:
+        handle.write("".join(json.dumps(entry) + "\n" for entry in entries[10:]))  # appended without the index
+
+    assert resolve_log_position(path, bar=15) == 15
+    assert len(BarIndex(index_path(path))) == 20
+    assert next(iter_log_frames(path, start=19)) == entries[19]["lanes"]
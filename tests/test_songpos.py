@@ -0,0 +1,53 @@
+import mido
+import pytest
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.lanes import Lane
+from spiralwalk.render import CCRecorder
+
+
+@pytest.mark.parametrize("curve", ["sine", "ramp", "random_walk", "step_hold", "noise"])
+def test_advance_curve_matches_stepping(curve):
+    params = {"min": 0, "max": 127, "curve_params": {"cycle_steps": 7, "hold_steps": 3, "step_size": 0.3}}
+    stepped = Lane(name="a", cc=1, channel=0, division="1/16", curve=curve, smoothing=0.3)
+    skipped = Lane(name="a", cc=1, channel=0, division="1/16", curve=curve, smoothing=0.3)
+    stepped.rng.seed(5)
+    skipped.rng.seed(5)
+    for _ in range(1000):
+        stepped.next_value(params)
+    skipped.advance_curve(params, 1000)
+
+    assert skipped.rng.getstate() == stepped.rng.getstate()
+    for field in ("previous_value", "phase", "hold_value", "hold_remaining", "random_position"):
+        assert getattr(skipped.state, field) == pytest.approx(getattr(stepped.state, field), abs=1e-9)
+
+
+def _continue_after(engine, ticks=960):
+    engine.output_port = CCRecorder()
+    clock = mido.Message("clock")
+    engine._on_midi_message(mido.Message("continue"))
+    for _ in range(ticks):
+        engine._on_midi_message(clock)
+    return engine.output_port.events
+
+
+@pytest.mark.parametrize("bars", [3, 37])
+def test_song_position_matches_playing_from_start(bars):
+    settings = load_settings("configs/example.yaml")
+    played = AutomationEngine(settings, dry_run=True)
+    played.output_port = CCRecorder()
+    played._on_midi_message(mido.Message("start"))
+    for _ in range(bars * 96):
+        played._on_midi_message(mido.Message("clock"))
+    played._on_midi_message(mido.Message("stop"))
+
+    located = AutomationEngine(settings, dry_run=True)
+    located._on_midi_message(mido.Message("songpos", pos=bars * 16))
+    assert (located.clock.tick_count, located.clock.bar) == (played.clock.tick_count, played.clock.bar)
+    assert located.current_scene_index == played.current_scene_index
+    assert list(located.spiral.history) == list(played.spiral.history)
+
+    expected = _continue_after(played)
+    actual = _continue_after(located)
+    assert actual == expected
@@ -0,0 +1,41 @@
+import urllib.request
+
+import mido
+
+from spiralwalk.config import load_settings
+from spiralwalk.engine import AutomationEngine
+from spiralwalk.stats import Histogram, StatsReporter
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram((1.0, 2.0, 5.0))
+    for value in (0.5, 1.0, 1.5, 4.0, 9.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(1.0, 2), (2.0, 3), (5.0, 4), (float("inf"), 5)]
+    assert histogram.quantile(0.5) == 2.0
+    assert histogram.quantile(1.0) == 9.0
+    assert histogram.total == 16.0
+
+
+def test_engine_stats_served_as_prometheus_text():
+    settings = load_settings("configs/example.yaml")
+    engine = AutomationEngine(settings, dry_run=True, stats=True)
+    engine._on_midi_message(mido.Message("start"))
+    for _ in range(96 * 2):
+        engine._on_midi_message(mido.Message("clock"))
+
+    stats = engine.stats
+    assert stats.clock_interval.count == 96 * 2 - 1
+    assert sum(histogram.count for histogram in stats.callbacks.values()) > 0
+    assert "1/16 callback" in stats.summary()
+
+    reporter = StatsReporter(stats, interval=0, port=0)
+    reporter.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{reporter.port}/metrics", timeout=5) as response:
+            text = response.read().decode("utf-8")
+    finally:
+        reporter.stop()
+    assert 'spiralwalk_division_callback_seconds_bucket{division="1/16",le="+Inf"}' in text
+    assert "spiralwalk_clock_interval_seconds_count 191" in text
+    assert "spiralwalk_midi_sent_total{port=" in text